@@ -0,0 +1,116 @@
+# Scalar against batch valuation and profit computation.
+#
+#   python benchmarks/bench_batch_valuation.py [--items 10000] [--variants 4]
+#
+# Every entry gets 5-30 raw listings in divine or chaos, as returned by the
+# trade fetch endpoint. The scalar path builds Listing objects and calls
+# ItemEntry.apply_listings per entry, then feeds the entries to
+# ProfitEngine.update_item_entry one by one. The batch path reads the
+# listings into a ListingTable, values every entry with value_listings and
+# derives every strat with profit_pairs. Both results are checked to match.
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(root, "weary_traveler"))
+
+from batch_valuation import ListingTable, profit_pairs, value_listings  # noqa: E402
+from currency_rates import shared_rates  # noqa: E402
+from poe_trade_rest import ItemEntry, Listing, ProfitEngine  # noqa: E402
+
+
+def make_results(entries: int) -> list[list[dict]]:
+    rng = random.Random(0)
+    results = []
+    for _ in range(entries):
+        center = rng.lognormvariate(2, 1)
+        rows = []
+        for _ in range(rng.randint(5, 30)):
+            price = center * rng.uniform(0.8, 1.2)
+            currency = "chaos" if price < 1 else "divine"
+            amount = round(price * 120) if currency == "chaos" else round(price, 1)
+            rows.append(
+                {"listing": {"price": {"amount": amount, "currency": currency}}}
+            )
+        results.append(rows)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--variants", type=int, default=4)
+    args = parser.parse_args()
+    # fixed rates, nothing is fetched from poe.ninja
+    shared_rates.source = lambda league: {"chaos": 1.0, "divine": 150.0}
+
+    results = make_results(args.items * args.variants)
+    names = [f"Gem {i:05d} Support" for i in range(args.items)]
+
+    start = time.perf_counter()
+    entries = []
+    for i, rows in enumerate(results):
+        entry = ItemEntry(names[i // args.variants], {"level": i % args.variants})
+        listings = [
+            Listing(
+                row["listing"]["price"]["amount"], row["listing"]["price"]["currency"]
+            )
+            for row in rows
+        ]
+        entry.apply_listings(listings, len(listings), "")
+        entries.append(entry)
+    scalar_values = time.perf_counter() - start
+    start = time.perf_counter()
+    engine = ProfitEngine()
+    for entry in entries:
+        engine.update_item_entry(entry)
+    scalar_profits = time.perf_counter() - start
+
+    start = time.perf_counter()
+    table = ListingTable.from_results(results)
+    read = time.perf_counter() - start
+    start = time.perf_counter()
+    values = value_listings(table)
+    batch_values = time.perf_counter() - start
+    start = time.perf_counter()
+    name_codes = np.arange(len(results)) // args.variants
+    buys, sells, profits = profit_pairs(name_codes, values)
+    batch_profits = time.perf_counter() - start
+
+    assert values.tolist() == [entry.value for entry in entries]
+    batch = {
+        (names[name_codes[buy]], buy % args.variants, sell % args.variants): profit
+        for buy, sell, profit in zip(buys.tolist(), sells.tolist(), profits.tolist())
+    }
+    scalar = {
+        (
+            s.item_name,
+            s.buy_item.modifiers["level"],
+            s.sell_item.modifiers["level"],
+        ): s.profit
+        for s in engine.index.top()
+    }
+    assert batch == scalar
+
+    listings = int(table.offsets[-1])
+    print(f"{len(results)} entries, {listings} listings, {len(scalar)} strats")
+    print(f"scalar valuation        {scalar_values * 1000:8.1f} ms")
+    print(
+        f"batch valuation         {batch_values * 1000:8.1f} ms"
+        f"  (+{read * 1000:.1f} ms to read the listings into columns)"
+    )
+    print(f"scalar profits          {scalar_profits * 1000:8.1f} ms")
+    print(f"batch profits           {batch_profits * 1000:8.1f} ms")
+    print(
+        f"speedup                 {scalar_values / batch_values:8.1f}x valuation"
+        f"  {scalar_profits / batch_profits:.1f}x profits"
+    )
+
+
+if __name__ == "__main__":
+    main()
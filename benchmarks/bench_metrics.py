@@ -0,0 +1,109 @@
+# Cost of the always-on instrumentation.
+#
+#   python benchmarks/bench_metrics.py [--calls 200000] [--pages 2000]
+#
+# Times a bare histogram observe, a timed empty block and a labeled lookup
+# through the registry, each from one thread and from four at once. Then
+# parses pages of 10 fetched listings with and without the parse timer to
+# show the overhead on the cheapest instrumented hot path.
+import argparse
+import os
+import sys
+import threading
+import time
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(root, "weary_traveler"))
+
+from currency_rates import shared_rates  # noqa: E402
+from metrics import Histogram, MetricsRegistry  # noqa: E402
+from poe_trade_rest import Fetcher  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self, data: dict) -> None:
+        self.data = data
+
+    def json(self) -> dict:
+        return self.data
+
+
+def per_call(run, calls: int, threads: int = 1) -> float:
+    # nanoseconds per call, across all threads
+    workers = [
+        threading.Thread(target=run, args=(calls // threads,)) for _ in range(threads)
+    ]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--pages", type=int, default=2000)
+    args = parser.parse_args()
+    # fixed rates, nothing is fetched from poe.ninja
+    shared_rates.source = lambda league: {"chaos": 1.0, "divine": 150.0}
+
+    histogram = Histogram()
+    registry = MetricsRegistry()
+
+    def observe(calls: int) -> None:
+        for _ in range(calls):
+            histogram.observe(0.01)
+
+    def timed(calls: int) -> None:
+        for _ in range(calls):
+            with histogram.time():
+                pass
+
+    def lookup(calls: int) -> None:
+        for _ in range(calls):
+            registry.histogram("request_seconds", "", endpoint="fetch").observe(0.01)
+
+    for name, run in (("observe", observe), ("timer", timed), ("lookup", lookup)):
+        single = per_call(run, args.calls)
+        shared = per_call(run, args.calls, threads=4)
+        print(f"{name:<8} {single:8.0f} ns/call  {shared:8.0f} ns/call (4 threads)")
+
+    page = FakeResponse(
+        {
+            "result": [
+                {
+                    "listing": {"price": {"amount": 120 + i, "currency": "chaos"}},
+                    "item": {
+                        "properties": [
+                            {"name": "Level", "values": [["5", 0]]},
+                            {"name": "Quality", "values": [["+20%", 0]]},
+                        ]
+                    },
+                }
+                for i in range(10)
+            ]
+        }
+    )
+    # best of five alternating rounds, the first ones warm up the caches
+    bare = instrumented = float("inf")
+    for _ in range(5):
+        for parse in (Fetcher._extract_listings, Fetcher.extract_listings):
+            start = time.perf_counter()
+            for _ in range(args.pages):
+                parse(page)
+            elapsed = time.perf_counter() - start
+            if parse is Fetcher.extract_listings:
+                instrumented = min(instrumented, elapsed)
+            else:
+                bare = min(bare, elapsed)
+    print(
+        f"page parse {bare / args.pages * 1e6:8.1f} us bare"
+        f"  {instrumented / args.pages * 1e6:8.1f} us timed"
+        f"  ({(instrumented - bare) / bare:+.1%})"
+    )
+
+
+if __name__ == "__main__":
+    main()
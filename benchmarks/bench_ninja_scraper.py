@@ -0,0 +1,99 @@
+# Wall time and peak memory of the poe.ninja scraper paths.
+#
+#   python benchmarks/bench_ninja_scraper.py                # live, both paths
+#   python benchmarks/bench_ninja_scraper.py --mode http
+#   python benchmarks/bench_ninja_scraper.py --offline      # recorded fixtures
+#
+# Every run happens in a fresh process so the peak RSS of one path doesn't
+# hide the other. Peak RSS of child processes covers chromedriver and Chrome.
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(root, "weary_traveler"))
+fixtures = os.path.join(root, "tests", "fixtures")
+
+default_url = "https://poe.ninja/economy/affliction/skill-gems?level=5&quality=20&corrupted=No&gemType=Awakened"
+
+
+def run_once(mode: str, url: str, offline: bool, queue: multiprocessing.Queue) -> None:
+    import poe_ninja_scraper
+
+    if offline:
+        with open(os.path.join(fixtures, "ninja_skill_gems.json")) as file:
+            overview = json.load(file)
+        with open(os.path.join(fixtures, "ninja_skill_gems.html")) as file:
+            page_source = file.read()
+
+        def fetch_overview(url: str):
+            _, filters = poe_ninja_scraper.overview_request(url)
+            return poe_ninja_scraper.overview_to_frame(overview, filters)
+
+        poe_ninja_scraper.fetch_overview = fetch_overview
+        poe_ninja_scraper.fetch_page_source = lambda url: page_source
+        poe_ninja_scraper.save_data = lambda data, name: None
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    names = poe_ninja_scraper.fetch_data(url, mode=mode)
+    elapsed = time.perf_counter() - start
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # ru_maxrss is in KiB on Linux
+    queue.put(
+        {
+            "mode": mode,
+            "items": len(names),
+            "wall_s": elapsed,
+            "python_peak_mb": python_peak / 2**20,
+            "rss_peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "children_rss_peak_mb": (
+                resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+            ),
+        }
+    )
+
+
+def measure(mode: str, url: str, offline: bool) -> dict:
+    queue: multiprocessing.Queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=run_once, args=(mode, url, offline, queue))
+    process.start()
+    process.join()
+    if process.exitcode != 0:
+        return {"mode": mode, "error": f"exit code {process.exitcode}"}
+    return queue.get()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=default_url)
+    parser.add_argument("--mode", choices=["http", "browser", "both"], default="both")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--offline", action="store_true")
+    args = parser.parse_args()
+
+    modes = ["http", "browser"] if args.mode == "both" else [args.mode]
+    for mode in modes:
+        for _ in range(args.repeat):
+            result = measure(mode, args.url, args.offline)
+            if "error" in result:
+                print(f"{mode:8} failed: {result['error']}")
+                continue
+            print(
+                f"{mode:8} {result['items']:5d} items"
+                f" {result['wall_s']:8.3f} s"
+                f" python peak {result['python_peak_mb']:7.1f} MB"
+                f" rss peak {result['rss_peak_mb']:7.1f} MB"
+                f" children rss peak {result['children_rss_peak_mb']:7.1f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# Append and read cost of the price history.
+#
+#   python benchmarks/bench_price_history.py [--series 500] [--observations 200]
+#
+# Every series gets an observation per 10 minutes with 20 raw listing prices.
+# Reads take the rolling stats of one series over the last day, once from the
+# compacted, memory mapped segments and once by scanning a plain JSONL log
+# with the same records.
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(root, "weary_traveler"))
+
+from price_history import PriceHistory, PriceSeries, _epoch  # noqa: E402
+from storage import modifiers_key  # noqa: E402
+
+
+def best_of(repeat: int, run) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--series", type=int, default=500)
+    parser.add_argument("--observations", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    folder = tempfile.mkdtemp()
+    history = PriceHistory(os.path.join(folder, "history"))
+    modifiers = {"max_gem_level": 1, "corrupted": "false"}
+    start = datetime.now() - timedelta(minutes=10 * args.observations)
+    names = [f"Gem {i:04d} Support" for i in range(args.series)]
+
+    began = time.perf_counter()
+    for step in range(args.observations):
+        timestamp = start + timedelta(minutes=10 * step)
+        for name in names:
+            prices = [round(rng.uniform(10, 20), 1) for _ in range(20)]
+            history.append(name, modifiers, timestamp, sum(prices) / 20, 20, prices)
+    elapsed = time.perf_counter() - began
+    records = args.series * args.observations
+    print(
+        f"append {records} records        {elapsed * 1000:8.0f} ms"
+        f"  ({elapsed / records * 1e6:.1f} us per record, compactions included)"
+    )
+    history.compact()
+
+    segments = [f for f in os.listdir(history.folder) if f.endswith(".arrow")]
+    size = sum(os.path.getsize(os.path.join(history.folder, f)) for f in segments)
+    print(f"{len(segments)} segments                  {size / 2**20:8.2f} MiB")
+
+    # the same records as one uncompacted log
+    log_file = os.path.join(folder, "plain.jsonl")
+    with open(log_file, "w") as f:
+        for step in range(args.observations):
+            for name in names:
+                record = {
+                    "item_name": name,
+                    "modifiers": modifiers_key(modifiers),
+                    "timestamp": (start + timedelta(minutes=10 * step) - _epoch)
+                    // timedelta(microseconds=1),
+                    "estimate": 15.0,
+                    "number_listed": 20,
+                    "prices": [15.0] * 20,
+                }
+                f.write(json.dumps(record) + "\n")
+
+    name = names[args.series // 2]
+    since = ((datetime.now() - timedelta(days=1)) - _epoch) // timedelta(microseconds=1)
+
+    def scan_log() -> None:
+        rows = []
+        with open(log_file) as f:
+            for line in f:
+                record = json.loads(line)
+                if record["item_name"] == name and record["timestamp"] >= since:
+                    rows.append(record)
+        PriceSeries(
+            np.array([r["timestamp"] for r in rows], np.int64),
+            np.array([r["estimate"] for r in rows], np.float32),
+            np.array([r["number_listed"] for r in rows], np.int32),
+            None,
+        ).stats()
+
+    scan = best_of(3, scan_log)
+    print(f"stats from a JSONL scan        {scan * 1000:8.2f} ms")
+    read = best_of(args.repeat, lambda: history.stats(name, modifiers))
+    print(f"stats from mapped segments     {read * 1000:8.2f} ms")
+    reopen = best_of(3, lambda: PriceHistory(history.folder).close())
+    print(f"reopen                         {reopen * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
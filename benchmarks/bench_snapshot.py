@@ -0,0 +1,145 @@
+# Load time and memory of 100k item entries per storage format.
+#
+#   python benchmarks/bench_snapshot.py [--entries 100000]
+#
+# The entries are written once as a JSON export, a SQLite database and an
+# Arrow IPC snapshot. Every load runs in a fresh process. RSS is the resident
+# size after the load minus the resident size after the imports, peak is the
+# growth of ru_maxrss over the same span.
+import argparse
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(root, "weary_traveler"))
+
+from poe_trade_rest import ItemEntry  # noqa: E402
+from snapshot import EntryTable, read_snapshot  # noqa: E402
+from storage import SqliteStorage, _load_item_entries, _load_json  # noqa: E402
+
+
+def make_item_entries(count: int) -> dict[int, dict]:
+    rng = random.Random(0)
+    now = datetime.now()
+    modifiers_list = [
+        {"min_gem_level": level, "max_gem_level": level, "corrupted": "false"}
+        for level in range(1, 9)
+    ]
+    return {
+        i
+        + 1: {
+            "item_name": f"Gem {i // len(modifiers_list):05d} Support",
+            "modifiers": modifiers_list[i % len(modifiers_list)],
+            "url": f"https://www.pathofexile.com/trade/search/Standard/{i:08x}",
+            "value": round(rng.uniform(1, 1000), 1),
+            "number_listed": rng.randint(0, 40),
+            "updated_at": now - timedelta(minutes=rng.uniform(0, 6000)),
+        }
+        for i in range(count)
+    }
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def load(case: str, folder: str) -> EntryTable | list[ItemEntry]:
+    db_file = os.path.join(folder, "entries.db")
+    json_files = [os.path.join(folder, f"{name}.json") for name in ("items", "strats")]
+    arrow_files = [
+        os.path.join(folder, f"{name}.arrow") for name in ("items", "strats")
+    ]
+    if case == "json export -> ItemEntry":
+        rows = _load_item_entries(_load_json(json_files[0]))
+        return [ItemEntry(**row) for row in rows.values()]
+    if case == "sqlite -> ItemEntry":
+        rows = SqliteStorage(db_file).read_item_entries_by_id()
+        return [ItemEntry(**row) for row in rows.values()]
+    if case == "arrow snapshot -> columns":
+        return read_snapshot(*arrow_files)[0]
+    if case == "arrow snapshot -> ItemEntry":
+        table, _ = read_snapshot(*arrow_files)
+        return [ItemEntry(**row) for row in table.to_item_entries().values()]
+    raise NotImplementedError(f"This case: '{case}' is not implemented")
+
+
+def run_once(case: str, folder: str, queue: multiprocessing.Queue) -> None:
+    # ru_maxrss is in KiB on Linux
+    rss_before = rss_mb()
+    peak_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    start = time.perf_counter()
+    # kept alive until the resident size is taken
+    loaded = load(case, folder)
+    elapsed = time.perf_counter() - start
+    queue.put(
+        {
+            "count": len(loaded),
+            "wall_ms": elapsed * 1000,
+            "rss_mb": rss_mb() - rss_before,
+            "peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            - peak_before,
+        }
+    )
+
+
+def measure(case: str, folder: str) -> dict:
+    queue: multiprocessing.Queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=run_once, args=(case, folder, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    item_entries = make_item_entries(args.entries)
+    backend = SqliteStorage(os.path.join(folder, "entries.db"))
+    backend.upsert_item_entries(item_entries.values())
+    backend.export_json(
+        *(os.path.join(folder, f"{n}.json") for n in ("items", "strats"))
+    )
+    arrow_files = [os.path.join(folder, f"{n}.arrow") for n in ("items", "strats")]
+    backend.export_snapshot(*arrow_files)
+    backend.close()
+    # every price fits a float32 exactly, the snapshot loses nothing
+    values = [row["value"] for row in item_entries.values()]
+    table, _ = read_snapshot(*arrow_files)
+    assert [row["value"] for row in table.to_item_entries().values()] == values
+
+    for name, size in (
+        ("json export", os.path.getsize(os.path.join(folder, "items.json"))),
+        ("sqlite", os.path.getsize(backend.db_file)),
+        ("arrow snapshot", os.path.getsize(arrow_files[0])),
+    ):
+        print(f"{name:30} {size / 2**20:8.2f} MiB on disk")
+
+    for case in (
+        "json export -> ItemEntry",
+        "sqlite -> ItemEntry",
+        "arrow snapshot -> columns",
+        "arrow snapshot -> ItemEntry",
+    ):
+        results = [measure(case, folder) for _ in range(args.repeat)]
+        best = min(results, key=lambda result: result["wall_ms"])
+        print(
+            f"{case:30} {best['wall_ms']:8.1f} ms"
+            f"  rss +{best['rss_mb']:6.1f} MiB  peak +{best['peak_mb']:6.1f} MiB"
+            f"  ({best['count']} entries)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# Size of the stored strats, embedded copies against normalized ids.
+#
+#   python benchmarks/bench_store_size.py [--items 500] [--variants 8]
+#
+# Every item gets `variants` entries and a strat for every ordered pair of
+# them, like a group with that many modifier sets. The legacy layout is the
+# old export: every strat with full copies of both entries, loaded back
+# through ProfitStrat.__post_init__. The normalized layout stores entries
+# once with interned modifier sets and strats as (buy_id, sell_id) pairs.
+import argparse
+import dataclasses
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(root, "weary_traveler"))
+
+from poe_trade_rest import DataHandler, ItemEntry, ProfitStrat  # noqa: E402
+from storage import JsonStorage, SqliteStorage  # noqa: E402
+
+
+def make_data(items: int, variants: int) -> tuple[list, list]:
+    rng = random.Random(0)
+    now = datetime.now()
+    modifiers_list = [
+        {"min_gem_level": level, "max_gem_level": level, "corrupted": "false"}
+        for level in range(1, variants + 1)
+    ]
+    item_entries = []
+    profit_strats = []
+    for i in range(items):
+        entries = [
+            ItemEntry(
+                item_name=f"Gem {i:04d} Support",
+                modifiers=dict(modifiers),
+                url="https://www.pathofexile.com/trade/search/Standard/abcdef",
+                value=rng.uniform(1, 100),
+                number_listed=rng.randint(0, 40),
+                updated_at=now - timedelta(minutes=rng.uniform(0, 600)),
+            )
+            for modifiers in modifiers_list
+        ]
+        item_entries.extend(entries)
+        profit_strats.extend(
+            ProfitStrat(buy.item_name, buy, sell)
+            for buy in entries
+            for sell in entries
+            if buy is not sell
+        )
+    return item_entries, profit_strats
+
+
+def measure(label: str, load) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    loaded = load()
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{label:30} {elapsed * 1000:8.0f} ms  retained {current / 2**20:7.1f} MiB"
+        f"  peak {peak / 2**20:7.1f} MiB  ({len(loaded)} strats)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--variants", type=int, default=8)
+    args = parser.parse_args()
+
+    item_entries, profit_strats = make_data(args.items, args.variants)
+    folder = tempfile.mkdtemp()
+    # DataHandler creates its data folders in the working directory
+    os.chdir(folder)
+    legacy_items = os.path.join(folder, "legacy_items.json")
+    legacy_strats = os.path.join(folder, "legacy_strats.json")
+    with open(legacy_items, "w") as f:
+        json.dump([dataclasses.asdict(e) for e in item_entries], f, default=str)
+    with open(legacy_strats, "w") as f:
+        json.dump([dataclasses.asdict(s) for s in profit_strats], f, default=str)
+
+    json_backend = JsonStorage(
+        os.path.join(folder, "items.json"), os.path.join(folder, "strats.json")
+    )
+    json_backend.import_json(legacy_items, legacy_strats)
+    sqlite_backend = SqliteStorage(os.path.join(folder, "store.db"))
+    sqlite_backend.import_json(legacy_items, legacy_strats)
+    sqlite_backend.close()
+
+    def size(*files: str) -> str:
+        return f"{sum(os.path.getsize(f) for f in files) / 2**20:7.2f} MiB"
+
+    print(f"{len(item_entries)} entries, {len(profit_strats)} strats")
+    print(f"legacy JSON files              {size(legacy_items, legacy_strats)}")
+    print(
+        "normalized JSON files         "
+        f" {size(json_backend.item_entry_file, json_backend.profit_strat_file)}"
+    )
+    print(f"normalized SQLite database     {size(sqlite_backend.db_file)}")
+
+    def load_legacy() -> list[ProfitStrat]:
+        with open(legacy_strats) as f:
+            return [ProfitStrat(**s) for s in json.load(f)]
+
+    measure("load legacy strats", load_legacy)
+    for label, backend in (
+        ("load normalized JSON", json_backend),
+        ("load normalized SQLite", SqliteStorage(sqlite_backend.db_file)),
+    ):
+        datahandler = DataHandler(backend=backend)
+        measure(label, datahandler.read_all_profit_strats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# Top-K strat queries: secondary indexes against the full-scan path.
+#
+#   python benchmarks/bench_strat_index.py [--strats 100000] [--limit 50]
+#
+# The full scan is what answering a query took before the index: read every
+# strat back from storage (optional, --no-storage skips it), filter the list
+# and sort it by profit. The index answers the same queries from memory and
+# is kept current with one upsert per changed strat.
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(root, "weary_traveler"))
+
+from poe_trade_rest import DataHandler, ItemEntry, ProfitStrat  # noqa: E402
+from storage import SqliteStorage  # noqa: E402
+from strat_index import StratIndex  # noqa: E402
+
+queries = {
+    "best overall": {},
+    "5+ listed, last 30 min": {"min_listed": 5, "max_age": 1800},
+    "5+ listed, last 2 min": {"min_listed": 5, "max_age": 120},
+    "one item": {"item_name": "Gem 0042 Support"},
+    "profit >= 90": {"min_profit": 90},
+}
+
+
+def make_strats(count: int) -> list[ProfitStrat]:
+    rng = random.Random(0)
+    now = datetime.now()
+    names = [f"Gem {i:04d} Support" for i in range(max(1, count // 20))]
+    strats = []
+    for i in range(count):
+        name = names[i % len(names)]
+        buy = ItemEntry(
+            item_name=name,
+            modifiers={"max_gem_level": 1},
+            value=rng.uniform(1, 50),
+            number_listed=rng.randint(0, 40),
+        )
+        sell = ItemEntry(
+            item_name=name,
+            modifiers={"min_gem_level": 5, "variant": i},
+            value=rng.uniform(1, 100),
+            number_listed=rng.randint(0, 40),
+            updated_at=now - timedelta(minutes=rng.uniform(0, 600)),
+        )
+        strats.append(ProfitStrat(name, buy, sell))
+    return strats
+
+
+def full_scan(
+    strats: list[ProfitStrat],
+    limit: int,
+    item_name: str | None = None,
+    min_profit: float | None = None,
+    min_listed: int = 0,
+    max_age: float | None = None,
+) -> list[ProfitStrat]:
+    oldest = None if max_age is None else datetime.now() - timedelta(seconds=max_age)
+    matching = [
+        s
+        for s in strats
+        if (item_name is None or s.item_name == item_name)
+        and (min_profit is None or s.profit >= min_profit)
+        and min(s.buy_item.number_listed, s.sell_item.number_listed) >= min_listed
+        and (oldest is None or s.sell_item.updated_at >= oldest)
+    ]
+    return sorted(matching, key=lambda s: s.profit, reverse=True)[:limit]
+
+
+def timed(action, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        action()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--strats", type=int, default=100000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--no-storage", action="store_true")
+    args = parser.parse_args()
+
+    strats = make_strats(args.strats)
+    start = time.perf_counter()
+    index = StratIndex()
+    index.load(strats)
+    print(f"index build          {(time.perf_counter() - start) * 1000:8.0f} ms")
+
+    datahandler = None
+    if not args.no_storage:
+        folder = tempfile.mkdtemp()
+        backend = SqliteStorage(os.path.join(folder, "bench.db"))
+        datahandler = DataHandler(backend=backend)
+        datahandler.write_profit_strats(strats)
+
+    print(
+        f"{'query':26} {'reload+scan':>12} {'scan':>10} {'index':>10} {'speedup':>8}"
+    )
+    for label, query in queries.items():
+        reload_ms = float("nan")
+        if datahandler is not None:
+            reload_ms = timed(
+                lambda: full_scan(
+                    datahandler.read_all_profit_strats(), args.limit, **query
+                ),
+                repeat=3,
+            )
+        scan_ms = timed(lambda: full_scan(strats, args.limit, **query), repeat=5)
+        index_ms = timed(lambda: index.top(args.limit, **query), repeat=50)
+        print(
+            f"{label:26} {reload_ms:9.1f} ms {scan_ms:7.1f} ms {index_ms:7.2f} ms"
+            f" {scan_ms / index_ms:7.0f}x"
+        )
+
+    # a valuation re-indexes the strats of one item, ~20 here
+    rng = random.Random(1)
+    changed = [rng.choice(strats) for _ in range(1000)]
+
+    def update() -> None:
+        for strat in changed:
+            strat.sell_item.value = rng.uniform(1, 100)
+            strat.sell_item.updated_at = datetime.now()
+            strat.update_profit()
+            index.upsert(strat)
+
+    per_upsert = timed(update, repeat=3) / len(changed) * 1000
+    print(f"incremental upsert   {per_upsert:8.1f} us per strat")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# Frame cost of the virtualized strats table at 100k strats.
+#
+#   python benchmarks/bench_table_model.py [--strats 100000] [--window 12]
+#
+# Builds the model once (this happens on the loader thread), then times the
+# operations the UI does on the Tk thread: filter changes, sort changes and
+# scrolling a window of rows. Every operation should stay under 16 ms.
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(root, "weary_traveler"))
+
+from poe_trade_rest import ItemEntry, ProfitStrat  # noqa: E402
+from table_model import StratTableModel  # noqa: E402
+from tree_renderer import relative_time  # noqa: E402
+
+frame_budget_ms = 16.0
+
+
+def make_strats(count: int) -> list[ProfitStrat]:
+    rng = random.Random(0)
+    now = datetime.now()
+    names = [f"Gem {i:04d} Support" for i in range(max(1, count // 20))]
+    strats = []
+    for i in range(count):
+        name = names[i % len(names)]
+        buy = ItemEntry(
+            item_name=name,
+            modifiers={"max_gem_level": 1},
+            value=rng.uniform(1, 50),
+            number_listed=rng.randint(0, 40),
+            updated_at=now - timedelta(minutes=rng.uniform(0, 600)),
+        )
+        sell = ItemEntry(
+            item_name=name,
+            modifiers={"min_gem_level": 5, "variant": i},
+            value=rng.uniform(1, 100),
+            number_listed=rng.randint(0, 40),
+            updated_at=now - timedelta(minutes=rng.uniform(0, 600)),
+        )
+        strats.append(ProfitStrat(name, buy, sell))
+    return strats
+
+
+def timed(label: str, action, repeat: int = 20) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        action()
+        timings.append((time.perf_counter() - start) * 1000)
+    worst = max(timings)
+    flag = "" if worst <= frame_budget_ms else "  OVER BUDGET"
+    print(
+        f"{label:28} median {statistics.median(timings):7.2f} ms"
+        f"  max {worst:7.2f} ms{flag}"
+    )
+    return worst
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--strats", type=int, default=100000)
+    parser.add_argument("--window", type=int, default=12)
+    args = parser.parse_args()
+
+    strats = make_strats(args.strats)
+    start = time.perf_counter()
+    model = StratTableModel(strats)
+    print(
+        f"model build (loader thread)   {(time.perf_counter() - start) * 1000:.0f} ms"
+    )
+
+    def render_window(offset: int) -> None:
+        now = datetime.now()
+        for strat in model.window(offset, args.window):
+            (strat.profit, relative_time(strat.sell_item.updated_at, now))
+        model.visible
+
+    rng = random.Random(1)
+    timed("scroll window", lambda: render_window(rng.randrange(len(model))))
+    timed("filter item name", lambda: (model.filter_item_name("gem 01"), len(model)))
+    timed("refine item name", lambda: (model.filter_item_name("gem 012"), len(model)))
+    timed("clear item name", lambda: (model.filter_item_name(""), len(model)))
+    timed("filter min profit", lambda: (model.filter_min_profit(20), len(model)))
+    timed("filter min listings", lambda: (model.filter_min_listed(5), len(model)))
+    timed("filter max age", lambda: (model.filter_max_age(1800), len(model)))
+    for sort_key in ("item_name", "staleness", "profit"):
+        timed(f"sort by {sort_key}", lambda: (model.sort_by(sort_key), len(model)))
+    timed("scroll filtered window", lambda: render_window(0))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# Parse time of the poe.ninja HTML fallback on a large page.
+#
+#   python benchmarks/bench_table_parser.py                   # synthetic page
+#   python benchmarks/bench_table_parser.py --page saved.html # recorded page
+#
+# Without --page the rows of the recorded fixture are repeated until the page
+# has --rows rows. The BeautifulSoup parser this replaced is timed alongside
+# when bs4 is installed.
+import argparse
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(root, "weary_traveler"))
+
+import pandas as pd  # noqa: E402
+import poe_ninja_scraper  # noqa: E402
+
+
+def large_page(rows: int) -> str:
+    with open(os.path.join(root, "tests", "fixtures", "ninja_skill_gems.html")) as file:
+        page = file.read()
+    body = re.search(r"<tbody>(.*)</tbody>", page, re.S).group(1)
+    recorded = re.findall(r"<tr>.*?</tr>", body, re.S)
+    repeated = "\n".join(recorded[i % len(recorded)] for i in range(rows))
+    return page.replace(body, repeated)
+
+
+def soup_parse_table(html_content: str) -> pd.DataFrame:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html_content, "html.parser")
+
+    tr_elements = soup.find_all("tr")
+    column_names = []
+    datalist = []
+
+    for tr in tr_elements:
+        td_elements = tr.find_all("td")
+        if len(td_elements) < 2:
+            th_elements = soup.find_all("th")
+            for element in th_elements:
+                column_names.append(element.text)
+        else:
+            items_dict = {}
+            for i in range(0, len(td_elements)):
+                if i == 0:
+                    anchor_href = td_elements[i].find("a")
+                    items_dict[column_names[i]] = anchor_href.find("span").text
+                else:
+                    items_dict[column_names[i]] = td_elements[i].text
+            datalist.append(items_dict)
+    data = pd.DataFrame(datalist)
+    data["Level"] = data["Level"].astype(int)
+    data["Value"] = data["Value"].astype(float)
+
+    return data
+
+
+def measure(name: str, parse, page: str, repeat: int) -> None:
+    # tracemalloc slows parsing down, so the peak is taken from its own run
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data = parse(page)
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    parse(page)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{name:12} {len(data):7d} rows  best {min(timings):8.3f} s"
+        f"  python peak {peak / 2**20:7.1f} MB"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--page")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.page:
+        with open(args.page) as file:
+            page = file.read()
+    else:
+        page = large_page(args.rows)
+    print(f"page size {len(page) / 2**20:.1f} MB")
+
+    backends = ["html.parser"]
+    if poe_ninja_scraper.etree is not None:
+        backends.append("lxml")
+    for backend in backends:
+        measure(
+            backend,
+            lambda page: poe_ninja_scraper.parse_table(page, backend=backend),
+            page,
+            args.repeat,
+        )
+    try:
+        import bs4  # noqa: F401
+    except ImportError:
+        return
+    measure("bs4 (before)", soup_parse_table, page, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
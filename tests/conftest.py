@@ -0,0 +1,20 @@
+import json
+import os
+
+import pytest
+from weary_traveler.currency_rates import chaos_values_from_overview
+from weary_traveler.poe_trade_rest import Listing
+
+fixtures = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+@pytest.fixture(autouse=True)
+def ninja_rates(monkeypatch) -> dict[str, float]:
+    # the shared currency rates read the recorded poe.ninja overview, no test
+    # reaches poe.ninja
+    with open(os.path.join(fixtures, "ninja_currency.json")) as file:
+        chaos_values = chaos_values_from_overview(json.load(file))
+    monkeypatch.setattr(Listing.rates, "source", lambda league: chaos_values)
+    Listing.rates.clear()
+    yield chaos_values
+    Listing.rates.clear()
@@ -0,0 +1,79 @@
+import threading
+import time
+
+from weary_traveler.WearyTraveler import BackgroundTask
+
+
+class FakeItemEntry:
+    def __init__(self, item_name: str) -> None:
+        self.item_name = item_name
+
+
+class FakeDataHandler:
+    # every call claims one entry and blocks like a rate limited valuation
+    def __init__(self) -> None:
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.closed = False
+        # set to keep valuations running after the stop, like a slow request
+        self.in_flight: threading.Event | None = None
+
+    def update_next_item_entries(self, count, stop_event, on_claim) -> int:
+        with self.lock:
+            self.calls += 1
+            call = self.calls
+        on_claim([FakeItemEntry(f"gem{call}")])
+        stop_event.wait(30)
+        if self.in_flight is not None:
+            self.in_flight.wait(30)
+        return 1
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def wait_for(condition, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class TestBackgroundTask:
+    def test_workers_report_status_and_stop_quickly(self) -> None:
+        task = BackgroundTask(FakeDataHandler(), workers=3)
+        task.start()
+        assert wait_for(lambda: all(s.startswith("valuing") for s in task.statuses))
+        assert len(set(task.statuses)) == 3
+
+        # the valuations would block for 30 s unless the stop reaches them
+        task.stop()
+        task.join(timeout=10)
+        assert not task.is_alive()
+        assert task.statuses == ["stopped"] * 3
+
+    def test_store_is_closed_by_the_task_after_in_flight_requests(self) -> None:
+        datahandler = FakeDataHandler()
+        datahandler.in_flight = threading.Event()
+        task = BackgroundTask(datahandler, workers=2)
+        task.start()
+        assert wait_for(lambda: datahandler.calls == 2)
+
+        task.stop()
+        task.join(timeout=0.1)
+        assert task.is_alive() and task.close_store_on_exit()
+        assert not datahandler.closed
+
+        datahandler.in_flight.set()
+        task.join(timeout=10)
+        assert not task.is_alive() and datahandler.closed
+
+    def test_exited_task_leaves_the_store_open(self) -> None:
+        datahandler = FakeDataHandler()
+        task = BackgroundTask(datahandler, workers=1)
+        task.start()
+        task.stop()
+        task.join(timeout=10)
+        assert not task.close_store_on_exit() and not datahandler.closed
@@ -0,0 +1,148 @@
+import random
+
+import numpy as np
+import pytest
+from weary_traveler.batch_valuation import ListingTable, profit_pairs, value_listings
+from weary_traveler.estimators import (
+    ESTIMATORS,
+    GROUPED_ESTIMATORS,
+    AdaptiveEstimator,
+    dispersion,
+    grouped_dispersion,
+)
+from weary_traveler.poe_trade_rest import Fetcher, ItemEntry, Listing, ProfitEngine
+from weary_traveler.storage import strat_profit
+
+
+class FakeResponse:
+    def __init__(self, data: dict) -> None:
+        self.data = data
+
+    def json(self) -> dict:
+        return self.data
+
+
+@pytest.fixture
+def groups() -> list[list[float]]:
+    rng = random.Random(0)
+    groups = [[], [5.0], [3.0, 3.0, 3.0], [1.0, 2.0], [10.0, 10.5, 1.0, 80.0]]
+    for _ in range(200):
+        size = rng.randint(1, 30)
+        groups.append([round(rng.lognormvariate(2, 0.5), 1) for _ in range(size)])
+    return groups
+
+
+def flatten(groups: list[list[float]]) -> tuple[np.ndarray, np.ndarray]:
+    offsets = np.cumsum([0] + [len(group) for group in groups])
+    return np.array([p for group in groups for p in group], np.float64), offsets
+
+
+@pytest.mark.parametrize("name", list(ESTIMATORS))
+def test_grouped_estimators_match_scalar(name: str, groups: list) -> None:
+    estimates = GROUPED_ESTIMATORS[name](*flatten(groups))
+    assert np.isnan(estimates[0])
+    expected = [ESTIMATORS[name](group) for group in groups[1:]]
+    assert estimates[1:].tolist() == expected
+
+
+def test_grouped_dispersion_matches_scalar(groups: list) -> None:
+    dispersions = grouped_dispersion(*flatten(groups[1:]))
+    assert dispersions == pytest.approx([dispersion(g) for g in groups[1:]])
+
+
+def test_values_match_apply_listings(ninja_rates) -> None:
+    rng = random.Random(1)
+    results = [
+        [
+            {
+                "listing": {
+                    "price": {
+                        "amount": rng.choice(
+                            [rng.randint(1, 20), rng.randint(100, 900)]
+                        ),
+                        "currency": rng.choice(
+                            ["divine", "chaos", "exalted", "unknown"]
+                        ),
+                    }
+                }
+            }
+            for _ in range(rng.randint(0, 12))
+        ]
+        for _ in range(300)
+    ]
+    values = value_listings(ListingTable.from_results(results))
+
+    for rows, value in zip(results, values.tolist()):
+        entry = ItemEntry("gem", {}, value=-1)
+        listings = Fetcher.extract_listings(FakeResponse({"result": rows}))
+        entry.apply_listings(listings, len(listings), "")
+        assert entry.value == (-1 if np.isnan(value) else value)
+
+
+def test_estimate_many_uses_configured_estimator() -> None:
+    prices, offsets = flatten([[1.0, 2.0, 30.0]])
+    assert AdaptiveEstimator("median").estimate_many(prices, offsets)[0] == 2.0
+
+
+def test_profit_pairs_match_profit_engine() -> None:
+    rng = random.Random(2)
+    entries = [
+        ItemEntry(f"gem{i}", {"level": level}, value=rng.choice([0, 1.5, 2.5, 7.1]))
+        for i in range(30)
+        for level in range(rng.randint(1, 4))
+    ]
+    engine = ProfitEngine()
+    for entry in entries:
+        engine.update_item_entry(entry)
+
+    names = {name: code for code, name in enumerate({e.item_name for e in entries})}
+    buys, sells, profits = profit_pairs(
+        np.array([names[e.item_name] for e in entries]),
+        np.array([e.value for e in entries]),
+    )
+    pairs = {
+        (
+            entries[b].item_name,
+            entries[b].modifiers["level"],
+            entries[s].modifiers["level"],
+        ): p
+        for b, s, p in zip(buys.tolist(), sells.tolist(), profits.tolist())
+    }
+    expected = {
+        (
+            s.item_name,
+            s.buy_item.modifiers["level"],
+            s.sell_item.modifiers["level"],
+        ): s.profit
+        for s in engine.index.top()
+    }
+    assert pairs == expected
+    for b, s, p in zip(buys.tolist(), sells.tolist(), profits.tolist()):
+        assert p == strat_profit(entries[b].value, entries[s].value)
+
+
+def test_profit_engine_load_matches_incremental() -> None:
+    rng = random.Random(3)
+    entries = [
+        ItemEntry(f"gem{i}", {"level": level}, value=round(rng.uniform(0, 50), 1))
+        for i in range(50)
+        for level in range(4)
+    ]
+    loaded = ProfitEngine()
+    loaded.load(entries)
+    incremental = ProfitEngine()
+    for entry in entries:
+        incremental.update_item_entry(entry)
+
+    assert [s.key for s in loaded.ranked()] == [s.key for s in incremental.ranked()]
+    assert [s.profit for s in loaded.ranked()] == [
+        s.profit for s in incremental.ranked()
+    ]
+
+
+def test_listing_objects_are_read_as_divine(ninja_rates) -> None:
+    listings = [[Listing(300, "chaos"), Listing(3, "divine")], []]
+    table = ListingTable.from_listings(listings)
+    assert table.currencies == ["divine"] and len(table) == 2
+    assert table.divine_prices().tolist() == [2.0, 3.0]
+    assert value_listings(table)[0] == 2.5 and np.isnan(value_listings(table)[1])
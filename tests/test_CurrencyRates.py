@@ -0,0 +1,182 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import requests
+from weary_traveler import currency_rates
+from weary_traveler.currency_rates import CurrencyRates, chaos_values_from_overview
+from weary_traveler.poe_trade_rest import Fetcher, Listing
+
+fixtures = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def read_overview() -> dict:
+    with open(os.path.join(fixtures, "ninja_currency.json")) as file:
+        return json.load(file)
+
+
+class FakeResponse:
+    def __init__(self, data: dict) -> None:
+        self.data = data
+
+    def json(self) -> dict:
+        return self.data
+
+    def raise_for_status(self) -> None:
+        pass
+
+
+class TestCurrencyRates:
+    def test_chaos_values_by_trade_id(self) -> None:
+        chaos_values = chaos_values_from_overview(read_overview())
+        assert chaos_values["chaos"] == 1.0
+        assert chaos_values["divine"] == 150.0
+        assert chaos_values["exalted"] == 12.5
+        # no trade id, can't be matched to listings
+        assert len(chaos_values) == 8
+
+    def test_fetch(self, monkeypatch) -> None:
+        requested = []
+
+        def fake_get(url: str, params: dict, **kwargs) -> FakeResponse:
+            requested.append(params)
+            return FakeResponse(read_overview())
+
+        monkeypatch.setattr(currency_rates.requests, "get", fake_get)
+        rates = CurrencyRates()
+        assert rates.rate("chaos") == 1 / 150
+        assert requested == [{"league": "Necropolis", "type": "Currency"}]
+
+    def test_rates_are_cached(self) -> None:
+        rates = CurrencyRates(source=lambda league: {"chaos": 1.0, "divine": 100.0})
+        assert rates.rate("divine") == 1.0
+        assert rates.rate("chaos") == 0.01
+        assert rates.fetches == 1
+
+        rates.ttl = 0
+        rates.clear()
+        rates.rate("chaos")
+        rates.rate("chaos")
+        assert rates.fetches == 3
+
+    def test_concurrent_callers_share_one_fetch(self) -> None:
+        def slow_source(league: str) -> dict[str, float]:
+            time.sleep(0.05)
+            return {"chaos": 1.0, "divine": 100.0}
+
+        rates = CurrencyRates(source=slow_source)
+        threads = [
+            threading.Thread(target=rates.rate, args=("chaos",)) for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert rates.fetches == 1
+
+    def test_failed_fetch_keeps_previous_rates(self) -> None:
+        responses = [{"chaos": 1.0, "divine": 100.0}]
+
+        def flaky_source(league: str) -> dict[str, float]:
+            if not responses:
+                raise requests.ConnectionError("poe.ninja is down")
+            return responses.pop()
+
+        rates = CurrencyRates(ttl=0, retry_after=3600, source=flaky_source)
+        assert rates.rate("chaos") == 0.01
+        assert rates.rate("chaos") == 0.01
+        # retried only after retry_after
+        assert rates.rate("chaos") == 0.01 and rates.fetches == 2
+
+    def test_old_rates_are_read_while_fetching(self) -> None:
+        fetching = threading.Event()
+        release = threading.Event()
+        divines = [100.0]
+
+        def blocking_source(league: str) -> dict[str, float]:
+            if len(divines) > 1:
+                fetching.set()
+                release.wait(5)
+            return {"chaos": 1.0, "divine": divines[-1]}
+
+        rates = CurrencyRates(ttl=0, source=blocking_source)
+        assert rates.rate("chaos") == 0.01
+        divines.append(200.0)
+        refresh = threading.Thread(target=rates.rate, args=("chaos",))
+        refresh.start()
+        assert fetching.wait(5)
+        # the refresh is in flight, other callers don't wait for it
+        assert rates.rate("chaos") == 0.01 and rates.fetches == 2
+        release.set()
+        refresh.join()
+        assert rates.rate("chaos") == 1 / 200
+
+    def test_failed_fetch_is_counted(self) -> None:
+        def failing_source(league: str) -> dict[str, float]:
+            raise requests.ConnectionError("offline")
+
+        errors = currency_rates.metrics.registry.get("currency_rate_errors_total")
+        before = errors.value
+        rates = CurrencyRates(source=failing_source)
+        rates.rate("chaos")
+        assert errors.value == before + 1
+        assert isinstance(rates.last_error, requests.ConnectionError)
+
+    def test_divine_pages_need_no_rates(self) -> None:
+        def failing_source(league: str) -> dict[str, float]:
+            raise AssertionError("rates were fetched")
+
+        rates = CurrencyRates(source=failing_source)
+        prices = rates.to_divine(np.array([1.0, 2.5]), np.array([0, 0]), ["divine"])
+        assert prices.tolist() == [1.0, 2.5] and rates.fetches == 0
+
+    def test_before_first_fetch(self) -> None:
+        def failing_source(league: str) -> dict[str, float]:
+            raise requests.ConnectionError("offline")
+
+        rates = CurrencyRates(source=failing_source)
+        assert rates.rate("chaos") == 1 / 120
+        assert np.isnan(rates.rate("exalted"))
+
+    def test_batch_matches_single_conversions(self, ninja_rates) -> None:
+        currencies = ["divine", "chaos", "exalted", "mirror", "unknown"]
+        codes = np.array([0, 1, 2, 3, 4, 1, 0])
+        amounts = np.array([3.0, 240.0, 7.0, 1.0, 5.0, 33.0, 0.5])
+        prices = Listing.rates.to_divine(amounts, codes, currencies)
+
+        expected = [
+            amount * Listing.rates.rate(currencies[code])
+            for amount, code in zip(amounts.tolist(), codes.tolist())
+        ]
+        assert prices[:4].tolist() == [3.0, 1.6, expected[2], 640.0]
+        assert prices[~np.isnan(prices)].tolist() == [
+            price for price in expected if not np.isnan(price)
+        ]
+        assert np.isnan(prices[4])
+
+
+class TestListingConversion:
+    def test_listing_uses_shared_rates(self, ninja_rates) -> None:
+        assert Listing(300, "chaos").price == 2.0
+        assert Listing(3, "exalted").price == 0.25
+        assert Listing(2, "divine").price == 2
+        assert np.isnan(Listing(1, "unknown").price)
+
+    def test_extract_listings_drops_unpriced(self, ninja_rates) -> None:
+        results = [
+            {"listing": {"price": {"amount": 300, "currency": "chaos"}}},
+            {"listing": {"price": {"amount": 1, "currency": "unknown"}}},
+            {"listing": {}},
+            {
+                "listing": {"price": {"amount": 2, "currency": "divine"}},
+                "item": {"properties": [{"name": "Level", "values": [["5", 0]]}]},
+            },
+        ]
+        listings = Fetcher.extract_listings(FakeResponse({"result": results}))
+        assert [(listing.price, listing.currency) for listing in listings] == [
+            (2.0, "divine"),
+            (2.0, "divine"),
+        ]
+        assert listings[1].gem_level == 5
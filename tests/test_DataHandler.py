@@ -1,8 +1,19 @@
 import pytest
-from weary_traveler.poe_trade_rest import DataHandler, ItemEntry, ProfitStrat
+import requests
+from weary_traveler import poe_trade_rest
+from weary_traveler.poe_trade_rest import (
+    DataHandler,
+    Fetcher,
+    ItemEntry,
+    Listing,
+    ProfitEngine,
+    ProfitStrat,
+)
+from weary_traveler.query_cache import TTLCache
 from datetime import datetime, timedelta
 import os
 import shutil
+import threading
 
 
 @pytest.fixture()
@@ -56,6 +67,44 @@ class TestItemEntry:
         assert item_entry != item_entry2
 
 
+class TestProfitEngine:
+    def test_price_update_reranks_strats(self, item_entry: ItemEntry) -> None:
+        cheap = ItemEntry(**item_entry.__dict__)
+        expensive = ItemEntry(**item_entry.__dict__)
+        expensive.modifiers = {"mod1": 100}
+        expensive.value = 100
+        other_cheap = ItemEntry(**cheap.__dict__)
+        other_cheap.item_name = "test2"
+        other_expensive = ItemEntry(**expensive.__dict__)
+        other_expensive.item_name = "test2"
+        other_expensive.value = 50
+
+        engine = ProfitEngine()
+        engine.load([cheap, expensive, other_cheap, other_expensive])
+        assert [s.item_name for s in engine.ranked()] == ["test1", "test2"]
+
+        other_expensive.value = 200
+        changed, removed = engine.update_item_entry(other_expensive)
+        assert [s.item_name for s in changed] == ["test2"] and removed == []
+        assert engine.ranked(1)[0].profit == round(200 - 12.3, 1)
+
+    def test_strat_removed_when_sell_drops_below_buy(
+        self, item_entry: ItemEntry
+    ) -> None:
+        buy = ItemEntry(**item_entry.__dict__)
+        sell = ItemEntry(**item_entry.__dict__)
+        sell.modifiers = {"mod1": 100}
+        sell.value = 100
+        engine = ProfitEngine()
+        engine.load([buy, sell])
+
+        sell.value = 1
+        changed, removed = engine.update_item_entry(sell)
+        assert removed == [ProfitStrat("test1", buy, sell)]
+        assert changed == [ProfitStrat("test1", sell, buy)]
+        assert engine.get_profit_strats("test1") == changed
+
+
 class TestDataHandler:
     @pytest.fixture
     def datahandler(self, prep_and_clean_data: None) -> DataHandler:
@@ -102,6 +151,26 @@ class TestDataHandler:
         item = datahandler.get_oldest_item_entry()
         assert item == item_entry1 and item != item_entry2
 
+    def test_profitable_entries_are_refreshed_first(
+        self, datahandler: DataHandler, profit_strat: ProfitStrat
+    ) -> None:
+        # the app's DataHandler, with the default scheduler weights
+        now = datetime.now()
+        for item_entry in (profit_strat.buy_item, profit_strat.sell_item):
+            item_entry.updated_at = now - timedelta(minutes=50)
+        cheap_buy = ItemEntry("cheap", {"mod1": 1}, value=5, number_listed=12)
+        cheap_sell = ItemEntry("cheap", {"mod1": 100}, value=5, number_listed=12)
+        for item_entry in (cheap_buy, cheap_sell):
+            item_entry.updated_at = now - timedelta(minutes=70)
+        datahandler.write_item_entries(
+            [profit_strat.buy_item, profit_strat.sell_item, cheap_buy, cheap_sell]
+        )
+        datahandler.update_profit_strats("test1")
+        datahandler.update_profit_strats("cheap")
+
+        names = [datahandler.get_next_item_entry().item_name for _ in range(4)]
+        assert names == ["test1", "test1", "cheap", "cheap"]
+
     def test_initialize_single_item_entry(
         self, item_entry: ItemEntry, datahandler: DataHandler
     ) -> None:
@@ -136,8 +205,381 @@ class TestDataHandler:
         )
         assert profit_strat in profit_strats
 
+    def test_update_profit_strats_pushes_under_the_lock(
+        self, setup_entries, datahandler: DataHandler, profit_strat: ProfitStrat
+    ) -> None:
+        scheduler = datahandler.scheduler
+        push = scheduler.push
+        lock_free = []
+
+        def checked_push(item_entry: ItemEntry, profit: float = 0.0) -> None:
+            # a refresh on another thread has to wait until the push is done
+            def try_lock() -> None:
+                if datahandler._lock.acquire(blocking=False):
+                    datahandler._lock.release()
+                    lock_free.append(item_entry)
+
+            thread = threading.Thread(target=try_lock)
+            thread.start()
+            thread.join()
+            push(item_entry, profit)
+
+        scheduler.push = checked_push
+        datahandler.update_profit_strats(profit_strat.item_name)
+        assert lock_free == []
+        assert len(scheduler) == 2
+
+    def test_profit_strats_share_current_entries(
+        self, setup_entries, datahandler: DataHandler, profit_strat: ProfitStrat
+    ) -> None:
+        datahandler.update_profit_strats(profit_strat.item_name)
+        buy_item = ItemEntry(**profit_strat.buy_item.__dict__)
+        buy_item.value = 50
+        datahandler.write_item_entry(buy_item)
+
+        (strat,) = datahandler.read_all_profit_strats()
+        assert strat.buy_item == buy_item and strat.profit == 50
+        other = datahandler.get_profit_strats_by_item_name(strat.item_name)
+        assert other[0].profit == 50
+
+    def test_new_database_starts_from_snapshot(
+        self, setup_entries, datahandler: DataHandler, profit_strat: ProfitStrat
+    ) -> None:
+        datahandler.update_profit_strats(profit_strat.item_name)
+        datahandler.export_snapshot()
+        datahandler.backend.close()
+        os.remove("data/db/awakened_gems.db")
+
+        restored = DataHandler()
+        assert restored.read_all_profit_strats() == [profit_strat]
+        assert restored.read_all_profit_strats()[0].profit == profit_strat.profit
+
+    def test_incomplete_snapshot_falls_back_to_json(
+        self, setup_entries, datahandler: DataHandler, profit_strat: ProfitStrat
+    ) -> None:
+        datahandler.update_profit_strats(profit_strat.item_name)
+        datahandler.export_snapshot()
+        datahandler.export_json()
+        datahandler.backend.close()
+        os.remove("data/db/awakened_gems.db")
+        os.remove(datahandler.item_entry_snapshot)
+
+        restored = DataHandler()
+        assert restored.read_all_profit_strats() == [profit_strat]
+
     def test_initialize_from_ninja(self, datahandler: DataHandler) -> None:
         datahandler.initialize_from_ninja("Awakened Gems")
         item_entries = datahandler.read_all_item_entries()
         profit_strats = datahandler.read_all_profit_strats()
         assert item_entries != [] and profit_strats != []
+
+    def test_sync_item_entries_diffs_group(self, datahandler: DataHandler) -> None:
+        modifiers = [{"max_gem_level": 1}, {"min_gem_level": 5}]
+        datahandler.sync_item_entries(["gem1", "gem2"], modifiers)
+        kept = datahandler.profit_engine.get_item_entries("gem1")[0]
+        kept.value = 5.0
+        datahandler.write_item_entry(kept)
+
+        added, retired = datahandler.sync_item_entries(["gem1", "gem3"], modifiers)
+
+        assert sorted(e.item_name for e in added) == ["gem3", "gem3"]
+        assert sorted(e.item_name for e in retired) == ["gem2", "gem2"]
+        item_entries = datahandler.read_all_item_entries()
+        assert sorted({e.item_name for e in item_entries}) == ["gem1", "gem3"]
+        assert kept in item_entries
+        assert datahandler.get_profit_strats_by_item_name("gem2") == []
+        assert datahandler.get_profit_strats_by_item_name("gem3") != []
+        assert len(datahandler.scheduler) == 4
+
+    def test_empty_scrape_keeps_the_group(
+        self, datahandler: DataHandler, monkeypatch
+    ) -> None:
+        scrapes = [["Awakened Empower Support", "Awakened Enlighten Support"], []]
+
+        def fake_fetch_data(url: str, mode: str = "auto", name: str = "") -> list[str]:
+            return scrapes.pop(0)
+
+        monkeypatch.setattr(
+            poe_trade_rest.poe_ninja_scraper, "fetch_data", fake_fetch_data
+        )
+        datahandler.initialize_from_ninja("Awakened Gems")
+        strats = datahandler.read_all_profit_strats()
+
+        with pytest.raises(ValueError):
+            datahandler.initialize_from_ninja("Awakened Gems", refresh=True)
+        with pytest.raises(ValueError):
+            datahandler.sync_item_entries([], [{"max_gem_level": 1}])
+
+        assert len(datahandler.read_all_item_entries()) == 4
+        assert datahandler.read_all_profit_strats() == strats
+        # the last good snapshot is still the cached one
+        datahandler.initialize_from_ninja("Awakened Gems")
+        assert scrapes == []
+
+    def test_initialize_from_ninja_uses_snapshot(
+        self, datahandler: DataHandler, monkeypatch
+    ) -> None:
+        scrapes = []
+
+        def fake_fetch_data(url: str, mode: str = "auto", name: str = "") -> list[str]:
+            scrapes.append(url)
+            return ["Awakened Empower Support", "Awakened Enlighten Support"]
+
+        monkeypatch.setattr(
+            poe_trade_rest.poe_ninja_scraper, "fetch_data", fake_fetch_data
+        )
+        datahandler.initialize_from_ninja("Awakened Gems")
+        datahandler.initialize_from_ninja("Awakened Gems")
+        DataHandler(backend=datahandler.backend).initialize_from_ninja("Awakened Gems")
+
+        assert len(scrapes) == 1
+        assert len(datahandler.read_all_item_entries()) == 4
+
+        datahandler.initialize_from_ninja("Awakened Gems", refresh=True)
+        assert len(scrapes) == 2
+
+    def test_listeners_are_notified_once_per_commit(
+        self, item_entry: ItemEntry, datahandler: DataHandler
+    ) -> None:
+        notified = []
+        datahandler.listeners.append(lambda: notified.append(True))
+        with datahandler.batch():
+            datahandler.write_item_entry(item_entry)
+            datahandler.write_item_entry(item_entry)
+            assert notified == []
+        datahandler.write_item_entry(item_entry)
+        assert len(notified) == 2
+
+    def test_concurrent_batches_do_not_clobber(
+        self, item_entry: ItemEntry, datahandler: DataHandler
+    ) -> None:
+        def store(worker: int) -> None:
+            for i in range(20):
+                entry = ItemEntry(**item_entry.__dict__)
+                entry.item_name = f"gem{worker}"
+                entry.modifiers = {"mod1": i}
+                entry.value = i + 1
+                datahandler._store_refreshed_item_entry(entry)
+
+        threads = [threading.Thread(target=store, args=(w,)) for w in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(datahandler.read_all_item_entries()) == 80
+        # every pair of variants of an item has exactly one strat
+        assert len(datahandler.read_all_profit_strats()) == 4 * 20 * 19 // 2
+
+    def test_batch_commits_on_exit(
+        self, item_entry: ItemEntry, datahandler: DataHandler
+    ) -> None:
+        item_entry2 = ItemEntry(**item_entry.__dict__)
+        item_entry2.item_name = "test2"
+        with datahandler.batch():
+            datahandler.write_item_entry(item_entry)
+            datahandler.write_item_entries([item_entry2])
+            assert datahandler.read_all_item_entries() == []
+        item_entries = datahandler.read_all_item_entries()
+        assert item_entry in item_entries and item_entry2 in item_entries
+
+    def test_batch_discards_on_error(
+        self, item_entry: ItemEntry, datahandler: DataHandler
+    ) -> None:
+        with pytest.raises(RuntimeError):
+            with datahandler.batch():
+                datahandler.write_item_entry(item_entry)
+                raise RuntimeError
+        assert datahandler.read_all_item_entries() == []
+
+    def test_update_next_item_entry(
+        self, setup_entries, datahandler: DataHandler, monkeypatch
+    ) -> None:
+        def fake_trade_value(item: ItemEntry) -> None:
+            item.value = 500
+            item.updated_at = datetime.now()
+
+        monkeypatch.setattr(ItemEntry, "get_value_from_trade", fake_trade_value)
+        datahandler.update_next_item_entry()
+
+        values = sorted(item.value for item in datahandler.read_all_item_entries())
+        assert values in ([12.3, 500], [100, 500])
+        best = datahandler.get_ranked_profit_strats()[0]
+        assert best.sell_item.value == 500 and best.profit > 0
+
+    def test_query_profit_strats(
+        self, setup_entries, datahandler: DataHandler, profit_strat: ProfitStrat
+    ) -> None:
+        best = datahandler.query_profit_strats(50, min_listed=5, max_age=1800)
+        assert best == [profit_strat]
+        assert datahandler.query_profit_strats(50, min_listed=13) == []
+        assert datahandler.query_profit_strats(item_name="test2") == []
+
+    def test_update_next_item_entries(
+        self, setup_entries, datahandler: DataHandler, monkeypatch
+    ) -> None:
+        class FakeFetcher(Fetcher):
+            _cache = TTLCache()
+
+            def _search(self) -> tuple[int, tuple[str, ...], str]:
+                return 1, ("id1",), self.query_key
+
+            def _fetch(self, text_result: str) -> list[Listing]:
+                return [Listing(price=200, currency="divine")]
+
+        monkeypatch.setattr(poe_trade_rest, "Fetcher", FakeFetcher)
+        assert datahandler.update_next_item_entries(5) == 2
+
+        item_entries = datahandler.read_all_item_entries()
+        assert [item.value for item in item_entries] == [200, 200]
+        assert len(datahandler.scheduler) == 2
+
+    def test_requests_per_refresh_of_a_level_1_and_20_pair(
+        self, datahandler: DataHandler, monkeypatch
+    ) -> None:
+        # sorted by price, the cheap level 1 gems fill the shared search's
+        # pages and the level 20 gems behind them are never fetched
+        level_1 = {"max_gem_level": 1, "corrupted": "false"}
+        level_20 = {"min_gem_level": 20, "corrupted": "false", "min_quality": 20}
+        listings = {f"a{i}": Listing(1, "divine", gem_level=1) for i in range(40)}
+        for i in range(10):
+            listings[f"b{i}"] = Listing(30, "divine", gem_level=20, quality=20)
+        ids = {
+            ("corrupted",): list(listings),
+            tuple(sorted(level_1)): [f"a{i}" for i in range(40)],
+            tuple(sorted(level_20)): [f"b{i}" for i in range(10)],
+        }
+        requests = {"search": 0, "fetch": 0}
+
+        def fake_search(fetcher: Fetcher) -> tuple[int, tuple[str, ...], str]:
+            requests["search"] += 1
+            found = ids[tuple(sorted(fetcher.modifiers))]
+            return len(found), tuple(found), fetcher.query_key
+
+        def fake_fetch(fetcher: Fetcher, text_result: str) -> list[Listing]:
+            requests["fetch"] += 1
+            return [listings[i] for i in text_result.split(",")]
+
+        monkeypatch.setattr(Fetcher, "_search", fake_search)
+        monkeypatch.setattr(Fetcher, "_fetch", fake_fetch)
+        monkeypatch.setattr(poe_trade_rest.VariantFetcher, "_separate", {})
+        datahandler.write_item_entries(
+            [ItemEntry("gem", dict(level_1)), ItemEntry("gem", dict(level_20))]
+        )
+
+        def refresh() -> tuple[int, int]:
+            monkeypatch.setattr(Fetcher, "_cache", TTLCache())
+            before = dict(requests)
+            datahandler.update_next_item_entries(2)
+            return (
+                requests["search"] - before["search"],
+                requests["fetch"] - before["fetch"],
+            )
+
+        # the shared search pages through level 1 gems only, level 20 falls
+        # back to its own search
+        assert refresh() == (2, 4)
+        # from then on the pair is searched separately, as cheap as it gets
+        assert refresh() == (2, 2)
+        assert refresh() == (2, 2)
+        values = {
+            item.modifiers.get("min_gem_level", 1): item.value
+            for item in datahandler.read_all_item_entries()
+        }
+        assert values == {1: 1, 20: 30}
+
+    def test_valuations_are_recorded_in_history(
+        self, setup_entries, datahandler: DataHandler, profit_strat: ProfitStrat
+    ) -> None:
+        entry = profit_strat.buy_item
+        entry.apply_listings(
+            [
+                Listing(price=20, currency="divine"),
+                Listing(price=22, currency="divine"),
+            ],
+            2,
+            "url",
+        )
+        datahandler._store_refreshed_item_entry(entry)
+        # stored again without new listings
+        datahandler._store_refreshed_item_entry(entry)
+
+        series = datahandler.history.series(entry.item_name, entry.modifiers)
+        assert series.prices.to_pylist() == [[20, 22]]
+        assert series.estimates.tolist() == [entry.value]
+        assert datahandler.price_stats(entry).count == 1
+        assert "listing_prices" not in datahandler.backend.read_item_entries()[0]
+
+    def test_refreshes_are_measured(
+        self, setup_entries, datahandler: DataHandler, profit_strat: ProfitStrat
+    ) -> None:
+        registry = poe_trade_rest.metrics.registry
+        refreshed = registry.get("items_refreshed_total").value
+        writes = datahandler._storage_write.count
+        recomputes = registry.get("profit_recompute_seconds").count
+
+        entry = profit_strat.buy_item
+        entry.apply_listings([Listing(price=20, currency="divine")], 1, "url")
+        datahandler._store_refreshed_item_entry(entry)
+        # a failed fetch applies no listings and is not a refresh
+        entry.apply_listings([], 0, "")
+        datahandler._store_refreshed_item_entry(entry)
+        datahandler.read_all_item_entries()
+
+        assert registry.get("items_refreshed_total").value == refreshed + 1
+        assert registry.get("items_refreshed_per_minute").value >= 1
+        assert datahandler._storage_write.count == writes + 2
+        assert registry.get("profit_recompute_seconds").count == recomputes + 2
+        assert registry.get("storage_read_seconds", store="awakened_gems").count
+
+    def test_failed_refreshes_are_not_stored(
+        self, setup_entries, datahandler: DataHandler, monkeypatch
+    ) -> None:
+        registry = poe_trade_rest.metrics.registry
+        searches = []
+
+        class FlakyFetcher(Fetcher):
+            _cache = TTLCache()
+
+            def _search(self) -> tuple[int, tuple[str, ...], str]:
+                # only the first search gets through
+                searches.append(self.modifiers)
+                if len(searches) > 1:
+                    raise requests.ConnectionError("search failed")
+                return 1, ("id1",), self.query_key
+
+            def _fetch(self, text_result: str) -> list[Listing]:
+                return [Listing(price=200, currency="divine")]
+
+        monkeypatch.setattr(poe_trade_rest, "Fetcher", FlakyFetcher)
+        datahandler.update_next_item_entries(1, batched=False)
+        (refreshed,) = [
+            item for item in datahandler.read_all_item_entries() if item.value == 200
+        ]
+        stored = datahandler.backend.read_item_entries()
+        marked = registry.get("items_refreshed_total").value
+        errors = registry.get("fetch_errors_total").value
+
+        for _ in range(3):
+            FlakyFetcher._cache = TTLCache()
+            datahandler.update_next_item_entries(2, batched=False)
+
+        assert datahandler.backend.read_item_entries() == stored
+        assert registry.get("items_refreshed_total").value == marked
+        assert registry.get("fetch_errors_total").value == errors + 6
+        series = datahandler.history.series(refreshed.item_name, refreshed.modifiers)
+        assert len(series.estimates) == 1
+        # the entries are queued again for the next try
+        assert len(datahandler.scheduler) == 2
+
+    def test_close_closes_history_and_backend(
+        self, setup_entries, datahandler: DataHandler, profit_strat: ProfitStrat
+    ) -> None:
+        entry = profit_strat.buy_item
+        entry.apply_listings([Listing(price=20, currency="divine")], 1, "url")
+        datahandler._store_refreshed_item_entry(entry)
+        history = datahandler.history
+
+        datahandler.close()
+        assert history._log.closed
+        assert datahandler._history is None
@@ -0,0 +1,71 @@
+import threading
+import time
+
+from weary_traveler.data_loader import DataLoader
+
+
+class FakeBackend:
+    def __init__(self) -> None:
+        self.writes = 0
+
+    def version(self) -> int:
+        return self.writes
+
+
+class FakeDataHandler:
+    def __init__(self) -> None:
+        self.backend = FakeBackend()
+        self.reads = 0
+
+    def read_all_profit_strats(self) -> list[int]:
+        self.reads += 1
+        return [self.backend.writes]
+
+
+def wait_for(condition, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class TestDataLoader:
+    def setup_method(self) -> None:
+        self.datahandler = FakeDataHandler()
+        self.built_on: list[threading.Thread] = []
+
+        def build_view(strats: list[int]) -> list[int]:
+            self.built_on.append(threading.current_thread())
+            return sorted(strats, reverse=True)
+
+        self.loader = DataLoader(self.datahandler, build_view, interval=0.05)
+        self.loader.start()
+
+    def teardown_method(self) -> None:
+        self.loader.stop()
+        self.loader.join()
+
+    def test_loads_on_start_and_on_change(self) -> None:
+        assert wait_for(lambda: not self.loader.views.empty())
+        assert self.loader.latest_view() == [0] and self.loader.loads == 1
+        assert self.built_on == [self.loader]
+
+        self.datahandler.backend.writes = 3
+        self.loader.notify()
+        assert wait_for(lambda: self.loader.loads == 2)
+        assert wait_for(lambda: not self.loader.views.empty())
+        assert self.loader.latest_view() == [3]
+
+    def test_idle_polls_do_not_load(self) -> None:
+        assert wait_for(lambda: self.loader.loads == 1)
+        for _ in range(20):
+            self.loader.notify()
+        time.sleep(0.3)
+        assert self.datahandler.reads == 1 and self.loader.loads == 1
+
+    def test_forced_reload(self) -> None:
+        assert wait_for(lambda: self.loader.loads == 1)
+        self.loader.notify(force=True)
+        assert wait_for(lambda: self.loader.loads == 2)
@@ -0,0 +1,44 @@
+import pytest
+from weary_traveler.estimators import (
+    ESTIMATORS,
+    AdaptiveEstimator,
+    dispersion,
+    mad_filtered_mean,
+    trimmed_mean,
+)
+
+prices = [10.0, 10.5, 11.0, 9.5, 10.0, 1.0, 80.0]
+
+
+class TestEstimators:
+    def test_outliers_are_rejected(self) -> None:
+        assert mad_filtered_mean(prices) == pytest.approx(10.2)
+        assert trimmed_mean(prices) == pytest.approx(10.2)
+        assert ESTIMATORS["mean"](prices) > 18
+
+    def test_identical_prices(self) -> None:
+        assert mad_filtered_mean([3.0, 3.0, 3.0]) == 3.0
+        assert dispersion([3.0, 3.0, 3.0]) == 0
+
+    def test_unknown_estimator(self) -> None:
+        with pytest.raises(ValueError):
+            AdaptiveEstimator("mode")
+
+
+class TestAdaptiveEstimator:
+    def test_stops_when_prices_agree(self) -> None:
+        enough = AdaptiveEstimator(min_listings=5).stopping_rule()
+        assert not enough([10.0, 10.0, 10.0])
+        assert enough([10.0, 10.1, 9.9, 10.0, 10.2])
+
+    def test_pages_until_estimate_converges(self) -> None:
+        estimator = AdaptiveEstimator(
+            min_listings=4, max_dispersion=0.05, tolerance=0.05
+        )
+        enough = estimator.stopping_rule()
+        page1 = [1.0, 5.0, 10.0, 20.0]
+        page2 = page1 + [10.0, 11.0, 9.0, 10.0]
+        page3 = page2 + [10.0, 10.0, 11.0, 9.0]
+        assert not enough(page1)
+        assert not enough(page2)
+        assert enough(page3)
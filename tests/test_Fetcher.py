@@ -0,0 +1,181 @@
+import pytest
+import requests
+from weary_traveler import poe_trade_rest
+from weary_traveler.poe_trade_rest import (
+    Fetcher,
+    ItemEntry,
+    Listing,
+    VariantFetcher,
+    listing_matches,
+)
+from weary_traveler.query_cache import TTLCache
+
+level_1 = {"max_gem_level": 1, "corrupted": "false"}
+level_5 = {"min_gem_level": 5, "corrupted": "false", "min_quality": 20}
+
+
+def gem_listing(price: float, level: int, quality: int = 0) -> Listing:
+    return Listing(price=price, currency="divine", gem_level=level, quality=quality)
+
+
+@pytest.fixture
+def trade_results(monkeypatch) -> dict:
+    # result ids per query, listings per result id
+    results: dict = {"searches": [], "fetches": 0, "ids": {}, "listings": {}}
+
+    def fake_search(fetcher: Fetcher) -> tuple[int, tuple[str, ...], str]:
+        results["searches"].append(fetcher.modifiers)
+        ids = results["ids"][tuple(sorted(fetcher.modifiers))]
+        return len(ids), tuple(ids), fetcher.query_key
+
+    def fake_fetch(fetcher: Fetcher, text_result: str) -> list[Listing]:
+        results["fetches"] += 1
+        return [results["listings"][i] for i in text_result.split(",")]
+
+    monkeypatch.setattr(Fetcher, "_search", fake_search)
+    monkeypatch.setattr(Fetcher, "_fetch", fake_fetch)
+    monkeypatch.setattr(Fetcher, "_cache", TTLCache())
+    monkeypatch.setattr(VariantFetcher, "_separate", {})
+    return results
+
+
+class TestFetcher:
+    def test_extract_listing_properties(self) -> None:
+        class Response:
+            def json(self) -> dict:
+                item = {
+                    "corrupted": True,
+                    "properties": [
+                        {"name": "Level", "values": [["5 (Max)", 0]]},
+                        {"name": "Quality", "values": [["+20%", 1]]},
+                    ],
+                }
+                price = {"amount": 3, "currency": "divine"}
+                return {"result": [{"item": item, "listing": {"price": price}}]}
+
+        listing = Fetcher.extract_listings(Response())[0]
+        assert (listing.gem_level, listing.quality, listing.corrupted) == (5, 20, True)
+
+    def test_listing_matches_modifiers(self) -> None:
+        assert listing_matches(level_1, gem_listing(1, level=1))
+        assert not listing_matches(level_1, gem_listing(1, level=5, quality=20))
+        assert listing_matches(level_5, gem_listing(1, level=5, quality=20))
+        assert not listing_matches(level_5, gem_listing(1, level=5, quality=10))
+
+    @pytest.mark.parametrize(
+        "spread, fetches", [(0.0, 1), (0.5, 3)], ids=["stable", "volatile"]
+    )
+    def test_pages_only_while_prices_disagree(
+        self, trade_results: dict, spread: float, fetches: int
+    ) -> None:
+        prices = [10 + spread * 10 * (-1) ** i * (i % 7) for i in range(30)]
+        listings = {
+            f"a{i}": gem_listing(price, level=1) for i, price in enumerate(prices)
+        }
+        trade_results["listings"] = listings
+        trade_results["ids"][tuple(sorted(level_1))] = list(listings)
+
+        fetcher = Fetcher("gem", dict(level_1))
+        fetcher.fetch()
+        assert trade_results["fetches"] == fetches
+        assert len(fetcher.listings) == fetches * 10
+
+    def test_cached_responses_keep_their_time(self, trade_results: dict) -> None:
+        listings = {f"a{i}": gem_listing(10, level=1) for i in range(5)}
+        trade_results["listings"] = listings
+        trade_results["ids"][tuple(sorted(level_1))] = list(listings)
+
+        first = Fetcher("gem", dict(level_1))
+        first.fetch()
+        entry = ItemEntry("gem", dict(level_1))
+        entry.get_value_from_trade()
+
+        # valued from the cache, dated by when the responses arrived
+        assert trade_results["fetches"] == 1
+        assert entry.updated_at == first.fetched_at
+
+    def test_request_errors_are_counted(self, monkeypatch) -> None:
+        registry = poe_trade_rest.metrics.registry
+        errors = registry.get("fetch_errors_total").value
+
+        def failing_search(fetcher: Fetcher) -> tuple[int, tuple[str, ...], str]:
+            raise requests.ConnectionError("offline")
+
+        monkeypatch.setattr(Fetcher, "_search", failing_search)
+        monkeypatch.setattr(Fetcher, "_cache", TTLCache())
+        fetcher = Fetcher("gem", dict(level_1))
+        fetcher.fetch()
+        assert registry.get("fetch_errors_total").value == errors + 1
+        assert isinstance(fetcher.error, requests.ConnectionError)
+
+
+class TestVariantFetcher:
+    def test_one_search_for_all_variants(self, trade_results: dict) -> None:
+        listings = {f"a{i}": gem_listing(1 + i, level=1) for i in range(4)}
+        listings.update(
+            {f"b{i}": gem_listing(10, level=5, quality=20) for i in range(3)}
+        )
+        trade_results["listings"] = listings
+        trade_results["ids"][("corrupted",)] = list(listings)
+
+        entries = [ItemEntry("gem", dict(level_1)), ItemEntry("gem", dict(level_5))]
+        fetcher = VariantFetcher("gem", [e.modifiers for e in entries])
+        fetcher.search()
+        fetcher.fetch_listings()
+        for entry in entries:
+            fetcher.apply_to(entry)
+
+        assert trade_results["searches"] == [{"corrupted": "false"}]
+        assert [entry.value for entry in entries] == [2.5, 10]
+        assert [entry.number_listed for entry in entries] == [4, 3]
+
+    def test_thin_variant_falls_back_to_own_search(self, trade_results: dict) -> None:
+        listings = {f"a{i}": gem_listing(1, level=1) for i in range(20)}
+        listings["b0"] = gem_listing(10, level=5, quality=20)
+        listings.update(
+            {f"c{i}": gem_listing(12, level=5, quality=20) for i in range(3)}
+        )
+        trade_results["listings"] = listings
+        trade_results["ids"][("corrupted",)] = [*(f"a{i}" for i in range(20)), "b0"]
+        trade_results["ids"][tuple(sorted(level_5))] = ["c0", "c1", "c2"]
+
+        entry = ItemEntry("gem", dict(level_5))
+        fetcher = VariantFetcher("gem", [dict(level_1), entry.modifiers], max_pages=2)
+        fetcher.search()
+        fetcher.fetch_listings()
+        fetcher.apply_to(entry)
+
+        assert trade_results["searches"] == [{"corrupted": "false"}, level_5]
+        assert entry.value == 12 and entry.number_listed == 3
+        assert not VariantFetcher.should_share("gem")
+
+    def test_every_variant_rule_sees_every_page(
+        self, trade_results: dict, monkeypatch
+    ) -> None:
+        listings = {}
+        for i in range(15):
+            listings[f"a{i}"] = gem_listing(1 + i, level=1)
+            listings[f"b{i}"] = gem_listing(10, level=5, quality=20)
+        trade_results["listings"] = listings
+        trade_results["ids"][("corrupted",)] = list(listings)
+
+        # the first variant never converges, the second one always does
+        seen: list[list[int]] = []
+
+        def stopping_rule():
+            counts: list[int] = []
+            seen.append(counts)
+
+            def enough(prices) -> bool:
+                counts.append(len(prices))
+                return len(seen) > 1 and counts is seen[1]
+
+            return enough
+
+        monkeypatch.setattr(Fetcher._estimator, "stopping_rule", stopping_rule)
+        fetcher = VariantFetcher("gem", [dict(level_1), dict(level_5)])
+        fetcher.search()
+        fetcher.fetch_listings()
+
+        assert trade_results["fetches"] == 3
+        assert seen == [[5, 10, 15], [5, 10, 15]]
@@ -0,0 +1,68 @@
+import threading
+
+import pytest
+from weary_traveler import poe_trade_rest
+from weary_traveler.groups import GROUPS, Group, get_group, get_group_by_store
+from weary_traveler.poe_trade_rest import DataHandler, initialize_groups
+
+
+class TestGroups:
+    def test_registry(self) -> None:
+        group = get_group("Awakened Gems")
+        assert group.store == "awakened_gems"
+        assert get_group_by_store("awakened_gems") is group
+        assert all(len(g.modifiers_list) >= 2 for g in GROUPS.values())
+        assert len({g.store for g in GROUPS.values()}) == len(GROUPS)
+
+        with pytest.raises(KeyError):
+            get_group("Mirror Shards")
+        with pytest.raises(KeyError):
+            get_group_by_store("mirror_shards")
+
+    def test_store_defaults_to_name(self) -> None:
+        assert Group(name="Unique Jewels", url="").store == "unique_jewels"
+
+
+class TestInitializeGroups:
+    def test_groups_are_scraped_concurrently(self, monkeypatch, tmp_path) -> None:
+        scraped = []
+        lock = threading.Lock()
+        # both scrapes have to be running at once to pass the barrier, one
+        # after the other they break it
+        both_running = threading.Barrier(2, timeout=5)
+
+        def fake_fetch_data(url: str, mode: str = "auto", name: str = "") -> list[str]:
+            with lock:
+                scraped.append(name)
+            both_running.wait()
+            return [f"gem {url[-5:]}"]
+
+        monkeypatch.setattr(
+            poe_trade_rest.poe_ninja_scraper, "fetch_data", fake_fetch_data
+        )
+        monkeypatch.chdir(tmp_path)
+        progress = []
+
+        errors = initialize_groups(
+            ["Awakened Gems", "Vaal Gems", "Mirror Shards"],
+            max_workers=3,
+            on_progress=lambda *status: progress.append(status),
+        )
+
+        assert errors["Awakened Gems"] is None and errors["Vaal Gems"] is None
+        assert isinstance(errors["Mirror Shards"], KeyError)
+        assert ("Mirror Shards", "failed") in progress
+        assert progress.count(("Vaal Gems", "done")) == 1
+        # the scraped tables are saved per group
+        assert sorted(scraped) == sorted(
+            get_group(name).store for name in ("Awakened Gems", "Vaal Gems")
+        )
+
+        # each group lands in its own store
+        for name in ("Awakened Gems", "Vaal Gems"):
+            group = get_group(name)
+            datahandler = DataHandler(store=group.store)
+            item_entries = datahandler.read_all_item_entries()
+            datahandler.backend.close()
+            assert [e.modifiers for e in item_entries] == group.modifiers_list
+            assert {e.item_name for e in item_entries} == {f"gem {group.url[-5:]}"}
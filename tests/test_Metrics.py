@@ -0,0 +1,190 @@
+import json
+import math
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+from weary_traveler import poe_trade_rest, trade_session
+from weary_traveler.metrics import Histogram, Meter, MetricsRegistry
+from weary_traveler.rate_limiter import RateLimiter
+from weary_traveler.trade_session import TradeSession
+from weary_traveler.WearyTraveler import metrics_summary
+
+# the registry the instrumented modules record into
+shared = trade_session.metrics.registry
+
+
+class StatusHandler(BaseHTTPRequestHandler):
+    # Answers every request with `status`
+    protocol_version = "HTTP/1.1"
+    status = 200
+
+    def do_GET(self) -> None:
+        self.send_response(StatusHandler.status)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def status_server():
+    StatusHandler.status = 200
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StatusHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+class FakeResponse:
+    def __init__(self, data: dict) -> None:
+        self.data = data
+
+    def json(self) -> dict:
+        return self.data
+
+
+def value(name: str, **labels) -> float:
+    metric = shared.get(name, **labels)
+    return 0 if metric is None else metric.value
+
+
+class TestMetrics:
+    def test_histogram_buckets_and_quantiles(self) -> None:
+        histogram = Histogram((0.1, 1.0, 10.0))
+        assert math.isnan(histogram.quantile(0.5))
+        for seconds in (0.05, 0.5, 0.5, 0.5, 5.0, 100.0):
+            histogram.observe(seconds)
+        assert histogram.counts == [1, 3, 1, 1]
+        assert histogram.count == 6 and histogram.sum == pytest.approx(106.55)
+        # rank 3 is the second of three observations in (0.1, 1]
+        assert histogram.quantile(0.5) == pytest.approx(0.1 + 0.9 * 2 / 3)
+        # beyond the last bound only the bound is known
+        assert histogram.quantile(1.0) == 10.0
+
+    def test_timer_records_the_block(self) -> None:
+        histogram = Histogram()
+        with histogram.time():
+            pass
+        with pytest.raises(KeyError):
+            with histogram.time():
+                raise KeyError("x")
+        assert histogram.count == 2 and histogram.sum < 0.1
+
+    def test_meter_forgets_old_events(self, monkeypatch) -> None:
+        now = [1000.0]
+        monkeypatch.setattr("weary_traveler.metrics.time.monotonic", lambda: now[0])
+        meter = Meter(window=60)
+        meter.mark()
+        meter.mark(3)
+        now[0] += 30
+        meter.mark()
+        assert meter.recent() == 5
+        now[0] += 30
+        assert meter.recent() == 1 and meter.value == 5
+
+    def test_same_name_and_labels_is_the_same_metric(self) -> None:
+        registry = MetricsRegistry()
+        counter = registry.counter("requests_total", "Requests", endpoint="fetch")
+        assert registry.counter("requests_total", "", endpoint="fetch") is counter
+        assert registry.counter("requests_total", "", endpoint="search") is not counter
+        assert registry.get("requests_total", endpoint="fetch") is counter
+        assert registry.get("missing_total") is None
+        with pytest.raises(ValueError):
+            registry.histogram("requests_total", "", endpoint="fetch")
+
+    def test_prometheus_text(self) -> None:
+        registry = MetricsRegistry()
+        registry.counter("errors_total", "Errors", endpoint='a"b').inc(2)
+        registry.histogram("wait_seconds", "Waits", buckets=(0.5, 1.0)).observe(0.7)
+        registry.gauge("queue_length", "Queued entries", lambda: 4)
+        assert registry.to_prometheus().splitlines() == [
+            "# HELP errors_total Errors",
+            "# TYPE errors_total counter",
+            'errors_total{endpoint="a\\"b"} 2',
+            "# HELP queue_length Queued entries",
+            "# TYPE queue_length gauge",
+            "queue_length 4",
+            "# HELP wait_seconds Waits",
+            "# TYPE wait_seconds histogram",
+            'wait_seconds_bucket{le="0.5"} 0',
+            'wait_seconds_bucket{le="1"} 1',
+            'wait_seconds_bucket{le="+Inf"} 1',
+            "wait_seconds_sum 0.7",
+            "wait_seconds_count 1",
+        ]
+
+    def test_json_and_files(self, tmp_path) -> None:
+        registry = MetricsRegistry()
+        registry.histogram("empty_seconds", "Nothing recorded")
+        registry.counter("done_total", "Done").inc()
+        registry.write(str(tmp_path))
+
+        assert sorted(os.listdir(tmp_path)) == ["metrics.json", "metrics.prom"]
+        with open(tmp_path / "metrics.json") as file:
+            data = json.load(file)
+        assert data["done_total"]["series"] == [{"labels": {}, "value": 1.0}]
+        assert data["empty_seconds"]["series"][0]["p50"] is None
+        with open(tmp_path / "metrics.prom") as file:
+            assert file.read() == registry.to_prometheus()
+
+    def test_serves_both_formats(self) -> None:
+        registry = MetricsRegistry()
+        registry.counter("done_total", "Done").inc()
+        server = registry.serve(port=0)
+        try:
+            url = f"http://127.0.0.1:{server.server_port}"
+            assert "done_total 1" in requests.get(f"{url}/metrics").text
+            assert requests.get(f"{url}/metrics.json").json()["done_total"]
+            assert requests.get(f"{url}/other").status_code == 404
+        finally:
+            server.shutdown()
+
+
+class TestInstrumentation:
+    def test_trade_session_counts_429s_and_errors(self, status_server: str) -> None:
+        session = TradeSession({}, RateLimiter({"probe": [(100, 1.0)]}))
+        rate_limited = value("trade_rate_limited_total", endpoint="probe")
+        errors = value("trade_request_errors_total", endpoint="probe")
+
+        StatusHandler.status = 404
+        session.get("probe", status_server)
+        # last, a 429 blocks the endpoint for a minute
+        StatusHandler.status = 429
+        session.get("probe", status_server)
+
+        assert value("trade_rate_limited_total", endpoint="probe") == rate_limited + 1
+        assert value("trade_request_errors_total", endpoint="probe") == errors + 1
+        assert shared.get("trade_request_seconds", endpoint="probe").count >= 2
+        assert shared.get("trade_rate_limit_wait_seconds", endpoint="probe").count >= 2
+
+    def test_listing_parse_is_timed(self, ninja_rates) -> None:
+        parses = shared.get("listing_parse_seconds").count
+        poe_trade_rest.Fetcher.extract_listings(FakeResponse({"result": []}))
+        assert shared.get("listing_parse_seconds").count == parses + 1
+
+    def test_status_summary(self) -> None:
+        registry = MetricsRegistry()
+        assert metrics_summary(registry, "gems").splitlines()[0] == (
+            "Refreshed/min: 0   Total: 0   429s: 0   Errors: 0   Cache hits: -"
+        )
+        registry.meter("items_refreshed_total", "").mark(3)
+        registry.gauge("items_refreshed_per_minute", "", lambda: 3)
+        registry.counter("trade_rate_limited_total", "", endpoint="fetch").inc()
+        registry.gauge("query_cache_hits", "", lambda: 1)
+        registry.gauge("query_cache_misses", "", lambda: 3)
+        fetch = registry.histogram("trade_request_seconds", "", endpoint="fetch")
+        fetch.observe(0.2)
+        registry.histogram("storage_write_seconds", "", store="gems").observe(0.001)
+
+        rows = metrics_summary(registry, "gems").splitlines()
+        assert rows[0] == (
+            "Refreshed/min: 3   Total: 3   429s: 1   Errors: 0   Cache hits: 25%"
+        )
+        assert "Fetch: 175/242 ms" in rows[1] and "Search: -" in rows[1]
+        assert rows[2].startswith("Read: -   Write: 1/1 ms")
@@ -0,0 +1,204 @@
+import json
+import os
+
+import pytest
+import requests
+from weary_traveler import poe_ninja_scraper
+
+fixtures = os.path.join(os.path.dirname(__file__), "fixtures")
+awakened_url = "https://poe.ninja/economy/affliction/skill-gems?level=5&quality=20&corrupted=No&gemType=Awakened"
+
+
+def read_fixture(filename: str) -> str:
+    with open(os.path.join(fixtures, filename)) as file:
+        return file.read()
+
+
+class FakeResponse:
+    def __init__(self, text: str, status_code: int = 200) -> None:
+        self.text = text
+        self.status_code = status_code
+
+    def json(self) -> dict:
+        return json.loads(self.text)
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error")
+
+
+@pytest.fixture
+def ninja(monkeypatch, tmp_path) -> dict:
+    # serves the recorded api response and page source instead of poe.ninja
+    recorded: dict = {"requests": [], "status_code": 200, "pages": 0}
+
+    def fake_get(url: str, params: dict, **kwargs) -> FakeResponse:
+        recorded["requests"].append((url, params))
+        text = read_fixture("ninja_skill_gems.json")
+        return FakeResponse(text, recorded["status_code"])
+
+    def fake_page_source(url: str) -> str:
+        recorded["pages"] += 1
+        return read_fixture("ninja_skill_gems.html")
+
+    monkeypatch.setattr(poe_ninja_scraper.requests, "get", fake_get)
+    monkeypatch.setattr(poe_ninja_scraper, "fetch_page_source", fake_page_source)
+    monkeypatch.chdir(tmp_path)
+    return recorded
+
+
+awakened_names = [
+    "Awakened Added Fire Damage Support",
+    "Awakened Empower Support",
+    "Awakened Multistrike Support",
+]
+
+
+class TestPoeNinjaScraper:
+    def test_overview_request(self) -> None:
+        params, filters = poe_ninja_scraper.overview_request(awakened_url)
+        assert params == {"league": "Affliction", "type": "SkillGem"}
+        assert filters["gemType"] == ["Awakened"] and filters["level"] == ["5"]
+
+        with pytest.raises(ValueError):
+            poe_ninja_scraper.overview_request("https://poe.ninja/builds/affliction")
+
+    def test_fetch_data_over_http(self, ninja) -> None:
+        names = poe_ninja_scraper.fetch_data(
+            awakened_url, mode="http", name="awakened_gems"
+        )
+
+        assert names == awakened_names
+        assert ninja["requests"][0][1] == {"league": "Affliction", "type": "SkillGem"}
+        assert ninja["pages"] == 0
+        assert os.path.exists("data/ninja/awakened_gems.csv")
+
+    def test_overview_filters(self) -> None:
+        overview = json.loads(read_fixture("ninja_skill_gems.json"))
+
+        data = poe_ninja_scraper.overview_to_frame(overview, {"corrupted": ["Yes"]})
+        assert data["Name"].tolist() == ["Awakened Added Fire Damage Support"]
+        assert data["Corrupt"].tolist() == ["Yes"]
+
+        data = poe_ninja_scraper.overview_to_frame(overview, {"gemType": ["Vaal"]})
+        assert data["Name"].tolist() == ["Vaal Grace"]
+        assert len(poe_ninja_scraper.overview_to_frame(overview)) == 8
+
+    def test_http_and_browser_agree(self, ninja) -> None:
+        http = poe_ninja_scraper.fetch_overview(awakened_url)
+        browser = poe_ninja_scraper.parse_table(read_fixture("ninja_skill_gems.html"))
+
+        assert http["Name"].tolist() == browser["Name"].tolist()
+        assert http["Level"].tolist() == browser["Level"].tolist()
+        assert http["Value"].tolist() == browser["Value"].tolist()
+
+    def test_auto_falls_back_to_browser(self, ninja) -> None:
+        ninja["status_code"] = 503
+        names = poe_ninja_scraper.fetch_data(awakened_url)
+
+        assert names == awakened_names
+        assert ninja["pages"] == 1
+
+    def test_empty_overview_falls_back_to_browser(self, ninja, monkeypatch) -> None:
+        monkeypatch.setattr(
+            poe_ninja_scraper.requests,
+            "get",
+            lambda url, params, **kwargs: FakeResponse('{"lines": []}'),
+        )
+        with pytest.raises(ValueError):
+            poe_ninja_scraper.fetch_data(awakened_url, mode="http")
+
+        assert poe_ninja_scraper.fetch_data(awakened_url) == awakened_names
+        assert ninja["pages"] == 1
+
+    def test_empty_table_is_not_saved(self, ninja, monkeypatch) -> None:
+        monkeypatch.setattr(
+            poe_ninja_scraper, "fetch_page_source", lambda url: table_page(0)
+        )
+        with pytest.raises(ValueError):
+            poe_ninja_scraper.fetch_data(awakened_url, mode="browser", name="gems")
+        assert not os.path.exists("data/ninja/gems.csv")
+
+    def test_unknown_mode(self, ninja) -> None:
+        with pytest.raises(ValueError):
+            poe_ninja_scraper.fetch_data(awakened_url, mode="carrier pigeon")
+
+
+def table_page(rows: int) -> str:
+    # two header rows like the grouped poe.ninja tables
+    body = "".join(
+        f'<tr><td><a href="/gem{i}"><span>Gem {i}</span><span>5/20</span></a></td>'
+        f"<td>5</td><td>{i}.5</td><td>{i}</td></tr>"
+        for i in range(rows)
+    )
+    return (
+        "<html><body><table><thead>"
+        "<tr><th>Name</th><th>Level</th><th>Value</th><th># Listed</th></tr>"
+        '<tr><th colspan="4">Skill Gems</th></tr>'
+        f"</thead><tbody>{body}</tbody></table></body></html>"
+    )
+
+
+class TestTableParser:
+    def test_headers_read_once(self) -> None:
+        data = poe_ninja_scraper.parse_table(table_page(3), backend="html.parser")
+
+        assert data.columns.tolist() == ["Name", "Level", "Value", "# Listed"]
+        assert data["Name"].tolist() == ["Gem 0", "Gem 1", "Gem 2"]
+        assert data["Level"].tolist() == [5, 5, 5]
+        assert data["Value"].tolist() == [0.5, 1.5, 2.5]
+
+    def test_rows_without_numbers_are_skipped(self) -> None:
+        page = table_page(2).replace(
+            "</tbody>",
+            '<tr><td colspan="4">Ad</td></tr>'
+            "<tr><td>Gem 2</td><td></td><td>1.0</td><td>1</td></tr>"
+            "<tr><td>Gem 3</td><td>5</td><td>n/a</td><td>1</td></tr>"
+            "</tbody>",
+        )
+        data = poe_ninja_scraper.parse_table(page, backend="html.parser")
+
+        assert data["Name"].tolist() == ["Gem 0", "Gem 1"]
+        assert data["Level"].dtype == int
+
+    def test_rows_are_streamed(self) -> None:
+        rows = poe_ninja_scraper.iter_table_rows(
+            table_page(2000), backend="html.parser", chunk_size=1024
+        )
+        headers, first = next(rows)
+
+        assert headers[0] == "Name" and first == ["Gem 0", 5, 0.5, "0"]
+        assert sum(1 for _ in rows) == 1999
+
+    def test_lxml_backend_matches(self) -> None:
+        pytest.importorskip("lxml")
+        page = read_fixture("ninja_skill_gems.html")
+        lxml = poe_ninja_scraper.parse_table(page, backend="lxml")
+        stdlib = poe_ninja_scraper.parse_table(page, backend="html.parser")
+        assert lxml.equals(stdlib)
+
+    def test_unknown_backend(self) -> None:
+        with pytest.raises(ValueError):
+            poe_ninja_scraper.parse_table(table_page(1), backend="regex")
+
+
+class TestSnapshot:
+    def test_snapshot_is_cached(self, ninja, monkeypatch) -> None:
+        first = poe_ninja_scraper.fetch_snapshot(awakened_url, mode="http")
+        second = poe_ninja_scraper.fetch_snapshot(awakened_url, mode="http")
+
+        assert len(ninja["requests"]) == 1
+        assert first["changed"] and not second["changed"]
+        assert second["item_names"] == awakened_names
+        assert second["hash"] == first["hash"]
+
+    def test_stale_snapshot_is_refetched(self, ninja, monkeypatch) -> None:
+        poe_ninja_scraper.fetch_snapshot(awakened_url, mode="http")
+        unchanged = poe_ninja_scraper.fetch_snapshot(awakened_url, ttl=0, mode="http")
+        assert len(ninja["requests"]) == 2 and not unchanged["changed"]
+
+        monkeypatch.setattr(
+            poe_ninja_scraper, "fetch_data", lambda url, mode, name: awakened_names[:1]
+        )
+        changed = poe_ninja_scraper.fetch_snapshot(awakened_url, refresh=True)
+        assert changed["changed"] and changed["hash"] != unchanged["hash"]
@@ -0,0 +1,146 @@
+import os
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from weary_traveler.price_history import PriceHistory
+
+modifiers = {"max_gem_level": 1, "corrupted": "false"}
+start = datetime(2024, 1, 1, 12)
+
+
+def fill(history: PriceHistory, name: str, values: list[float]) -> None:
+    for hour, value in enumerate(values):
+        history.append(
+            name, modifiers, start + timedelta(hours=hour), value, 10, [value, value]
+        )
+
+
+class TestPriceHistory:
+    def test_append_and_read_back(self, tmp_path) -> None:
+        history = PriceHistory(str(tmp_path))
+        fill(history, "Enlighten Support", [10.0, 11.0, 12.0])
+        fill(history, "Empower Support", [1.0])
+
+        series = history.series("Enlighten Support", modifiers)
+        assert series.estimates.tolist() == [10.0, 11.0, 12.0]
+        assert series.prices.to_pylist()[0] == [10.0, 10.0]
+        assert len(history.series("Enlighten Support", {"corrupted": "true"})) == 0
+
+    def test_older_observations_are_dropped(self, tmp_path) -> None:
+        history = PriceHistory(str(tmp_path))
+        fill(history, "Enlighten Support", [10.0, 11.0])
+        assert not history.append("Enlighten Support", modifiers, start, 9, 1, [9])
+        assert len(history.series("Enlighten Support", modifiers)) == 2
+
+    def test_compacted_ranges_are_not_copied(self, tmp_path) -> None:
+        history = PriceHistory(str(tmp_path), compact_every=4)
+        fill(history, "Enlighten Support", [10.0, 11.0, 12.0])
+        fill(history, "Empower Support", [1.0])
+        assert sorted(os.listdir(tmp_path)) == ["log.jsonl", "segment-000001.arrow"]
+
+        series = history.series(
+            "Enlighten Support", modifiers, start + timedelta(hours=1)
+        )
+        assert series.estimates.tolist() == [11.0, 12.0]
+        assert not series.timestamps.flags.owndata
+        assert not series.estimates.flags.owndata
+
+    def test_reopen_reads_segments_and_log(self, tmp_path) -> None:
+        history = PriceHistory(str(tmp_path), compact_every=3)
+        fill(history, "Enlighten Support", [10.0, 11.0, 12.0, 13.0, 14.0])
+        history.close()
+
+        reopened = PriceHistory(str(tmp_path), compact_every=3)
+        series = reopened.series("Enlighten Support", modifiers)
+        assert series.estimates.tolist() == [10.0, 11.0, 12.0, 13.0, 14.0]
+        assert not reopened.append(
+            "Enlighten Support", modifiers, start + timedelta(hours=4), 1, 1, []
+        )
+
+    def test_segments_are_merged(self, tmp_path) -> None:
+        history = PriceHistory(str(tmp_path), compact_every=1, fanout=2)
+        fill(history, "Enlighten Support", [10.0, 11.0, 12.0, 13.0])
+        fill(history, "Empower Support", [1.0, 2.0])
+
+        files = sorted(os.listdir(tmp_path))
+        assert len([f for f in files if f.startswith("segment")]) <= 2
+        series = history.series("Enlighten Support", modifiers)
+        assert series.estimates.tolist() == [10.0, 11.0, 12.0, 13.0]
+        history.close()
+        reopened = PriceHistory(str(tmp_path))
+        assert reopened.series("Empower Support", modifiers).estimates.tolist() == [
+            1.0,
+            2.0,
+        ]
+
+    def test_merges_are_tiered(self, tmp_path) -> None:
+        history = PriceHistory(str(tmp_path), compact_every=1, fanout=2)
+        fill(history, "Enlighten Support", [float(v) for v in range(7)])
+        # 7 compactions leave one segment per tier, like 7 in binary
+        assert sorted(s.level for s in history._segments) == [0, 1, 2]
+        series = history.series("Enlighten Support", modifiers)
+        assert series.estimates.tolist() == [float(v) for v in range(7)]
+
+    def test_compaction_does_not_block_appends(self, tmp_path) -> None:
+        history = PriceHistory(str(tmp_path), compact_every=2)
+        writing = threading.Event()
+        release = threading.Event()
+        write_segment = history._write_segment
+
+        def slow_write_segment(*args, **kwargs):
+            writing.set()
+            release.wait(5)
+            return write_segment(*args, **kwargs)
+
+        history._write_segment = slow_write_segment
+        compaction = threading.Thread(
+            target=fill, args=(history, "Enlighten Support", [10.0, 11.0])
+        )
+        compaction.start()
+        assert writing.wait(5)
+        # the compacting records are still read, new ones are appended
+        assert history.append("Empower Support", modifiers, start, 1.0, 1, [1.0])
+        series = history.series("Enlighten Support", modifiers)
+        assert series.estimates.tolist() == [10.0, 11.0]
+        release.set()
+        compaction.join()
+        assert len(history._segments) == 1
+        assert history.series("Enlighten Support", modifiers).estimates.tolist() == [
+            10.0,
+            11.0,
+        ]
+
+    def test_interrupted_compaction_is_finished_on_open(self, tmp_path) -> None:
+        history = PriceHistory(str(tmp_path))
+        fill(history, "Enlighten Support", [10.0, 11.0])
+        history.close()
+        os.replace(tmp_path / "log.jsonl", tmp_path / "log-000001.jsonl")
+
+        reopened = PriceHistory(str(tmp_path))
+        assert sorted(os.listdir(tmp_path)) == ["log.jsonl", "segment-000001.arrow"]
+        series = reopened.series("Enlighten Support", modifiers)
+        assert series.estimates.tolist() == [10.0, 11.0]
+
+    def test_stats(self, tmp_path) -> None:
+        history = PriceHistory(str(tmp_path), compact_every=2)
+        fill(history, "Enlighten Support", [10.0, 11.0, 12.0, 15.0])
+
+        now = start + timedelta(hours=3)
+        stats = history.stats("Enlighten Support", modifiers, window=3 * 3600, now=now)
+        assert stats.count == 4 and stats.last == 15.0
+        assert stats.mean == 12.0
+        assert stats.trend == pytest.approx(1.6)
+        assert stats.volatility == pytest.approx((0.1 + 1 / 11 + 0.25) / 3)
+
+        recent = history.stats("Enlighten Support", modifiers, window=3600, now=now)
+        assert recent.count == 2 and recent.volatility == pytest.approx(0.25)
+        assert history.stats("Empower Support", modifiers).count == 0
+
+    def test_hourly_profile(self, tmp_path) -> None:
+        history = PriceHistory(str(tmp_path))
+        fill(history, "Enlighten Support", [10.0] * 24 + [20.0])
+        profile = history.series("Enlighten Support", modifiers).hourly_profile()
+        assert profile[12] == 15.0 and profile[13] == 10.0
+        assert not np.isnan(profile).any()
@@ -0,0 +1,76 @@
+import threading
+import time
+
+import pytest
+from weary_traveler.poe_trade_rest import Fetcher
+from weary_traveler.query_cache import TTLCache, query_key
+
+
+class TestQueryKey:
+    def test_key_ignores_modifier_order(self) -> None:
+        query1 = Fetcher.build_query("gem", {"min_quality": 20, "corrupted": "false"})
+        query2 = Fetcher.build_query("gem", {"corrupted": "false", "min_quality": 20})
+        assert query_key(query1) == query_key(query2)
+        assert hash(query_key(query1)) == hash(query_key(query2))
+
+    def test_key_differs_per_item(self) -> None:
+        query1 = Fetcher.build_query("gem1", {"max_gem_level": 1})
+        query2 = Fetcher.build_query("gem2", {"max_gem_level": 1})
+        assert query_key(query1) != query_key(query2)
+
+
+class TestTTLCache:
+    def test_hits_and_misses(self) -> None:
+        cache = TTLCache()
+        assert cache.get_or_compute("a", lambda: 1) == 1
+        assert cache.get_or_compute("a", lambda: 2) == 1
+        assert cache.stats() == {"hits": 1, "misses": 1, "coalesced": 0, "size": 1}
+
+    def test_entries_expire(self) -> None:
+        cache = TTLCache(ttl=0.05)
+        cache.get_or_compute("a", lambda: 1)
+        time.sleep(0.1)
+        assert cache.get_or_compute("a", lambda: 2) == 2
+
+    def test_least_recently_used_is_evicted(self) -> None:
+        cache = TTLCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get_or_compute("a", lambda: 0)
+        cache.put("c", 3)
+        assert cache.get_or_compute("b", lambda: 0) == 0
+        assert cache.get_or_compute("c", lambda: 0) == 3
+
+    def test_errors_are_not_cached(self) -> None:
+        cache = TTLCache()
+
+        def fail() -> int:
+            raise ValueError
+
+        with pytest.raises(ValueError):
+            cache.get_or_compute("a", fail)
+        assert cache.get_or_compute("a", lambda: 1) == 1
+
+    def test_concurrent_misses_coalesce(self) -> None:
+        cache = TTLCache()
+        calls = []
+
+        def slow_request() -> str:
+            calls.append(1)
+            time.sleep(0.1)
+            return "response"
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(cache.get_or_compute("q", slow_request))
+            )
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert calls == [1] and results == ["response"] * 5
+        assert cache.coalesced == 4
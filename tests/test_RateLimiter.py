@@ -0,0 +1,153 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+from weary_traveler.poe_trade_rest import Fetcher
+from weary_traveler.query_cache import TTLCache
+from weary_traveler.rate_limiter import RateLimiter
+from weary_traveler.trade_session import TradeSession
+
+
+class StubTradeHandler(BaseHTTPRequestHandler):
+    # Mimics the trade api: rate limit headers on every response, a 429 with
+    # Retry-After once the test flips `locked_out`.
+    locked_out = False
+    rules = {"X-Rate-Limit-Rules": "Ip", "X-Rate-Limit-Ip": "2:1:60"}
+    hits: list[float] = []
+
+    def _respond(self, body: dict) -> None:
+        StubTradeHandler.hits.append(time.monotonic())
+        recent = [t for t in StubTradeHandler.hits if t > time.monotonic() - 1]
+        if StubTradeHandler.locked_out:
+            self.send_response(429)
+            self.send_header("Retry-After", "3")
+        else:
+            self.send_response(200)
+        for header, value in StubTradeHandler.rules.items():
+            self.send_header(header, value)
+        self.send_header("X-Rate-Limit-Ip-State", f"{len(recent)}:1:0")
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(json.dumps(body).encode())
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._respond({"id": "abc", "total": 1, "result": ["id1"]})
+
+    def do_GET(self) -> None:
+        listing = {"listing": {"price": {"amount": 2, "currency": "divine"}}}
+        self._respond({"result": [listing]})
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    StubTradeHandler.locked_out = False
+    StubTradeHandler.hits = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubTradeHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+class TestRateLimiter:
+    def test_learns_policy_from_headers(self, stub_server: str) -> None:
+        limiter = RateLimiter({"search": [(100, 1.0)]})
+        for _ in range(2):
+            assert limiter.try_acquire("search") == 0
+            r = requests.post(stub_server, json={})
+            limiter.update_from_headers("search", r.headers, r.status_code)
+
+        # the stub allows 2 hits per second, both are used up
+        assert 0 < limiter.wait_time("search") <= 1
+        assert limiter.wait_time("fetch") == 0
+
+    def test_retry_after_blocks_endpoint(self, stub_server: str) -> None:
+        StubTradeHandler.locked_out = True
+        limiter = RateLimiter()
+        r = requests.post(stub_server, json={})
+        limiter.update_from_headers("search", r.headers, r.status_code)
+        assert r.status_code == 429
+        assert 2 < limiter.wait_time("search") <= 3
+
+    def test_acquire_is_interruptible(self) -> None:
+        limiter = RateLimiter({"search": [(1, 60.0)]})
+        assert limiter.acquire("search")
+        stop_event = threading.Event()
+        threading.Timer(0.05, stop_event.set).start()
+        start = time.monotonic()
+        assert not limiter.acquire("search", stop_event)
+        assert time.monotonic() - start < 1
+
+    def test_shared_between_threads(self) -> None:
+        limiter = RateLimiter({"fetch": [(5, 0.5)]})
+        acquired: list[float] = []
+
+        def worker() -> None:
+            for _ in range(3):
+                limiter.acquire("fetch")
+                acquired.append(time.monotonic())
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # 5 tokens up front, the other 7 are refilled at 10 per second
+        assert len(acquired) == 12
+        assert time.monotonic() - start >= 0.6
+
+    def test_fetcher_against_stub(self, stub_server: str, monkeypatch) -> None:
+        limiter = RateLimiter()
+        monkeypatch.setattr(Fetcher, "_trade_url", stub_server)
+        monkeypatch.setattr(Fetcher, "_fetch_url", stub_server)
+        monkeypatch.setattr(Fetcher, "_session", TradeSession({}, limiter))
+        monkeypatch.setattr(Fetcher, "_cache", TTLCache())
+
+        fetcher = Fetcher("Awakened Spell Echo", {"max_gem_level": 1})
+        fetcher.fetch()
+        assert fetcher.number_listed == 1
+        assert [listing.price for listing in fetcher.listings] == [2]
+        assert limiter.wait_time("search") == 0
+
+
+def test_stop_event_cancels_fetcher_wait(monkeypatch) -> None:
+    # the search budget is used up for a minute, stopping must not wait for it
+    limiter = RateLimiter({"search": [(1, 60.0)]})
+    limiter.acquire("search")
+    monkeypatch.setattr(Fetcher, "_session", TradeSession({}, limiter))
+    monkeypatch.setattr(Fetcher, "_cache", TTLCache())
+    stop_event = threading.Event()
+    waiting = threading.Event()
+    try_acquire = limiter.try_acquire
+
+    def wait_seen(endpoint: str) -> float:
+        wait = try_acquire(endpoint)
+        if wait > 0:
+            waiting.set()
+        return wait
+
+    monkeypatch.setattr(limiter, "try_acquire", wait_seen)
+    errors = []
+
+    def search() -> None:
+        try:
+            Fetcher("gem", {}, stop_event).search()
+        except requests.ConnectionError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=search)
+    thread.start()
+    assert waiting.wait(timeout=5)
+    stop_event.set()
+    # far less than the minute until the budget is back
+    thread.join(timeout=10)
+    assert not thread.is_alive() and len(errors) == 1
@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+
+import pytest
+from weary_traveler.poe_trade_rest import ItemEntry
+from weary_traveler.scheduler import RefreshScheduler, SchedulerWeights
+
+
+def make_entry(name: str, age: timedelta, value: float = 1.0) -> ItemEntry:
+    return ItemEntry(
+        item_name=name,
+        modifiers={"mod1": 1},
+        value=value,
+        number_listed=10,
+        updated_at=datetime.now() - age,
+    )
+
+
+class TestRefreshScheduler:
+    def test_zero_weights_pop_oldest_first(self) -> None:
+        scheduler = RefreshScheduler(
+            SchedulerWeights(profit=0, volatility=0, number_listed=0)
+        )
+        for name, hours in (("new", 1), ("oldest", 3), ("old", 2)):
+            scheduler.push(make_entry(name, timedelta(hours=hours)))
+
+        names = [scheduler.pop().item_name for _ in range(3)]
+        assert names == ["oldest", "old", "new"]
+        with pytest.raises(IndexError):
+            scheduler.pop()
+
+    def test_profit_moves_entry_forward(self) -> None:
+        scheduler = RefreshScheduler(SchedulerWeights(base_interval=3600, profit=1))
+        scheduler.push(make_entry("unprofitable", timedelta(minutes=30)), profit=0)
+        scheduler.push(make_entry("profitable", timedelta(minutes=10)), profit=10)
+        assert scheduler.pop().item_name == "profitable"
+
+    def test_default_weights_prefer_profit(self) -> None:
+        scheduler = RefreshScheduler()
+        scheduler.push(make_entry("unprofitable", timedelta(minutes=70)), profit=0)
+        scheduler.push(make_entry("profitable", timedelta(minutes=50)), profit=10)
+        # equal entries are still refreshed oldest first
+        scheduler.push(make_entry("older", timedelta(minutes=80)), profit=0)
+        names = [scheduler.pop().item_name for _ in range(3)]
+        assert names == ["profitable", "older", "unprofitable"]
+
+    def test_reinsert_replaces_queued_entry(self) -> None:
+        scheduler = RefreshScheduler()
+        entry = make_entry("a", timedelta(hours=5))
+        scheduler.push(entry)
+        scheduler.push(make_entry("b", timedelta(hours=1)))
+
+        refreshed = make_entry("a", timedelta(0), value=2.0)
+        scheduler.push(refreshed)
+        assert len(scheduler) == 2
+        assert [scheduler.pop().item_name for _ in range(2)] == ["b", "a"]
+        assert scheduler.volatility(refreshed) > 0
+
+    def test_seeded_volatility_moves_entry_forward(self) -> None:
+        scheduler = RefreshScheduler(SchedulerWeights(volatility=10))
+        volatile = make_entry("volatile", timedelta(minutes=10))
+        scheduler.seed_volatility(volatile, 0.5)
+        scheduler.push(make_entry("stable", timedelta(minutes=30)))
+        scheduler.push(volatile)
+        assert scheduler.volatility(volatile) == 0.5
+        assert scheduler.pop().item_name == "volatile"
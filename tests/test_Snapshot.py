@@ -0,0 +1,110 @@
+from datetime import datetime
+
+import pytest
+from weary_traveler.poe_trade_rest import ItemEntry, ProfitStrat
+from weary_traveler.snapshot import EntryTable, read_snapshot, write_snapshot
+from weary_traveler.storage import JsonStorage, SqliteStorage
+
+
+@pytest.fixture
+def item_entries() -> dict:
+    modifiers = {"max_gem_level": 1, "corrupted": "false"}
+    return {
+        3: {
+            "item_name": "Enlighten Support",
+            "modifiers": modifiers,
+            "url": "test_url",
+            "value": 12.3,
+            "number_listed": 12,
+            "updated_at": datetime(2024, 1, 1, 0, 0, 0, 1),
+        },
+        7: {
+            "item_name": "Empower Support",
+            "modifiers": modifiers,
+            "url": "",
+            "value": 0.0,
+            "number_listed": 0,
+            # never valued
+            "updated_at": datetime(1, 1, 1, 0, 0, 0, 1),
+        },
+        9: {
+            "item_name": "Enlighten Support",
+            "modifiers": {"min_gem_level": 5},
+            "url": "test_url2",
+            "value": 1234.5,
+            "number_listed": 3,
+            "updated_at": "2024-01-02 12:30:00.250000",
+        },
+    }
+
+
+class TestEntryTable:
+    def test_round_trip(self, item_entries: dict, tmp_path) -> None:
+        table = EntryTable.from_item_entries(item_entries)
+        assert table.names == ["Enlighten Support", "Empower Support"]
+        assert len(table.modifier_sets) == 2
+
+        files = str(tmp_path / "entries.arrow"), str(tmp_path / "strats.arrow")
+        write_snapshot(*files, table, [(7, 3), (3, 9)])
+        loaded, pairs = read_snapshot(*files)
+
+        item_entries[9]["updated_at"] = datetime(2024, 1, 2, 12, 30, 0, 250000)
+        assert loaded.to_item_entries() == item_entries
+        assert loaded.item_entry(2) == item_entries[9]
+        assert pairs == [(7, 3), (3, 9)]
+
+    def test_columns_are_not_copied(self, item_entries: dict, tmp_path) -> None:
+        files = str(tmp_path / "entries.arrow"), str(tmp_path / "strats.arrow")
+        write_snapshot(*files, EntryTable.from_item_entries(item_entries), [])
+        loaded, _ = read_snapshot(*files)
+        assert not loaded.values.flags.owndata
+        assert not loaded.updated_at.flags.owndata
+
+    def test_empty(self, tmp_path) -> None:
+        files = str(tmp_path / "entries.arrow"), str(tmp_path / "strats.arrow")
+        write_snapshot(*files, EntryTable.from_item_entries({}), [])
+        loaded, pairs = read_snapshot(*files)
+        assert len(loaded) == 0 and loaded.to_item_entries() == {} and pairs == []
+
+
+@pytest.mark.parametrize("source", ["sqlite", "json"])
+def test_storage_snapshot_round_trip(source: str, item_entries: dict, tmp_path) -> None:
+    if source == "sqlite":
+        backend = SqliteStorage(str(tmp_path / "source.db"))
+    else:
+        backend = JsonStorage(
+            str(tmp_path / "items.json"), str(tmp_path / "strats.json")
+        )
+    backend.upsert_item_entries(item_entries.values())
+    strat = ProfitStrat(
+        "Enlighten Support",
+        ItemEntry(**item_entries[3]),
+        ItemEntry(**item_entries[9]),
+    )
+    backend.upsert_profit_strat(
+        {
+            "item_name": strat.item_name,
+            "buy_item": item_entries[3],
+            "sell_item": item_entries[9],
+        }
+    )
+    files = str(tmp_path / "entries.arrow"), str(tmp_path / "strats.arrow")
+    backend.export_snapshot(*files)
+
+    imported = SqliteStorage(str(tmp_path / "imported.db"))
+    imported.import_snapshot(*files)
+    # the JSON backend keeps the datetimes it was given, SQLite their text
+    assert [
+        (e["item_name"], e["modifiers"], e["value"], str(e["updated_at"]))
+        for e in imported.read_item_entries()
+    ] == [
+        (e["item_name"], e["modifiers"], e["value"], str(e["updated_at"]))
+        for e in backend.read_item_entries()
+    ]
+    (profit_strat,) = imported.read_profit_strats()
+    assert profit_strat["profit"] == strat.profit == 1222.2
+
+
+def test_strats_are_slotted() -> None:
+    strat = ProfitStrat("gem", ItemEntry("gem", {}), ItemEntry("gem", {"a": 1}))
+    assert not hasattr(strat, "__dict__")
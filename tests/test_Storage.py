@@ -0,0 +1,231 @@
+import json
+import sqlite3
+
+import pytest
+from weary_traveler.storage import JsonStorage, SqliteStorage, StorageBackend
+
+
+@pytest.fixture
+def item_entry() -> dict:
+    return {
+        "item_name": "test1",
+        "modifiers": {"mod1": 1, "mod2": "a"},
+        "url": "test_url",
+        "value": 12.3,
+        "number_listed": 12,
+        "updated_at": "2024-01-01 00:00:00.000001",
+    }
+
+
+@pytest.fixture
+def profit_strat(item_entry: dict) -> dict:
+    sell_item = dict(item_entry, modifiers={"mod1": 100}, value=100)
+    return {
+        "item_name": "test1",
+        "buy_item": item_entry,
+        "sell_item": sell_item,
+        "profit": 87.7,
+    }
+
+
+@pytest.fixture(params=["sqlite", "json"])
+def backend(request, tmp_path) -> StorageBackend:
+    if request.param == "sqlite":
+        return SqliteStorage(str(tmp_path / "test.db"))
+    return JsonStorage(str(tmp_path / "items.json"), str(tmp_path / "strats.json"))
+
+
+class TestStorage:
+    def test_upsert_is_keyed_on_name_and_modifiers(
+        self, backend: StorageBackend, item_entry: dict
+    ) -> None:
+        backend.upsert_item_entry(item_entry)
+        # same modifiers in a different order should hit the same key
+        updated = dict(item_entry, modifiers={"mod2": "a", "mod1": 1}, value=1.0)
+        backend.upsert_item_entry(updated)
+        backend.upsert_item_entry(dict(item_entry, modifiers={"mod1": 2}))
+
+        entries = backend.read_item_entries()
+        assert len(entries) == 2
+        assert [e["value"] for e in entries if e["modifiers"]["mod1"] == 1] == [1.0]
+
+    def test_read_by_item_name(self, backend: StorageBackend, item_entry: dict) -> None:
+        backend.upsert_item_entry(item_entry)
+        backend.upsert_item_entry(dict(item_entry, item_name="test2"))
+        assert [e["item_name"] for e in backend.read_item_entries("test2")] == ["test2"]
+
+    def test_json_round_trip(
+        self, backend: StorageBackend, item_entry: dict, profit_strat: dict, tmp_path
+    ) -> None:
+        backend.upsert_item_entry(item_entry)
+        backend.upsert_profit_strat(profit_strat)
+        item_file = str(tmp_path / "export_items.json")
+        strat_file = str(tmp_path / "export_strats.json")
+        backend.export_json(item_file, strat_file)
+
+        imported = SqliteStorage(str(tmp_path / "imported.db"))
+        assert imported.is_empty()
+        imported.import_json(item_file, strat_file)
+        # the sell entry was only known from the strat and is stored with it
+        sell_item = profit_strat["sell_item"]
+        assert imported.read_item_entries() == [item_entry, sell_item]
+        assert imported.read_profit_strats() == [profit_strat]
+
+    def test_strats_reference_entries(
+        self, backend: StorageBackend, item_entry: dict, profit_strat: dict
+    ) -> None:
+        backend.upsert_profit_strat(profit_strat)
+        # a stale copy in a strat never overwrites the stored entry
+        stale = dict(profit_strat, buy_item=dict(item_entry, value=50))
+        backend.upsert_profit_strat(stale)
+        backend.upsert_item_entry(dict(item_entry, value=40))
+
+        (strat,) = backend.read_profit_strats()
+        assert strat["buy_item"]["value"] == 40 and strat["profit"] == 60
+        ids = backend.read_profit_strat_ids()
+        assert ids == [tuple(backend.read_item_entries_by_id())]
+
+    def test_modifier_sets_are_interned(
+        self, backend: StorageBackend, item_entry: dict
+    ) -> None:
+        backend.upsert_item_entries(
+            [dict(item_entry, item_name=f"gem{i}") for i in range(3)]
+        )
+        first, *others = backend.read_item_entries()
+        assert all(e["modifiers"] is first["modifiers"] for e in others)
+
+    def test_deleting_an_entry_deletes_its_strats(
+        self, backend: StorageBackend, item_entry: dict, profit_strat: dict
+    ) -> None:
+        backend.upsert_profit_strat(profit_strat)
+        backend.upsert_profit_strat(
+            dict(profit_strat, sell_item=dict(item_entry, modifiers={"mod1": 3}))
+        )
+        backend.delete_item_entries([("test1", '{"mod1": 100}')])
+        (strat,) = backend.read_profit_strats()
+        assert strat["sell_item"]["modifiers"] == {"mod1": 3}
+
+    def test_delete_profit_strats_keeps_entries(
+        self, backend: StorageBackend, profit_strat: dict
+    ) -> None:
+        backend.upsert_profit_strat(profit_strat)
+        backend.delete_profit_strats(
+            [("test1", '{"mod1": 1, "mod2": "a"}', '{"mod1": 100}')]
+        )
+        assert backend.read_profit_strats() == []
+        assert len(backend.read_item_entries()) == 2
+
+    def test_import_legacy_json(
+        self, item_entry: dict, profit_strat: dict, tmp_path
+    ) -> None:
+        # older exports are lists of entries and of strats with embedded copies
+        item_file = tmp_path / "items.json"
+        strat_file = tmp_path / "strats.json"
+        item_file.write_text(json.dumps([item_entry]))
+        strat_file.write_text(json.dumps([profit_strat]))
+
+        backend = JsonStorage(str(item_file), str(strat_file))
+        assert backend.read_profit_strats() == [profit_strat]
+        backend.upsert_item_entry(dict(item_entry, value=1.0))
+        assert json.loads(strat_file.read_text()) == [[0, 1]]
+
+    def test_sqlite_migrates_legacy_tables(
+        self, item_entry: dict, profit_strat: dict, tmp_path
+    ) -> None:
+        db_file = str(tmp_path / "legacy.db")
+        conn = sqlite3.connect(db_file)
+        conn.executescript("""
+            CREATE TABLE item_entries (
+                item_name TEXT, modifiers TEXT, url TEXT, value REAL,
+                number_listed INTEGER, updated_at TEXT
+            );
+            CREATE TABLE profit_strats (
+                item_name TEXT, buy_modifiers TEXT, sell_modifiers TEXT,
+                buy_item TEXT, sell_item TEXT, profit REAL
+            );
+            """)
+        conn.execute(
+            "INSERT INTO item_entries VALUES (?, ?, ?, ?, ?, ?)",
+            SqliteStorage._item_entry_row(item_entry),
+        )
+        conn.execute(
+            "INSERT INTO profit_strats VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                "test1",
+                "",
+                "",
+                json.dumps(profit_strat["buy_item"]),
+                json.dumps(profit_strat["sell_item"]),
+                87.7,
+            ),
+        )
+        conn.commit()
+        conn.close()
+
+        backend = SqliteStorage(db_file)
+        assert backend.read_profit_strats() == [profit_strat]
+        assert SqliteStorage(db_file).read_item_entries()[0] == item_entry
+
+    def test_delete_item_entries(
+        self, backend: StorageBackend, item_entry: dict
+    ) -> None:
+        backend.upsert_item_entries([item_entry, dict(item_entry, item_name="test2")])
+        backend.delete_item_entries([("test2", '{"mod1": 1, "mod2": "a"}')])
+        assert [e["item_name"] for e in backend.read_item_entries()] == ["test1"]
+
+    def test_apply_batch(
+        self, backend: StorageBackend, item_entry: dict, profit_strat: dict
+    ) -> None:
+        backend.upsert_item_entry(dict(item_entry, item_name="test2"))
+        backend.apply_batch(
+            [dict(item_entry, value=5.0)],
+            [profit_strat],
+            [],
+            [("test2", '{"mod1": 1, "mod2": "a"}')],
+        )
+        (strat,) = backend.read_profit_strats()
+        assert strat["buy_item"]["value"] == 5.0
+        assert [e["item_name"] for e in backend.read_item_entries()] == [
+            "test1",
+            "test1",
+        ]
+
+    def test_sqlite_batch_is_one_transaction(
+        self, item_entry: dict, profit_strat: dict, tmp_path
+    ) -> None:
+        backend = SqliteStorage(str(tmp_path / "test.db"))
+        # the malformed key fails the last statement of the batch
+        with pytest.raises(sqlite3.ProgrammingError):
+            backend.apply_batch([item_entry], [profit_strat], [], [("test1",)])
+        assert backend.is_empty()
+
+    def test_version_moves_with_writes(
+        self, backend: StorageBackend, item_entry: dict
+    ) -> None:
+        version = backend.version()
+        assert backend.version() == version
+        backend.upsert_item_entry(item_entry)
+        assert backend.version() != version
+
+    def test_sqlite_version_sees_other_connections(
+        self, item_entry: dict, tmp_path
+    ) -> None:
+        reader = SqliteStorage(str(tmp_path / "shared.db"))
+        writer = SqliteStorage(str(tmp_path / "shared.db"))
+        version = reader.version()
+        writer.upsert_item_entry(item_entry)
+        assert reader.version() != version
+
+    def test_json_reloads_files_written_elsewhere(
+        self, item_entry: dict, tmp_path
+    ) -> None:
+        files = (str(tmp_path / "items.json"), str(tmp_path / "strats.json"))
+        reader = JsonStorage(*files)
+        writer = JsonStorage(*files)
+        version = reader.version()
+        writer.upsert_item_entry(item_entry)
+        assert reader.version() != version
+        assert reader.read_item_entries() == [item_entry]
+        # a write of the reader keeps the other backend's entries
+        reader.upsert_item_entry(dict(item_entry, item_name="test2"))
+        assert len(writer.read_item_entries()) == 2
@@ -0,0 +1,113 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from weary_traveler.poe_trade_rest import ItemEntry, ProfitEngine, ProfitStrat
+from weary_traveler.strat_index import StratIndex
+
+now = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def make_strats(count: int, seed: int = 0) -> list[ProfitStrat]:
+    rng = random.Random(seed)
+    strats = []
+    for i in range(count):
+        name = f"gem{i % 7}"
+        buy = ItemEntry(
+            name,
+            {"level": 1},
+            value=rng.randint(1, 20),
+            number_listed=rng.randint(0, 10),
+        )
+        sell = ItemEntry(
+            name,
+            {"level": 5, "variant": i},
+            value=rng.randint(1, 60),
+            number_listed=rng.randint(0, 10),
+            updated_at=now - timedelta(minutes=rng.randint(0, 120)),
+        )
+        strats.append(ProfitStrat(name, buy, sell))
+    return strats
+
+
+def full_scan(
+    strats: list[ProfitStrat],
+    limit: int,
+    item_name: str | None = None,
+    min_profit: float | None = None,
+    min_listed: int = 0,
+    max_age: float | None = None,
+) -> list[ProfitStrat]:
+    matching = [
+        s
+        for s in strats
+        if (item_name is None or s.item_name == item_name)
+        and (min_profit is None or s.profit >= min_profit)
+        and min(s.buy_item.number_listed, s.sell_item.number_listed) >= min_listed
+        and (
+            max_age is None
+            or s.sell_item.updated_at >= now - timedelta(seconds=max_age)
+        )
+    ]
+    return sorted(matching, key=lambda s: (-s.profit, s.key))[:limit]
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        {},
+        {"item_name": "gem3"},
+        {"min_profit": 25},
+        {"min_listed": 5},
+        {"max_age": 600},
+        {"max_age": 3600, "min_listed": 3},
+        {"item_name": "gem1", "max_age": 1800, "min_listed": 2},
+    ],
+)
+def test_top_matches_full_scan(query: dict) -> None:
+    strats = make_strats(300)
+    index = StratIndex()
+    index.load(strats)
+    assert index.top(20, now=now, **query) == full_scan(strats, 20, **query)
+
+
+def test_iter_top_is_lazy() -> None:
+    index = StratIndex()
+    index.load(make_strats(100))
+    best = index.iter_top(min_listed=1)
+    first = next(best)
+    assert first == index.top(1, min_listed=1)[0]
+
+
+def test_upsert_and_remove_keep_indexes_in_sync() -> None:
+    strats = make_strats(50)
+    index = StratIndex()
+    index.load(strats)
+    strats[0].sell_item.value = 1000
+    strats[0].sell_item.updated_at = now
+    strats[0].update_profit()
+    index.upsert(strats[0])
+    index.remove(strats[1].key)
+
+    assert len(index) == 49 and strats[1].key not in index
+    assert index.top(1, max_age=1, now=now) == [strats[0]]
+    assert index.top(60, now=now) == full_scan(strats[2:] + strats[:1], 60)
+    assert strats[1] not in index.get_profit_strats(strats[1].item_name)
+
+
+def test_profit_engine_maintains_index() -> None:
+    engine = ProfitEngine()
+    low = ItemEntry("gem", {"level": 1}, value=5, number_listed=8)
+    high = ItemEntry("gem", {"level": 20}, value=40, number_listed=2, updated_at=now)
+    engine.load([low, high])
+    assert [s.profit for s in engine.index.top(min_listed=2)] == [35]
+    assert engine.index.top(min_listed=3) == []
+
+    high.value = 2
+    engine.update_item_entry(high)
+    # the strat flips direction, the old one is dropped from every index
+    assert [s.profit for s in engine.index.top()] == [3]
+    assert engine.index.top(item_name="gem", max_age=60, now=now) == []
+
+    engine.remove_item_entry(low)
+    assert len(engine.index) == 0
@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+
+import pytest
+from weary_traveler.poe_trade_rest import ItemEntry, ProfitStrat
+from weary_traveler.table_model import StratTableModel
+
+now = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def make_strat(
+    name: str, buy: float, sell: float, listed: int = 10, age_minutes: int = 0
+) -> ProfitStrat:
+    updated_at = now - timedelta(minutes=age_minutes)
+    buy_item = ItemEntry(name, {"gem_level": 1}, value=buy, number_listed=listed)
+    sell_item = ItemEntry(
+        name,
+        {"gem_level": 20},
+        value=sell,
+        number_listed=listed,
+        updated_at=updated_at,
+    )
+    return ProfitStrat(name, buy_item, sell_item)
+
+
+@pytest.fixture
+def model() -> StratTableModel:
+    return StratTableModel(
+        [
+            make_strat("Enlighten Support", 10, 40, listed=2, age_minutes=5),
+            make_strat("Empower Support", 10, 60, listed=8, age_minutes=90),
+            make_strat("Enhance Support", 10, 20, listed=20, age_minutes=30),
+            make_strat("Awakened Multistrike Support", 10, 30, age_minutes=600),
+        ]
+    )
+
+
+def names(model: StratTableModel) -> list[str]:
+    return [strat.item_name for strat in model.window(0, len(model))]
+
+
+class TestStratTableModel:
+    def test_sorts(self, model: StratTableModel) -> None:
+        assert names(model) == [
+            "Empower Support",
+            "Enlighten Support",
+            "Awakened Multistrike Support",
+            "Enhance Support",
+        ]
+        model.sort_by("item_name")
+        assert names(model) == sorted(names(model))
+        model.sort_by("staleness")
+        assert names(model)[0] == "Awakened Multistrike Support"
+        assert names(model)[-1] == "Enlighten Support"
+
+    def test_unknown_sort_key(self, model: StratTableModel) -> None:
+        with pytest.raises(ValueError):
+            model.sort_by("price")
+
+    def test_filters_combine(self, model: StratTableModel) -> None:
+        model.filter_min_profit(20)
+        assert names(model) == [
+            "Empower Support",
+            "Enlighten Support",
+            "Awakened Multistrike Support",
+        ]
+        model.filter_min_listed(5)
+        assert names(model) == ["Empower Support", "Awakened Multistrike Support"]
+        model.filter_max_age(3600, now=now)
+        assert names(model) == []
+        model.filter_min_listed(None)
+        assert names(model) == ["Enlighten Support"]
+        model.filter_min_profit(None)
+        model.filter_max_age(None)
+        assert len(model) == 4
+
+    def test_item_name_refines(self, model: StratTableModel) -> None:
+        model.filter_item_name("en")
+        assert "Empower Support" not in names(model) and len(model) == 3
+        model.filter_item_name("enl")
+        assert names(model) == ["Enlighten Support"]
+        # a shorter text is not a refinement and matches again
+        model.filter_item_name("E")
+        assert len(model) == 4
+        model.filter_item_name("awakened")
+        assert names(model) == ["Awakened Multistrike Support"]
+        model.filter_item_name("")
+        assert len(model) == 4
+
+    def test_window(self, model: StratTableModel) -> None:
+        assert [s.item_name for s in model.window(1, 2)] == [
+            "Enlighten Support",
+            "Awakened Multistrike Support",
+        ]
+        assert model.window(10, 5) == []
+
+    def test_empty(self) -> None:
+        model = StratTableModel([])
+        model.sort_by("staleness")
+        model.filter_item_name("gem")
+        model.filter_min_profit(1)
+        assert len(model) == 0 and model.window(0, 10) == []
+
+    def test_never_valued(self) -> None:
+        # entries that were never valued are dated year 1
+        buy_item = ItemEntry("Enlighten Support", {"gem_level": 1})
+        sell_item = ItemEntry("Enlighten Support", {"gem_level": 20})
+        model = StratTableModel([ProfitStrat("Enlighten Support", buy_item, sell_item)])
+        model.filter_max_age(3600, now=now)
+        assert len(model) == 0
+
+    def test_never_valued_sort_stalest_first(self) -> None:
+        # right after Initialize Library no entry has been valued yet
+        fresh = make_strat("Enhance Support", 10, 20)
+        buy_item = ItemEntry("Enlighten Support", {"gem_level": 1})
+        sell_item = ItemEntry("Enlighten Support", {"gem_level": 20})
+        model = StratTableModel(
+            [fresh, ProfitStrat("Enlighten Support", buy_item, sell_item)]
+        )
+        model.sort_by("staleness")
+        assert names(model) == ["Enlighten Support", "Enhance Support"]
+        model.filter_max_age(3600, now=now)
+        assert names(model) == ["Enhance Support"]
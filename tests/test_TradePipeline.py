@@ -0,0 +1,125 @@
+import threading
+import time
+
+import requests
+from weary_traveler import trade_pipeline
+from weary_traveler.poe_trade_rest import ItemEntry
+from weary_traveler.trade_pipeline import TradePipeline
+
+
+class FakeFetcher:
+    # Stands in for Fetcher: each call blocks like a rate limited request
+    delay = 0.1
+    failing: set[str] = set()
+
+    def __init__(self, group: list[ItemEntry]) -> None:
+        self.item_name = group[0].item_name
+        self.listings = []
+        self.number_listed = 0
+        self.result_id = ""
+
+    def _call(self) -> None:
+        time.sleep(self.delay)
+
+    def search(self) -> None:
+        self._call()
+        if self.item_name in self.failing:
+            raise requests.ConnectionError("search failed")
+        self.number_listed = 3
+        self.result_id = self.item_name
+
+    def fetch_listings(self) -> None:
+        self._call()
+        self.listings = [FakeListing(2.0), FakeListing(4.0)]
+
+    def apply_to(self, item_entry: ItemEntry) -> None:
+        item_entry.apply_listings(self.listings, self.number_listed, "")
+
+
+class FakeListing:
+    def __init__(self, price: float) -> None:
+        self.price = price
+
+
+def make_groups(count: int) -> list[list[ItemEntry]]:
+    return [
+        [ItemEntry(item_name=f"gem{i}", modifiers={"mod1": 1})] for i in range(count)
+    ]
+
+
+class TestTradePipeline:
+    def setup_method(self) -> None:
+        FakeFetcher.failing = set()
+
+    def test_overlaps_search_and_fetch(self, monkeypatch) -> None:
+        # the first fetch waits for the last search, which only finishes if
+        # the searches go on while a fetch is running
+        groups = make_groups(6)
+        last_searched = threading.Event()
+        overlapped = []
+        search, fetch_listings = FakeFetcher.search, FakeFetcher.fetch_listings
+
+        def searched(fetcher: FakeFetcher) -> None:
+            search(fetcher)
+            if fetcher.item_name == "gem5":
+                last_searched.set()
+
+        def fetched(fetcher: FakeFetcher) -> None:
+            if fetcher.item_name == "gem0":
+                overlapped.append(last_searched.wait(timeout=5))
+            fetch_listings(fetcher)
+
+        monkeypatch.setattr(FakeFetcher, "delay", 0)
+        monkeypatch.setattr(FakeFetcher, "search", searched)
+        monkeypatch.setattr(FakeFetcher, "fetch_listings", fetched)
+        results: list[ItemEntry] = []
+        pipeline = TradePipeline(FakeFetcher, search_workers=2, fetch_workers=2)
+        pipeline.run_sync(groups, results.append)
+
+        assert overlapped == [True]
+        assert sorted(e.item_name for e in results) == [g[0].item_name for g in groups]
+        assert all(e.value == 3.0 and e.number_listed == 3 for e in results)
+
+    def test_failed_search_is_counted_not_streamed(self) -> None:
+        FakeFetcher.failing = {"gem1"}
+        errors = trade_pipeline._fetch_errors.value
+        results: list[ItemEntry] = []
+        finished = TradePipeline(FakeFetcher).run_sync(make_groups(2), results.append)
+
+        assert [e.item_name for e in results] == ["gem0"] and finished == results
+        assert trade_pipeline._fetch_errors.value == errors + 1
+
+    def test_failed_fetch_is_counted_not_streamed(self, monkeypatch) -> None:
+        def fail(fetcher: FakeFetcher) -> None:
+            raise requests.ReadTimeout("fetch failed")
+
+        monkeypatch.setattr(FakeFetcher, "fetch_listings", fail)
+        errors = trade_pipeline._fetch_errors.value
+        results: list[ItemEntry] = []
+        TradePipeline(FakeFetcher).run_sync(make_groups(3), results.append)
+
+        assert results == []
+        assert trade_pipeline._fetch_errors.value == errors + 3
+
+    def test_stop_skips_remaining_entries(self) -> None:
+        stop_event = threading.Event()
+        results: list[ItemEntry] = []
+
+        def on_result(item_entry: ItemEntry) -> None:
+            results.append(item_entry)
+            stop_event.set()
+
+        pipeline = TradePipeline(
+            FakeFetcher, search_workers=1, fetch_workers=1, stop_event=stop_event
+        )
+        finished = pipeline.run_sync(make_groups(10), on_result)
+        assert len(finished) < 10 and finished == results
+
+    def test_group_is_valued_by_one_fetcher(self) -> None:
+        group = [
+            ItemEntry(item_name="gem", modifiers={"max_gem_level": 1}),
+            ItemEntry(item_name="gem", modifiers={"min_gem_level": 5}),
+        ]
+        results: list[ItemEntry] = []
+        TradePipeline(FakeFetcher).run_sync([group], results.append)
+        assert results == group and all(e.value == 3.0 for e in group)
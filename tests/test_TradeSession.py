@@ -0,0 +1,77 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+from weary_traveler.rate_limiter import RateLimiter
+from weary_traveler.trade_session import TradeSession
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    # Answers with 503 until `failures` runs out, then with 200
+    protocol_version = "HTTP/1.1"
+    failures = 0
+    connections: set[int] = set()
+
+    def do_GET(self) -> None:
+        FlakyHandler.connections.add(self.client_address[1])
+        if FlakyHandler.failures > 0:
+            FlakyHandler.failures -= 1
+            self.send_response(503)
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def flaky_server():
+    FlakyHandler.failures = 0
+    FlakyHandler.connections = set()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+@pytest.fixture
+def session() -> TradeSession:
+    limiter = RateLimiter({"fetch": [(100, 1.0)]})
+    return TradeSession({}, limiter, max_retries=2, backoff_base=0.01)
+
+
+class TestTradeSession:
+    def test_retries_server_errors(
+        self, flaky_server: str, session: TradeSession
+    ) -> None:
+        FlakyHandler.failures = 2
+        assert session.get("fetch", flaky_server).status_code == 200
+        assert session.latency["fetch"].count == 3
+
+    def test_gives_up_after_max_retries(
+        self, flaky_server: str, session: TradeSession
+    ) -> None:
+        FlakyHandler.failures = 5
+        assert session.get("fetch", flaky_server).status_code == 503
+        assert FlakyHandler.failures == 2
+
+    def test_retries_connection_errors(self, session: TradeSession) -> None:
+        with pytest.raises(requests.ConnectionError):
+            session.get("fetch", "http://127.0.0.1:1")
+        assert "fetch" not in session.latency
+
+    def test_keeps_connection_alive(
+        self, flaky_server: str, session: TradeSession
+    ) -> None:
+        for _ in range(5):
+            session.get("fetch", flaky_server)
+        assert len(FlakyHandler.connections) == 1
+
+    def test_backoff_is_capped(self, session: TradeSession) -> None:
+        session.backoff_max = 0.5
+        assert all(0 <= session.backoff_delay(10) <= 0.5 for _ in range(20))
@@ -0,0 +1,142 @@
+from datetime import datetime, timedelta
+
+from weary_traveler.tree_renderer import TreeviewRenderer, relative_time, row_iid
+
+
+class FakeTree:
+    # the parts of ttk.Treeview the renderer uses, counting every call
+    def __init__(self) -> None:
+        self.order: list[str] = []
+        self.rows: dict[str, tuple] = {}
+        self.calls = {"insert": 0, "delete": 0, "move": 0, "item": 0}
+        # single cells written by set(), only the last column is used
+        self.cells_set = 0
+
+    def get_children(self, parent: str) -> tuple[str, ...]:
+        return tuple(self.order)
+
+    def insert(self, parent: str, index: int, iid: str, text: str, values) -> None:
+        self.calls["insert"] += 1
+        self.order.insert(index, iid)
+        self.rows[iid] = (text, values)
+
+    def delete(self, *iids: str) -> None:
+        self.calls["delete"] += 1
+        for iid in iids:
+            self.order.remove(iid)
+            del self.rows[iid]
+
+    def move(self, iid: str, parent: str, index: int) -> None:
+        self.calls["move"] += 1
+        self.order.remove(iid)
+        self.order.insert(index, iid)
+
+    def item(self, iid: str, text: str, values) -> None:
+        self.calls["item"] += 1
+        self.rows[iid] = (text, values)
+
+    def set(self, iid: str, column: str, value) -> None:
+        self.cells_set += 1
+        text, values = self.rows[iid]
+        self.rows[iid] = (text, (*values[:-1], value))
+
+
+def make_rows(names: list[str], value: int = 0) -> list:
+    return [(name, name.upper(), (value,)) for name in names]
+
+
+class TestTreeviewRenderer:
+    def setup_method(self) -> None:
+        self.tree = FakeTree()
+        self.frames: list = []
+        self.renderer = TreeviewRenderer(
+            self.tree, lambda ms, callback: self.frames.append(callback)
+        )
+
+    def run_frames(self) -> int:
+        count = 0
+        while self.frames:
+            self.frames.pop(0)()
+            count += 1
+        return count
+
+    def test_only_changed_rows_are_touched(self) -> None:
+        self.renderer.render(make_rows(["a", "b", "c", "d"]))
+        self.tree.calls = dict.fromkeys(self.tree.calls, 0)
+
+        rows = make_rows(["e", "a", "b", "d"])
+        rows[2] = ("b", "B", (5,))
+        self.renderer.render(rows)
+
+        assert self.tree.order == ["e", "a", "b", "d"]
+        assert self.tree.rows["b"] == ("B", (5,))
+        assert self.tree.calls == {"insert": 1, "delete": 1, "move": 0, "item": 1}
+
+    def test_reorder_moves_rows(self) -> None:
+        self.renderer.render(make_rows(["a", "b", "c", "d"]))
+        self.renderer.render(make_rows(["d", "a", "b", "c"]))
+
+        assert self.tree.order == ["d", "a", "b", "c"]
+        assert self.tree.calls["move"] == 1 and self.tree.calls["insert"] == 4
+
+    def test_large_reorder_moves_only_displaced_rows(self) -> None:
+        self.renderer.ops_per_frame = 10000
+        names = [str(i) for i in range(2000)]
+        self.renderer.render(make_rows(names))
+        self.tree.calls = dict.fromkeys(self.tree.calls, 0)
+
+        # one row from the end to the front and two swapped in the middle
+        target = [names[-1], *names[:-1]]
+        target[500], target[1500] = target[1500], target[500]
+        self.renderer.render(make_rows(target))
+
+        assert self.tree.order == target
+        assert self.tree.calls == {"insert": 0, "delete": 0, "move": 3, "item": 0}
+
+    def test_volatile_column_is_not_diffed(self) -> None:
+        renderer = TreeviewRenderer(self.tree, lambda ms, callback: None, volatile=1)
+        renderer.render([("a", "A", (1, "5s ago")), ("b", "B", (2, "5s ago"))])
+        self.tree.calls = dict.fromkeys(self.tree.calls, 0)
+
+        renderer.render([("a", "A", (1, "35s ago")), ("b", "B", (3, "1s ago"))])
+        assert self.tree.calls == {"insert": 0, "delete": 0, "move": 0, "item": 1}
+        assert self.tree.rows["a"] == ("A", (1, "5s ago"))
+        assert self.tree.rows["b"] == ("B", (3, "1s ago"))
+
+        renderer.refresh_column("Last updated", {"a": "35s ago", "gone": "1s ago"})
+        assert self.tree.rows["a"] == ("A", (1, "35s ago"))
+        assert self.tree.cells_set == 1
+
+    def test_unchanged_render_is_free(self) -> None:
+        rows = make_rows(["a", "b"])
+        self.renderer.render(rows)
+        self.tree.calls = dict.fromkeys(self.tree.calls, 0)
+        self.renderer.render(rows)
+        assert sum(self.tree.calls.values()) == 0
+
+    def test_ops_are_spread_over_frames(self) -> None:
+        self.renderer.ops_per_frame = 100
+        names = [str(i) for i in range(1000)]
+        self.renderer.render(make_rows(names))
+
+        assert len(self.tree.order) == 100 and self.renderer.pending == 900
+        assert self.run_frames() == 9
+        assert self.tree.order == names
+
+    def test_new_render_replaces_pending_ops(self) -> None:
+        self.renderer.ops_per_frame = 10
+        self.renderer.render(make_rows([str(i) for i in range(100)]))
+        self.renderer.render(make_rows(["x", "0", "1"]))
+        self.run_frames()
+        assert self.tree.order == ["x", "0", "1"]
+
+    def test_row_iid_is_stable(self) -> None:
+        key = ("gem", '{"max_gem_level": 1}', '{"min_gem_level": 5}')
+        assert row_iid(key) == row_iid(tuple(key))
+        assert row_iid(key) != row_iid((key[0], key[2], key[1]))
+
+    def test_relative_time(self) -> None:
+        now = datetime(2024, 1, 10, 12)
+        assert relative_time(now - timedelta(seconds=30), now) == "30s ago"
+        assert relative_time(now - timedelta(hours=3), now) == "3 h ago"
+        assert relative_time(now - timedelta(days=9), now) == "5+ days ago"
@@ -1,27 +1,125 @@
 import os
+import queue
 import threading
 import tkinter as tk
 import webbrowser as wb
 from datetime import datetime
 from tkinter import messagebox, ttk
-
-from poe_trade_rest import DataHandler, ProfitStrat
+from typing import Any
+
+import metrics
+from data_loader import DataLoader
+from groups import GROUPS, get_group, get_group_by_store
+from poe_trade_rest import DataHandler, ItemEntry, ProfitStrat, initialize_groups
+from table_model import StratTableModel
+from tree_renderer import TreeviewRenderer, relative_time, row_iid
 from ttkthemes import ThemedTk
 
+_ui_render = metrics.registry.histogram(
+    "ui_render_seconds", "Time to render the visible rows"
+)
+
+
+def _latency_text(histogram: metrics.Histogram | None) -> str:
+    if histogram is None or histogram.count == 0:
+        return "-"
+    p50, p95 = histogram.quantile(0.5), histogram.quantile(0.95)
+    return f"{p50 * 1000:.0f}/{p95 * 1000:.0f} ms"
+
+
+def metrics_summary(registry: metrics.MetricsRegistry, store: str) -> str:
+    # Status panel text, latencies are p50/p95 over the whole session
+    def value(name: str, **labels: Any) -> int:
+        metric = registry.get(name, **labels)
+        return 0 if metric is None else int(metric.value)
+
+    def latency(name: str, **labels: Any) -> str:
+        return _latency_text(registry.get(name, **labels))
+
+    endpoints = ("search", "fetch")
+    rate_limited = sum(value("trade_rate_limited_total", endpoint=e) for e in endpoints)
+    errors = sum(value("trade_request_errors_total", endpoint=e) for e in endpoints)
+    hits, misses = value("query_cache_hits"), value("query_cache_misses")
+    hit_rate = f"{hits / (hits + misses):.0%}" if hits + misses else "-"
+    rows = [
+        f"Refreshed/min: {value('items_refreshed_per_minute')}"
+        f"   Total: {value('items_refreshed_total')}"
+        f"   429s: {rate_limited}   Errors: {errors}   Cache hits: {hit_rate}",
+        f"Wait: {latency('trade_rate_limit_wait_seconds', endpoint='fetch')}"
+        f"   Search: {latency('trade_request_seconds', endpoint='search')}"
+        f"   Fetch: {latency('trade_request_seconds', endpoint='fetch')}"
+        f"   Parse: {latency('listing_parse_seconds')}",
+        f"Read: {latency('storage_read_seconds', store=store)}"
+        f"   Write: {latency('storage_write_seconds', store=store)}"
+        f"   Profits: {latency('profit_recompute_seconds')}"
+        f"   Render: {latency('ui_render_seconds')}",
+    ]
+    return "\n".join(rows)
+
 
 class BackgroundTask(threading.Thread):
-    def __init__(self) -> None:
+    # Runs `workers` update loops over one shared DataHandler. They draw from
+    # the same scheduler and share the Fetcher's rate limiter, so more workers
+    # keep more valuations in flight without going over the rate budget.
+    def __init__(
+        self, datahandler: DataHandler, workers: int = 2, batch_size: int = 4
+    ) -> None:
         super().__init__()
         self._stop_event = threading.Event()
-        self.datahandler = DataHandler()
+        self.datahandler = datahandler
+        self.workers = workers
+        # number of valuations kept in flight by each worker's trade pipeline
+        self.batch_size = batch_size
+        self.statuses = ["starting"] * workers
+        self._exit_lock = threading.Lock()
+        self._exited = False
+        self._close_store = False
 
     def stop(self) -> None:
+        # every wait checks the stop event, workers return as soon as their
+        # in-flight requests are done
         self._stop_event.set()
 
+    def close_store_on_exit(self) -> bool:
+        # Hands the store over to the task, which closes it once the requests
+        # still in flight are stored. False if the task has already exited.
+        with self._exit_lock:
+            self._close_store = not self._exited
+            return self._close_store
+
     def run(self) -> None:
+        threads = [
+            threading.Thread(target=self.work, args=(worker,))
+            for worker in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with self._exit_lock:
+            self._exited = True
+            close_store = self._close_store
+        if close_store:
+            self.datahandler.close()
+
+    def work(self, worker: int) -> None:
+        def on_claim(item_entries: list[ItemEntry]) -> None:
+            item_names = dict.fromkeys(e.item_name for e in item_entries)
+            self.statuses[worker] = "valuing " + ", ".join(item_names)
+
         while not self._stop_event.is_set():
-            print("Background Task is running...")
-            self.datahandler.update_oldest_item_entry()
+            try:
+                updated = self.datahandler.update_next_item_entries(
+                    self.batch_size, stop_event=self._stop_event, on_claim=on_claim
+                )
+            except Exception as e:
+                print("Error: ", e)
+                updated = 0
+            if updated == 0 and not self._stop_event.is_set():
+                # nothing to update yet, the library has not been initialized
+                self.statuses[worker] = "idle"
+                self._stop_event.wait(10)
+        self.statuses[worker] = "stopped"
 
 
 class DataFrameApp:
@@ -31,9 +129,24 @@ class DataFrameApp:
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         root.minsize(800, 800)
 
-        self.selected_file = tk.StringVar()
-        self.datahandler = DataHandler()
-        self.data: list[ProfitStrat] = []
+        self.selected_group = tk.StringVar(value=next(iter(GROUPS)))
+        self.datahandler = DataHandler(store=get_group(self.selected_group.get()).store)
+        # all strats of the store, only the window on screen is in the tree
+        self.model = StratTableModel([])
+        self.window_start = 0
+        self.window_size = 20
+        self.strats_by_iid: dict[str, ProfitStrat] = {}
+        # modifiers don't change between reloads, their text is built once
+        self.mods_text: dict[tuple, str] = {}
+        self.loader: DataLoader | None = None
+        self.worker_count = tk.IntVar(value=2)
+        # (group, status) messages from the initialization threads
+        self.progress: queue.Queue = queue.Queue()
+        self.name_filter = tk.StringVar()
+        self.min_profit = tk.StringVar()
+        self.min_listed = tk.StringVar()
+        # minutes
+        self.max_age = tk.StringVar()
 
         # Background progress stuff
         self.background_task = None
@@ -49,6 +162,9 @@ class DataFrameApp:
         self.root.configure(menu=self.menu)
         file_menu = tk.Menu(self.menu, tearoff=0)
         file_menu.add_command(label="Initialize Library", command=self.initialize_data)
+        file_menu.add_command(label="Export to JSON", command=self.export_data)
+        file_menu.add_command(label="Export snapshot", command=self.export_snapshot)
+        file_menu.add_command(label="Export metrics", command=self.export_metrics)
         file_menu.add_separator()
         file_menu.add_command(label="Exit", command=root.quit)
         self.menu.add_cascade(label="File", menu=file_menu)
@@ -58,9 +174,11 @@ class DataFrameApp:
         self.top_frame.pack(side="top", fill="both", expand=False)
 
         # Create widgets
-        self.label1 = ttk.Label(self.top_frame, text="Select file:")
-        self.dropdown = ttk.Combobox(self.top_frame, textvariable=self.selected_file)
-        self.dropdown.bind("<<ComboboxSelected>>", lambda event: self.load_data())
+        self.label1 = ttk.Label(self.top_frame, text="Select group:")
+        self.dropdown = ttk.Combobox(
+            self.top_frame, textvariable=self.selected_group, state="readonly"
+        )
+        self.dropdown.bind("<<ComboboxSelected>>", lambda event: self.select_group())
         self.button_update = ttk.Button(
             self.top_frame,
             text="auto-update",
@@ -68,12 +186,46 @@ class DataFrameApp:
             takefocus=False,
         )
         self.label_status = ttk.Label(self.top_frame, text="Paused.")
+        self.spinbox_workers = ttk.Spinbox(
+            self.top_frame, from_=1, to=8, width=3, textvariable=self.worker_count
+        )
+        self.label_workers = ttk.Label(self.top_frame, text="", justify="left")
 
         # Layout widgets
         self.label1.pack(side="left", expand=False)
         self.dropdown.pack(side="left", expand=False)
         self.label_status.pack(side="right", expand=False)
         self.button_update.pack(side="right", expand=False)
+        self.spinbox_workers.pack(side="right", expand=False)
+        self.label_workers.pack(side="bottom", fill="x", expand=False)
+
+        # Create filter frame
+        self.filter_frame = ttk.Frame(self.root)
+        self.filter_frame.pack(side="top", fill="x", expand=False)
+        filters = (
+            ("Item name:", self.name_filter, 30),
+            ("Min profit:", self.min_profit, 8),
+            ("Min listed:", self.min_listed, 8),
+            ("Max age (min):", self.max_age, 8),
+        )
+        for text, variable, width in filters:
+            ttk.Label(self.filter_frame, text=text).pack(side="left", expand=False)
+            ttk.Entry(self.filter_frame, textvariable=variable, width=width).pack(
+                side="left", expand=False
+            )
+        self.name_filter.trace_add("write", lambda *args: self.apply_filters())
+        self.min_profit.trace_add("write", lambda *args: self.apply_filters())
+        self.min_listed.trace_add("write", lambda *args: self.apply_filters())
+        self.max_age.trace_add("write", lambda *args: self.apply_filters())
+
+        # Create status panel
+        self.status_frame = ttk.LabelFrame(self.root, text="Status")
+        self.status_frame.pack(side="top", fill="x", expand=False)
+        self.label_metrics = ttk.Label(self.status_frame, text="", padding=4)
+        self.label_metrics.pack(side="left", fill="x", expand=False)
+        # METRICS_PORT serves /metrics and /metrics.json on localhost
+        port = os.getenv("METRICS_PORT")
+        self.metrics_server = metrics.registry.serve(int(port)) if port else None
 
         # Create bottom frame
         self.bottom_frame = ttk.Frame(self.root)
@@ -83,7 +235,14 @@ class DataFrameApp:
         self.tree_view = ttk.Treeview(self.bottom_frame)
         # Configure tree view
         self.configure_tree_view()
+        # the last column holds the relative time, see refresh_times
+        self.renderer = TreeviewRenderer(self.tree_view, self.root.after, volatile=1)
+        # The tree only holds the visible window, the scrollbar follows the model
+        self.scrollbar = ttk.Scrollbar(
+            self.bottom_frame, orient="vertical", command=self.on_scroll
+        )
         # Layout tree view
+        self.scrollbar.pack(side="right", fill="y", expand=False)
         self.tree_view.pack(side="left", fill="both", expand=True)
 
         # Adjust row and column weights
@@ -93,6 +252,10 @@ class DataFrameApp:
         root.grid_columnconfigure(2, weight=1)
 
         self.load_dropdown_options()
+        self.start_loader()
+        self.poll_views()
+        self.refresh_times()
+        self.refresh_metrics()
 
     def configure_tree_view(self) -> None:
         columns = (
@@ -112,40 +275,172 @@ class DataFrameApp:
             200,
         )
         self.tree_view["columns"] = columns
-        self.tree_view.heading("#0", text="Item name", anchor="w")
+        sort_keys = {"#0": "item_name", "Profit": "profit", "Last updated": "staleness"}
+        self.tree_view.heading(
+            "#0",
+            text="Item name",
+            anchor="w",
+            command=lambda: self.sort_by("item_name"),
+        )
         self.tree_view.column("#0", width=400)
         for column, width in zip(columns, widths):
             self.tree_view.heading(column=column, text=column, anchor="center")
             self.tree_view.column(column=column, width=width, anchor="center")
+            if column in sort_keys:
+                self.tree_view.heading(
+                    column=column,
+                    command=lambda key=sort_keys[column]: self.sort_by(key),
+                )
 
         self.tree_view.bind("<Button-1>", self.open_link)
+        self.tree_view.bind("<Configure>", self.on_resize)
+        self.tree_view.bind("<MouseWheel>", self.on_mouse_wheel)
+        self.tree_view.bind("<Button-4>", self.on_mouse_wheel)
+        self.tree_view.bind("<Button-5>", self.on_mouse_wheel)
 
     def auto_refresh(self) -> None:
+        # the loader picks up the updates, this only tracks the task's state
         if self.background_task and self.background_task.is_alive():
-            print("refreshed")
-            self.load_data()
-            self.root.after(10000, self.auto_refresh)
+            self.label_workers.config(
+                text="\n".join(
+                    f"Worker {worker + 1}: {status}"
+                    for worker, status in enumerate(self.background_task.statuses)
+                )
+            )
+            self.root.after(250, self.auto_refresh)
         else:
-            print("last refresh, stop refreshing")
             self.load_data()
+            self.label_workers.config(text="")
             self.button_update.config(text="auto-update", state=tk.NORMAL)
             self.label_status.config(text="Paused.")
 
-    def get_relative_time(self, time: str) -> str:
-        updated_time = datetime.strptime(time, "%Y-%m-%d %H:%M:%S.%f")
-        delta = datetime.now() - updated_time
-        if delta.seconds <= 120 and delta.days == 0:
-            updated = str(delta.seconds) + "s ago"
-        elif delta.seconds <= 3600 and delta.days == 0:
-            updated = str(round(delta.seconds / 60)) + " min ago"
-        elif delta.seconds <= 86400 and delta.days == 0:
-            updated = str(round(delta.seconds / 3600)) + " h ago"
-        elif delta.days <= 5:
-            updated = str(delta.days) + " days ago"
+    def start_loader(self) -> None:
+        if self.loader is not None:
+            self.loader.stop()
+        # relative times are refreshed on the window, not by rebuilding the model
+        self.loader = DataLoader(
+            self.datahandler, self.build_view, refresh_interval=float("inf")
+        )
+        # valuations stored by the workers wake the loader right away
+        self.datahandler.listeners.append(self.loader.notify)
+        self.loader.start()
+
+    def poll_views(self) -> None:
+        view = self.loader.latest_view()
+        if view is not None:
+            sort_key = self.model.sort_key
+            self.model = view
+            self.model.sort_by(sort_key)
+            self.apply_filters()
+        self.root.after(100, self.poll_views)
+
+    def refresh_times(self) -> None:
+        # only the relative times of the rows on screen are rewritten
+        now = datetime.now()
+        self.renderer.refresh_column(
+            "Last updated",
+            {
+                iid: relative_time(profit_strat.sell_item.updated_at, now)
+                for iid, profit_strat in self.strats_by_iid.items()
+            },
+        )
+        self.root.after(30000, self.refresh_times)
+
+    def refresh_metrics(self) -> None:
+        self.label_metrics.config(
+            text=metrics_summary(metrics.registry, self.datahandler.store)
+        )
+        self.root.after(1000, self.refresh_metrics)
+
+    def apply_filters(self) -> None:
+        self.model.filter_item_name(self.name_filter.get().strip())
+        self.model.filter_min_profit(self.parse_filter(self.min_profit, float))
+        self.model.filter_min_listed(self.parse_filter(self.min_listed, int))
+        max_age = self.parse_filter(self.max_age, float)
+        self.model.filter_max_age(None if max_age is None else max_age * 60)
+        self.refresh_window()
+
+    def parse_filter(self, variable: tk.StringVar, kind: type) -> Any:
+        # empty or half typed numbers don't filter
+        try:
+            return kind(variable.get())
+        except ValueError:
+            return None
+
+    def sort_by(self, sort_key: str) -> None:
+        self.model.sort_by(sort_key)
+        self.window_start = 0
+        self.refresh_window()
+
+    def scroll_to(self, start: int) -> None:
+        last_start = max(len(self.model) - self.window_size, 0)
+        start = min(max(start, 0), last_start)
+        if start != self.window_start:
+            self.window_start = start
+            self.refresh_window()
+
+    def on_scroll(self, action: str, amount: str, unit: str = "") -> None:
+        if action == "moveto":
+            self.scroll_to(round(float(amount) * len(self.model)))
+        elif unit == "pages":
+            self.scroll_to(self.window_start + int(amount) * self.window_size)
+        else:
+            self.scroll_to(self.window_start + int(amount))
+
+    def on_mouse_wheel(self, event: tk.Event) -> str:
+        if event.num == 4 or event.delta > 0:
+            self.scroll_to(self.window_start - 3)
+        else:
+            self.scroll_to(self.window_start + 3)
+        # the tree itself has nothing to scroll
+        return "break"
+
+    def on_resize(self, event: tk.Event) -> None:
+        window_size = max(event.height // 60, 1)
+        if window_size != self.window_size:
+            self.window_size = window_size
+            self.refresh_window()
+
+    def refresh_window(self) -> None:
+        with _ui_render.time():
+            self._refresh_window()
+
+    def _refresh_window(self) -> None:
+        # Only the rows on screen are built and rendered
+        total = len(self.model)
+        self.window_start = min(self.window_start, max(total - self.window_size, 0))
+        now = datetime.now()
+        rows = []
+        strats_by_iid = {}
+        for profit_strat in self.model.window(self.window_start, self.window_size):
+            buy_item = profit_strat.buy_item
+            sell_item = profit_strat.sell_item
+            values = (
+                self.get_mods_text(buy_item),
+                self.get_mods_text(sell_item),
+                buy_item.value if buy_item.number_listed > 0 else "?",
+                sell_item.value if sell_item.number_listed > 0 else "?",
+                profit_strat.profit if profit_strat.profit > 0 else "?",
+                relative_time(sell_item.updated_at, now),
+            )
+            iid = row_iid(profit_strat.key)
+            strats_by_iid[iid] = profit_strat
+            rows.append((iid, profit_strat.item_name, values))
+        self.strats_by_iid = strats_by_iid
+        self.display_data_in_treeview(rows)
+        if total == 0:
+            self.scrollbar.set(0, 1)
         else:
-            updated = "5+ days ago"
+            self.scrollbar.set(
+                self.window_start / total,
+                min(self.window_start + self.window_size, total) / total,
+            )
 
-        return updated
+    def get_mods_text(self, item_entry: ItemEntry) -> str:
+        key = tuple(item_entry.modifiers.items())
+        if key not in self.mods_text:
+            self.mods_text[key] = item_entry.mods_to_str()
+        return self.mods_text[key]
 
     def toggle_background_task(self) -> None:
         if self.background_task is None or not self.background_task.is_alive():
@@ -155,7 +450,9 @@ class DataFrameApp:
 
     def start_background_task(self) -> None:
         if self.background_task is None or not self.background_task.is_alive():
-            self.background_task = BackgroundTask()
+            self.background_task = BackgroundTask(
+                self.datahandler, workers=self.worker_count.get()
+            )
             self.background_task.start()
             self.auto_refresh()
             self.button_update.config(text="Stop")
@@ -171,19 +468,76 @@ class DataFrameApp:
             messagebox.showwarning("Warning", "No background task is running.")
 
     def load_dropdown_options(self) -> None:
-        # Load available json files in the 'profit strats' folder
-        folder_path = os.path.join(os.getcwd(), "data/profit_strats")
-        files = [file for file in os.listdir(folder_path) if file.endswith(".json")]
-        self.dropdown["values"] = files
+        # Registered groups, the ones that already have a store first
+        folder_path = os.path.join(os.getcwd(), "data/db")
+        files = set(os.listdir(folder_path))
+        self.dropdown["values"] = sorted(
+            GROUPS, key=lambda name: f"{GROUPS[name].store}.db" not in files
+        )
+
+    def select_group(self) -> None:
+        if self.background_task and self.background_task.is_alive():
+            messagebox.showwarning("Warning", "Stop auto-update to switch groups.")
+            self.selected_group.set(get_group_by_store(self.datahandler.store).name)
+            return
+        # the old store is closed once its loader no longer reads from it
+        self.loader.stop()
+        self.loader.join()
+        self.datahandler.close()
+        self.datahandler = DataHandler(store=get_group(self.selected_group.get()).store)
+        self.start_loader()
 
     def initialize_data(self) -> None:
-        self.datahandler.initialize_from_ninja("Awakened Gems")
-        self.load_data()
+        # scrape all groups off the main thread, progress arrives through a queue
+        threading.Thread(
+            target=initialize_groups,
+            args=(list(GROUPS),),
+            kwargs={
+                "on_progress": lambda *status: self.progress.put(status),
+                "datahandlers": {self.datahandler.store: self.datahandler},
+            },
+            daemon=True,
+        ).start()
+        self.label_status.config(text=f"Initializing 0/{len(GROUPS)} groups...")
+        self.root.after(200, self.poll_progress, {})
+
+    def poll_progress(self, statuses: dict[str, str]) -> None:
+        while not self.progress.empty():
+            group, status = self.progress.get()
+            statuses[group] = status
+            if group == self.selected_group.get() and status == "done":
+                self.load_data()
+        finished = [s for s in statuses.values() if s != "started"]
+        failed = [g for g, s in statuses.items() if s == "failed"]
+        if len(finished) < len(GROUPS):
+            self.label_status.config(
+                text=f"Initializing {len(finished)}/{len(GROUPS)} groups..."
+            )
+            self.root.after(200, self.poll_progress, statuses)
+            return
+        self.load_dropdown_options()
+        self.label_status.config(
+            text=f"Failed: {', '.join(failed)}" if failed else "Initialized."
+        )
+
+    def export_data(self) -> None:
+        self.datahandler.export_json()
+        messagebox.showinfo("Export", "Exported item entries and profit strats.")
+
+    def export_snapshot(self) -> None:
+        self.datahandler.export_snapshot()
+        messagebox.showinfo("Export", "Saved a snapshot of the library.")
+
+    def export_metrics(self) -> None:
+        folder = os.path.join(os.getcwd(), "data/metrics")
+        metrics.registry.write(folder)
+        messagebox.showinfo(
+            "Export", f"Saved metrics.prom and metrics.json to {folder}."
+        )
 
     def load_data(self) -> None:
-        self.data = self.datahandler.read_all_profit_strats()
-        self.sort_data()
-        self.display_data_in_treeview()
+        # reads happen on the loader thread, the view arrives in poll_views
+        self.loader.notify(force=True)
 
     def open_link(self, event: tk.Event) -> None:
         tree = event.widget
@@ -194,47 +548,40 @@ class DataFrameApp:
 
         if click_region != "cell":
             return
-        row = int(tree.identify("item", event.x, event.y))
+        profit_strat = self.strats_by_iid.get(tree.identify("item", event.x, event.y))
+        if profit_strat is None:
+            return
         link = ""
         if col == "#3":
-            link = self.data[row].buy_item.url
+            link = profit_strat.buy_item.url
         if col == "#4":
-            link = self.data[row].sell_item.url
+            link = profit_strat.sell_item.url
         if link != "":
             wb.open_new_tab(link)
 
-    def display_data_in_treeview(self) -> None:
-        # Clear existing tree view
-        for child in self.tree_view.get_children():
-            self.tree_view.delete(child)
+    def build_view(self, profit_strats: list[ProfitStrat]) -> StratTableModel:
+        # Runs on the loader thread, must not touch any widget
+        return StratTableModel(profit_strats)
 
-        # Add data
-        iid = 0
-        for profit_strat in self.data:
-            buy_item = profit_strat.buy_item
-            sell_item = profit_strat.sell_item
-            values = (
-                buy_item.mods_to_str(),
-                sell_item.mods_to_str(),
-                buy_item.value if buy_item.number_listed > 0 else "?",
-                sell_item.value if sell_item.number_listed > 0 else "?",
-                profit_strat.profit if profit_strat.profit > 0 else "?",
-                self.get_relative_time(str(sell_item.updated_at)),
-            )
-            self.tree_view.insert(
-                "", tk.END, text=profit_strat.item_name, values=values, iid=iid
-            )
-            iid += 1
-
-    def sort_data(self) -> None:
-        self.data = sorted(self.data, key=lambda x: x.profit, reverse=True)
+    def display_data_in_treeview(self, rows: list) -> None:
+        # Only the rows that changed since the last refresh are touched, so
+        # scroll position and selection survive a refresh
+        self.renderer.render(rows)
 
     def on_close(self) -> None:
+        # A request in flight can take up to its read timeout. The window
+        # doesn't wait for it, the task stores it and closes the store.
+        store_handed_over = False
         if self.background_task and self.background_task.is_alive():
-            print(
-                "Gracefully shutting down auto-update, this can take up to 10 seconds..."
-            )
             self.stop_background_task()
+            self.background_task.join(timeout=1)
+            store_handed_over = self.background_task.close_store_on_exit()
+        self.loader.stop()
+        self.loader.join()
+        if not store_handed_over:
+            self.datahandler.close()
+        if self.metrics_server is not None:
+            self.metrics_server.shutdown()
         self.root.destroy()
 
 
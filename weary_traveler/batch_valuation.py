@@ -0,0 +1,131 @@
+from typing import Any, Sequence
+
+import currency_rates
+import numpy as np
+from currency_rates import CurrencyRates
+from estimators import AdaptiveEstimator
+
+
+class ListingTable:
+    # Raw listings of many entries as flat arrays, the listings of entry i are
+    # rows offsets[i]:offsets[i + 1]. Currencies are stored once and referenced
+    # by code.
+
+    def __init__(
+        self,
+        offsets: np.ndarray,
+        amounts: np.ndarray,
+        currency_codes: np.ndarray,
+        currencies: list[str],
+    ) -> None:
+        self.offsets = offsets
+        self.amounts = amounts
+        self.currency_codes = currency_codes
+        self.currencies = currencies
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @classmethod
+    def from_columns(
+        cls, counts: Sequence[int], amounts: Sequence[float], currencies: Sequence[str]
+    ) -> "ListingTable":
+        # the listing count of every entry, then amount and currency per listing
+        codes: dict[str, int] = {}
+        return cls(
+            offsets=np.concatenate(([0], np.cumsum(counts, dtype=np.int64))),
+            amounts=np.array(amounts, np.float64),
+            currency_codes=np.array(
+                [codes.setdefault(currency, len(codes)) for currency in currencies],
+                np.int32,
+            ),
+            currencies=list(codes),
+        )
+
+    @classmethod
+    def from_listings(cls, listings: Sequence[Sequence[Any]]) -> "ListingTable":
+        # Listing objects, their prices are already in divine
+        return cls.from_columns(
+            [len(rows) for rows in listings],
+            [listing.price for rows in listings for listing in rows],
+            [listing.currency for rows in listings for listing in rows],
+        )
+
+    @classmethod
+    def from_results(cls, results: Sequence[Sequence[dict]]) -> "ListingTable":
+        # "result" lists of the trade fetch endpoint, read like
+        # Fetcher.extract_listings
+        amounts = []
+        currencies = []
+        for rows in results:
+            for result in rows:
+                price_info = result.get("listing", {}).get("price", {})
+                amounts.append(price_info.get("amount"))
+                currencies.append(price_info.get("currency", ""))
+        return cls.from_columns([len(rows) for rows in results], amounts, currencies)
+
+    def divine_prices(self, rates: CurrencyRates | None = None) -> np.ndarray:
+        # nan for listings without a price or with a currency without a rate
+        rates = rates or currency_rates.shared_rates
+        return rates.to_divine(self.amounts, self.currency_codes, self.currencies)
+
+
+def _round_tenths(values: np.ndarray) -> np.ndarray:
+    # np.round scales by 10 first, which can land exactly on a tie the value
+    # itself is not on: 1.95 is stored as 1.9499... and round() gives 1.9.
+    # Only exact ties can differ, those few go through round().
+    rounded = np.round(values, 1)
+    scaled = values * 10
+    ties = np.flatnonzero(scaled - np.floor(scaled) == 0.5)
+    rounded[ties] = [round(value, 1) for value in values[ties].tolist()]
+    return rounded
+
+
+def value_listings(
+    listings: ListingTable,
+    estimator: AdaptiveEstimator | None = None,
+    rates: CurrencyRates | None = None,
+) -> np.ndarray:
+    # The value ItemEntry.apply_listings would set for every entry, nan where
+    # an entry has no listings and would keep its value. Listings that can't
+    # be converted are dropped like Fetcher.extract_listings does.
+    estimator = estimator or AdaptiveEstimator()
+    prices = listings.divine_prices(rates)
+    priced = ~np.isnan(prices)
+    counts = np.diff(listings.offsets)
+    entry_ids = np.repeat(np.arange(len(counts)), counts)
+    kept = np.bincount(entry_ids[priced], minlength=len(counts))
+    offsets = np.concatenate(([0], np.cumsum(kept)))
+    return _round_tenths(estimator.estimate_many(prices[priced], offsets))
+
+
+def profit_pairs(
+    name_codes: np.ndarray, values: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Every strat ProfitEngine keeps, as (buy index, sell index, profit): all
+    # ordered pairs of entries with the same item name where the sell side is
+    # worth at least the buy side. Profit is computed like strat_profit.
+    values = np.asarray(values, np.float64)
+    order = np.argsort(name_codes, kind="stable")
+    codes = name_codes[order]
+    if not len(codes):
+        empty = np.empty(0, np.int64)
+        return empty, empty, np.empty(0, np.float64)
+    starts = np.flatnonzero(np.concatenate(([True], codes[1:] != codes[:-1])))
+    sizes = np.diff(np.append(starts, len(codes)))
+    # each entry is paired with every entry of its item, itself included
+    group_size = np.repeat(sizes, sizes)
+    group_start = np.repeat(starts, sizes)
+    buy = np.repeat(np.arange(len(codes)), group_size)
+    block_start = np.repeat(np.cumsum(group_size) - group_size, group_size)
+    sell = np.repeat(group_start, group_size) + np.arange(len(buy)) - block_start
+    buy, sell = order[buy], order[sell]
+    keep = (buy != sell) & (values[sell] >= values[buy])
+    buy, sell = buy[keep], sell[keep]
+    buy_values, sell_values = values[buy], values[sell]
+    profits = np.where(
+        (buy_values > 0) & (sell_values > 0),
+        _round_tenths(sell_values - buy_values),
+        0.0,
+    )
+    return buy, sell, profits
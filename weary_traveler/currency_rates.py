@@ -0,0 +1,141 @@
+import math
+import threading
+import time
+from typing import Callable, Sequence
+
+import metrics
+import numpy as np
+import requests
+
+_api_url = "https://poe.ninja/api/data/currencyoverview"
+_league = "Necropolis"
+
+# used until the first fetch succeeds, the rate the app used to hardcode
+_fallback = {"chaos": 1.0, "divine": 120.0}
+
+_fetch_errors = metrics.registry.counter(
+    "currency_rate_errors_total", "Failed poe.ninja currency rate fetches"
+)
+
+
+def chaos_values_from_overview(overview: dict) -> dict[str, float]:
+    # Chaos value per trade currency id ("divine", "exalted", ...). Lines are
+    # keyed by display name, currencyDetails maps names to trade ids.
+    trade_ids = {
+        detail["name"]: detail["tradeId"]
+        for detail in overview.get("currencyDetails", [])
+        if detail.get("tradeId")
+    }
+    values = {"chaos": 1.0}
+    for line in overview["lines"]:
+        trade_id = trade_ids.get(line["currencyTypeName"])
+        if trade_id is not None and line.get("chaosEquivalent"):
+            values[trade_id] = float(line["chaosEquivalent"])
+    if "divine" not in values:
+        raise KeyError("divine")
+    return values
+
+
+def fetch_chaos_values(league: str) -> dict[str, float]:
+    response = requests.get(
+        _api_url, params={"league": league, "type": "Currency"}, timeout=(5, 30)
+    )
+    response.raise_for_status()
+    return chaos_values_from_overview(response.json())
+
+
+class CurrencyRates:
+    # Divine per unit of every trade currency, from `source` at most once per
+    # `ttl` seconds. One caller fetches while the others keep reading the
+    # previous rates, only before the first fetch do they wait for it. A
+    # failed fetch keeps the previous rates and is retried after `retry_after`.
+
+    def __init__(
+        self,
+        league: str = _league,
+        ttl: float = 1800.0,
+        retry_after: float = 60.0,
+        source: Callable[[str], dict[str, float]] = fetch_chaos_values,
+    ) -> None:
+        self.league = league
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self.source = source
+        self.fetches = 0
+        self.last_error: Exception | None = None
+        self._lock = threading.Lock()
+        self._chaos_values = dict(_fallback)
+        self._loaded = False
+        self._expires_at = 0.0
+        self._in_flight: threading.Event | None = None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._chaos_values = dict(_fallback)
+            self._loaded = False
+            self._expires_at = 0.0
+
+    def chaos_values(self) -> dict[str, float]:
+        with self._lock:
+            if time.monotonic() < self._expires_at:
+                return self._chaos_values
+            in_flight = self._in_flight
+            if in_flight is not None:
+                loaded = self._loaded
+            else:
+                self._in_flight = threading.Event()
+                self.fetches += 1
+        if in_flight is not None:
+            if not loaded:
+                in_flight.wait()
+            return self._chaos_values
+        return self._fetch()
+
+    def _fetch(self) -> dict[str, float]:
+        # runs outside the lock, the request can take up to its timeout
+        chaos_values = None
+        try:
+            chaos_values = self.source(self.league)
+        except (requests.RequestException, ValueError, KeyError) as e:
+            _fetch_errors.inc()
+            self.last_error = e
+        finally:
+            with self._lock:
+                now = time.monotonic()
+                if chaos_values is not None:
+                    self._chaos_values = chaos_values
+                    self._loaded = True
+                    self._expires_at = now + self.ttl
+                else:
+                    self._expires_at = now + self.retry_after
+                in_flight, self._in_flight = self._in_flight, None
+            in_flight.set()
+        return self._chaos_values
+
+    def rate(self, currency: str) -> float:
+        # nan for currencies without a rate
+        chaos_values = self.chaos_values()
+        return chaos_values.get(currency, math.nan) / chaos_values["divine"]
+
+    def rates(self, currencies: Sequence[str]) -> np.ndarray:
+        chaos_values = self.chaos_values()
+        return np.array(
+            [chaos_values.get(currency, math.nan) for currency in currencies],
+            np.float64,
+        ) / np.float64(chaos_values["divine"])
+
+    def to_divine(
+        self,
+        amounts: np.ndarray,
+        currency_codes: np.ndarray,
+        currencies: Sequence[str],
+    ) -> np.ndarray:
+        # one lookup for a whole batch: currencies[currency_codes[i]] is the
+        # currency of amounts[i]. Pages priced only in divine need no rates.
+        if all(currency == "divine" for currency in currencies):
+            return amounts.astype(np.float64)
+        return amounts * self.rates(currencies)[currency_codes]
+
+
+# shared by every Listing, Fetcher and batch valuation in the process
+shared_rates = CurrencyRates()
@@ -0,0 +1,71 @@
+import queue
+import threading
+import time
+from typing import Any, Callable
+
+
+class DataLoader(threading.Thread):
+    # Loads and prepares the strats for the UI off the Tk thread. It checks
+    # the storage version every `interval` seconds, or right away when
+    # notify() is called, and only reads the strats when the version moved.
+    # Finished views are put on `views` for the UI to pick up with after().
+    # Without changes the view is rebuilt from the last strats every
+    # `refresh_interval` seconds to keep the relative times current.
+
+    def __init__(
+        self,
+        datahandler: Any,
+        build_view: Callable[[list[Any]], Any],
+        interval: float = 1.0,
+        refresh_interval: float = 30.0,
+    ) -> None:
+        super().__init__(daemon=True)
+        self.datahandler = datahandler
+        self.build_view = build_view
+        self.interval = interval
+        self.refresh_interval = refresh_interval
+        self.views: queue.Queue = queue.Queue()
+        self.loads = 0
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._force = True
+        self._lock = threading.Lock()
+
+    def notify(self, force: bool = False) -> None:
+        # safe to call from any thread, bursts of calls collapse into one load
+        if force:
+            with self._lock:
+                self._force = True
+        self._wake.set()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self._wake.set()
+
+    def latest_view(self) -> Any | None:
+        view = None
+        while not self.views.empty():
+            view = self.views.get_nowait()
+        return view
+
+    def run(self) -> None:
+        version = None
+        strats: list[Any] = []
+        built_at = 0.0
+        while not self._stop_event.is_set():
+            with self._lock:
+                force, self._force = self._force, False
+            try:
+                current = self.datahandler.backend.version()
+                changed = force or current != version
+                if changed:
+                    version = current
+                    strats = self.datahandler.read_all_profit_strats()
+                    self.loads += 1
+                if changed or time.monotonic() - built_at >= self.refresh_interval:
+                    self.views.put(self.build_view(strats))
+                    built_at = time.monotonic()
+            except Exception as e:
+                print("Error: ", e)
+            self._wake.wait(self.interval)
+            self._wake.clear()
@@ -0,0 +1,204 @@
+import statistics
+from typing import Callable, Sequence
+
+import numpy as np
+
+# scales the median absolute deviation to a standard deviation for normal data
+_mad_scale = 1.4826
+
+
+def mean(prices: Sequence[float]) -> float:
+    return statistics.fmean(prices)
+
+
+def median(prices: Sequence[float]) -> float:
+    return statistics.median(prices)
+
+
+def trimmed_mean(prices: Sequence[float], proportion: float = 0.2) -> float:
+    ordered = sorted(prices)
+    cut = int(len(ordered) * proportion)
+    return statistics.fmean(ordered[cut : len(ordered) - cut] or ordered)
+
+
+def mad(prices: Sequence[float]) -> float:
+    center = statistics.median(prices)
+    return statistics.median(abs(price - center) for price in prices)
+
+
+def mad_filtered_mean(prices: Sequence[float], threshold: float = 3.0) -> float:
+    # mean of the listings within `threshold` scaled MADs of the median, which
+    # drops price-fixing listings on either side
+    center = statistics.median(prices)
+    spread = mad(prices) * _mad_scale
+    if spread == 0:
+        return center
+    kept = [price for price in prices if abs(price - center) <= threshold * spread]
+    return statistics.fmean(kept)
+
+
+def dispersion(prices: Sequence[float]) -> float:
+    # relative spread of the prices, 0 when all listings agree
+    center = statistics.median(prices)
+    if center == 0:
+        return 0.0
+    return mad(prices) * _mad_scale / abs(center)
+
+
+ESTIMATORS: dict[str, Callable[[Sequence[float]], float]] = {
+    "mean": mean,
+    "median": median,
+    "trimmed_mean": trimmed_mean,
+    "mad_filtered_mean": mad_filtered_mean,
+}
+
+
+# The grouped estimators take the prices of many valuations at once: group i
+# is prices[offsets[i]:offsets[i + 1]]. They give the same estimate as the
+# functions above for every group, and nan for groups without prices. Each
+# group is a row of a matrix padded with inf, so sorting is a row-wise sort.
+
+
+def _padded(prices: np.ndarray, offsets: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    counts = np.diff(offsets)
+    group_ids = np.repeat(np.arange(len(counts)), counts)
+    ranks = np.arange(len(prices)) - offsets[:-1][group_ids]
+    matrix = np.full((len(counts), counts.max(initial=0)), np.inf)
+    matrix[group_ids, ranks] = prices
+    return matrix, counts
+
+
+def _row_median(ordered: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    medians = np.full(len(counts), np.nan)
+    rows = np.flatnonzero(counts)
+    counts = counts[rows]
+    medians[rows] = (ordered[rows, (counts - 1) // 2] + ordered[rows, counts // 2]) / 2
+    return medians
+
+
+def _row_mean(matrix: np.ndarray, kept: np.ndarray) -> np.ndarray:
+    # statistics.fmean divides the exactly rounded fsum, a plain sum can be an
+    # ulp off and round the other way at x.x5. Rows are summed column by
+    # column with their rounding errors carried along (TwoSum).
+    total = np.zeros(len(matrix))
+    error = np.zeros(len(matrix))
+    for column in np.where(kept, matrix, 0.0).T:
+        summed = total + column
+        part = summed - total
+        error += (total - (summed - part)) + (column - part)
+        total = summed
+    counts = kept.sum(axis=1)
+    return np.divide(
+        total + error, counts, out=np.full(len(matrix), np.nan), where=counts > 0
+    )
+
+
+def _center_and_deviations(
+    prices: np.ndarray, offsets: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    # sorted rows, their medians, and the absolute deviations from them
+    matrix, counts = _padded(prices, offsets)
+    ordered = np.sort(matrix, axis=1)
+    center = _row_median(ordered, counts)
+    deviations = np.abs(ordered - center[:, None])
+    return ordered, counts, center, deviations
+
+
+def grouped_mean(prices: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    matrix, _ = _padded(prices, offsets)
+    return _row_mean(matrix, np.isfinite(matrix))
+
+
+def grouped_median(prices: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    matrix, counts = _padded(prices, offsets)
+    return _row_median(np.sort(matrix, axis=1), counts)
+
+
+def grouped_trimmed_mean(
+    prices: np.ndarray, offsets: np.ndarray, proportion: float = 0.2
+) -> np.ndarray:
+    matrix, counts = _padded(prices, offsets)
+    ordered = np.sort(matrix, axis=1)
+    ranks = np.arange(ordered.shape[1])
+    cut = (counts * proportion).astype(np.int64)
+    kept = (ranks >= cut[:, None]) & (ranks < (counts - cut)[:, None])
+    # groups that would be cut to nothing keep all their prices
+    kept_all = (counts - 2 * cut <= 0)[:, None] & (ranks < counts[:, None])
+    return _row_mean(ordered, kept | kept_all)
+
+
+def grouped_mad(prices: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    _, counts, _, deviations = _center_and_deviations(prices, offsets)
+    return _row_median(np.sort(deviations, axis=1), counts)
+
+
+def grouped_mad_filtered_mean(
+    prices: np.ndarray, offsets: np.ndarray, threshold: float = 3.0
+) -> np.ndarray:
+    ordered, counts, center, deviations = _center_and_deviations(prices, offsets)
+    spread = _row_median(np.sort(deviations, axis=1), counts) * _mad_scale
+    means = _row_mean(ordered, deviations <= (threshold * spread)[:, None])
+    return np.where(spread == 0, center, means)
+
+
+def grouped_dispersion(prices: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    _, counts, center, deviations = _center_and_deviations(prices, offsets)
+    spread = _row_median(np.sort(deviations, axis=1), counts) * _mad_scale
+    return np.divide(
+        spread, np.abs(center), out=np.zeros(len(center)), where=center != 0
+    )
+
+
+GROUPED_ESTIMATORS: dict[str, Callable[[np.ndarray, np.ndarray], np.ndarray]] = {
+    "mean": grouped_mean,
+    "median": grouped_median,
+    "trimmed_mean": grouped_trimmed_mean,
+    "mad_filtered_mean": grouped_mad_filtered_mean,
+}
+
+
+class AdaptiveEstimator:
+    # Decides how deep to page through the search results: stop after the
+    # first page when the prices agree, keep paging while they are spread out
+    # until the estimate stops moving or max_pages is reached.
+
+    def __init__(
+        self,
+        estimator: str = "mad_filtered_mean",
+        min_listings: int = 5,
+        max_dispersion: float = 0.15,
+        tolerance: float = 0.02,
+        max_pages: int = 3,
+    ) -> None:
+        if estimator not in ESTIMATORS:
+            raise ValueError(f"Unknown estimator: '{estimator}'")
+        self.estimator = estimator
+        self.min_listings = min_listings
+        self.max_dispersion = max_dispersion
+        self.tolerance = tolerance
+        self.max_pages = max_pages
+
+    def estimate(self, prices: Sequence[float]) -> float:
+        return ESTIMATORS[self.estimator](prices)
+
+    def estimate_many(self, prices: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+        return GROUPED_ESTIMATORS[self.estimator](prices, offsets)
+
+    def stopping_rule(self) -> Callable[[Sequence[float]], bool]:
+        # Returns a fresh `enough` check for one valuation, it is called with
+        # all prices fetched so far after every page.
+        previous: list[float] = []
+
+        def enough(prices: Sequence[float]) -> bool:
+            if len(prices) < self.min_listings:
+                return False
+            if dispersion(prices) <= self.max_dispersion:
+                return True
+            estimate = self.estimate(prices)
+            converged = previous != [] and abs(estimate - previous[-1]) <= (
+                self.tolerance * abs(previous[-1])
+            )
+            previous.append(estimate)
+            return converged
+
+        return enough
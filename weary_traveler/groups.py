@@ -0,0 +1,76 @@
+from dataclasses import dataclass, field
+from typing import Any
+
+_league = "affliction"
+_skill_gems_url = f"https://poe.ninja/economy/{_league}/skill-gems"
+
+
+@dataclass
+class Group:
+    # A poe.ninja page whose items are valued with every modifier set in
+    # modifiers_list, stored in data/db/<store>.db.
+    name: str
+    url: str
+    modifiers_list: list[dict[str, Any]] = field(default_factory=list)
+    store: str = ""
+
+    def __post_init__(self) -> None:
+        if self.store == "":
+            self.store = self.name.lower().replace(" ", "_")
+
+
+GROUPS: dict[str, Group] = {}
+
+
+def register(group: Group) -> Group:
+    if group.name in GROUPS:
+        raise ValueError(f"Group '{group.name}' is already registered")
+    GROUPS[group.name] = group
+    return group
+
+
+def get_group(name: str) -> Group:
+    if name not in GROUPS:
+        raise KeyError(f"Unknown group: '{name}'")
+    return GROUPS[name]
+
+
+def get_group_by_store(store: str) -> Group:
+    for group in GROUPS.values():
+        if group.store == store:
+            return group
+    raise KeyError(f"Unknown store: '{store}'")
+
+
+# Fetcher searches by base type with gem filters, so the registered groups are
+# gem pages: buy the gem at level 1 and sell it levelled and qualitied.
+register(
+    Group(
+        name="Awakened Gems",
+        url=f"{_skill_gems_url}?level=5&quality=20&corrupted=No&gemType=Awakened",
+        modifiers_list=[
+            {"max_gem_level": 1, "corrupted": "false"},
+            {"min_gem_level": 5, "corrupted": "false", "min_quality": 20},
+        ],
+    )
+)
+register(
+    Group(
+        name="Vaal Gems",
+        url=f"{_skill_gems_url}?level=20&quality=20&corrupted=Yes&gemType=Vaal",
+        modifiers_list=[
+            {"max_gem_level": 1, "min_quality": 20},
+            {"min_gem_level": 20, "min_quality": 20},
+        ],
+    )
+)
+register(
+    Group(
+        name="Skill Gems",
+        url=f"{_skill_gems_url}?level=20&quality=20&corrupted=No",
+        modifiers_list=[
+            {"max_gem_level": 1, "corrupted": "false"},
+            {"min_gem_level": 20, "corrupted": "false", "min_quality": 20},
+        ],
+    )
+)
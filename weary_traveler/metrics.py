@@ -0,0 +1,340 @@
+import bisect
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable
+
+# seconds, from a cached page parse up to a long rate limit wait
+_latency_buckets = (
+    0.0001,
+    0.0005,
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class Counter:
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def sample(self) -> dict[str, Any]:
+        return {"value": self.value}
+
+
+class Timer:
+    # with histogram.time(): ... records the block's duration
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram: "Histogram") -> None:
+        self.histogram = histogram
+        self.start = 0.0
+
+    def __enter__(self) -> "Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class Histogram:
+    # Counts per fixed bucket, the last one is +Inf. Recording is a bisect and
+    # three additions, cheap enough to leave on around every request.
+
+    def __init__(self, buckets: tuple[float, ...] = _latency_buckets) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        bucket = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[bucket] += 1
+            self.count += 1
+            self.sum += value
+
+    def time(self) -> Timer:
+        return Timer(self)
+
+    def quantile(self, q: float) -> float:
+        # interpolated within the bucket, like Prometheus' histogram_quantile
+        with self._lock:
+            counts = list(self.counts)
+            count = self.count
+        if count == 0:
+            return math.nan
+        rank = q * count
+        seen = 0
+        for bucket, bucket_count in enumerate(counts):
+            if seen + bucket_count >= rank and bucket_count:
+                if bucket == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[bucket - 1] if bucket else 0.0
+                upper = self.buckets[bucket]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+    def sample(self) -> dict[str, Any]:
+        with self._lock:
+            counts = list(self.counts)
+            count, total = self.count, self.sum
+        return {
+            "count": count,
+            "sum": total,
+            "mean": total / count if count else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": dict(zip([*map(str, self.buckets), "+Inf"], counts)),
+        }
+
+
+class Meter(Counter):
+    # A counter that also knows how many events happened in the last `window`
+    # seconds, e.g. the items refreshed in the last minute.
+
+    def __init__(self, window: float = 60.0) -> None:
+        super().__init__()
+        self.window = window
+        self._events: deque[tuple[float, float]] = deque()
+
+    def mark(self, amount: float = 1.0) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self.value += amount
+            self._events.append((now, amount))
+            self._expire(now)
+
+    def _expire(self, now: float) -> None:
+        while self._events and self._events[0][0] <= now - self.window:
+            self._events.popleft()
+
+    def recent(self) -> float:
+        with self._lock:
+            self._expire(time.monotonic())
+            return sum(amount for _, amount in self._events)
+
+
+class Gauge:
+    # read from `read` every time the metrics are exported
+    def __init__(self, read: Callable[[], float]) -> None:
+        self.read = read
+
+    @property
+    def value(self) -> float:
+        try:
+            return float(self.read())
+        except Exception as e:
+            print("Error: ", e)
+            return math.nan
+
+    def sample(self) -> dict[str, Any]:
+        return {"value": self.value}
+
+
+def _labels_key(labels: dict[str, Any]) -> Labels:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(labels: Labels, extra: Labels = ()) -> str:
+    labels = labels + extra
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _number(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class MetricsRegistry:
+    # Named metrics with optional labels. Asking for the same name and labels
+    # again returns the same metric, so callers can look them up on the hot
+    # path instead of keeping references around.
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # name -> (kind, help, {labels: metric})
+        self._families: dict[str, tuple[str, str, dict[Labels, Any]]] = {}
+
+    def _get(
+        self, kind: str, name: str, help: str, labels: dict, factory: Callable
+    ) -> Any:
+        key = _labels_key(labels)
+        family = self._families.get(name)
+        if family is not None and family[0] == kind:
+            metric = family[2].get(key)
+            if metric is not None:
+                return metric
+        with self._lock:
+            family = self._families.setdefault(name, (kind, help, {}))
+            if family[0] != kind:
+                raise ValueError(f"Metric '{name}' is already a {family[0]}")
+            if key not in family[2]:
+                family[2][key] = factory()
+            return family[2][key]
+
+    def counter(self, name: str, help: str, **labels: Any) -> Counter:
+        return self._get("counter", name, help, labels, Counter)
+
+    def meter(self, name: str, help: str, window: float = 60.0, **labels: Any) -> Meter:
+        return self._get("counter", name, help, labels, lambda: Meter(window))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        buckets: tuple[float, ...] = _latency_buckets,
+        **labels: Any,
+    ) -> Histogram:
+        return self._get("histogram", name, help, labels, lambda: Histogram(buckets))
+
+    def gauge(
+        self, name: str, help: str, read: Callable[[], float], **labels: Any
+    ) -> Gauge:
+        # registering again replaces the reader, e.g. for a new DataHandler
+        with self._lock:
+            family = self._families.setdefault(name, ("gauge", help, {}))
+            if family[0] != "gauge":
+                raise ValueError(f"Metric '{name}' is already a {family[0]}")
+            gauge = family[2][_labels_key(labels)] = Gauge(read)
+            return gauge
+
+    def get(self, name: str, **labels: Any) -> Any:
+        # None if nothing was recorded under this name and labels yet
+        family = self._families.get(name)
+        return family[2].get(_labels_key(labels)) if family else None
+
+    def _collect(self) -> list[tuple[str, str, str, list[tuple[Labels, Any]]]]:
+        with self._lock:
+            return [
+                (name, kind, help, list(metrics.items()))
+                for name, (kind, help, metrics) in sorted(self._families.items())
+            ]
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            name: {
+                "type": kind,
+                "help": help,
+                "series": [
+                    {"labels": dict(labels), **metric.sample()}
+                    for labels, metric in metrics
+                ],
+            }
+            for name, kind, help, metrics in self._collect()
+        }
+
+    def to_json(self) -> str:
+        # nan quantiles of empty histograms are written as null
+        def clean(value: Any) -> Any:
+            if isinstance(value, float) and math.isnan(value):
+                return None
+            if isinstance(value, dict):
+                return {k: clean(v) for k, v in value.items()}
+            if isinstance(value, list):
+                return [clean(v) for v in value]
+            return value
+
+        return json.dumps(clean(self.to_dict()), indent=2)
+
+    def to_prometheus(self) -> str:
+        # text exposition format 0.0.4
+        lines = []
+        for name, kind, help, metrics in self._collect():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in metrics:
+                if kind != "histogram":
+                    lines.append(f"{name}{_label_text(labels)} {_number(metric.value)}")
+                    continue
+                with metric._lock:
+                    counts = list(metric.counts)
+                    count, total = metric.count, metric.sum
+                cumulative = 0
+                for bound, bucket_count in zip([*metric.buckets, math.inf], counts):
+                    cumulative += bucket_count
+                    le = (("le", _number(bound)),)
+                    lines.append(f"{name}_bucket{_label_text(labels, le)} {cumulative}")
+                lines.append(f"{name}_sum{_label_text(labels)} {_number(total)}")
+                lines.append(f"{name}_count{_label_text(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, folder: str) -> None:
+        # metrics.prom for a node exporter textfile collector, metrics.json
+        # for everything else. Replaced atomically, readers never see half.
+        os.makedirs(folder, exist_ok=True)
+        for file_name, text in (
+            ("metrics.prom", self.to_prometheus()),
+            ("metrics.json", self.to_json()),
+        ):
+            path = os.path.join(folder, file_name)
+            with open(path + ".tmp", "w") as file:
+                file.write(text)
+            os.replace(path + ".tmp", path)
+
+    def serve(self, port: int = 9108, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        # /metrics in Prometheus text, /metrics.json as JSON. Runs on a daemon
+        # thread until server.shutdown().
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path == "/metrics":
+                    body = registry.to_prometheus().encode()
+                    content_type = "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body = registry.to_json().encode()
+                    content_type = "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+# shared by every module of the process
+registry = MetricsRegistry()
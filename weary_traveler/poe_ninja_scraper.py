@@ -1,15 +1,207 @@
+import hashlib
+import json
 import os
+import tempfile
+import time
+from html.parser import HTMLParser
+from typing import Any, Iterator
+from urllib.parse import parse_qs, urlparse
 
 import pandas as pd
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.common.exceptions import TimeoutException
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.wait import WebDriverWait
+import requests
 
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+try:
+    from selenium import webdriver
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.wait import WebDriverWait
+except ImportError:
+    # the browser is only needed when the JSON api can't be used
+    webdriver = None
+
+_api_url = "https://poe.ninja/api/data/itemoverview"
+
+# columns of the poe.ninja table that are converted from text
+_column_types = {"Level": int, "Value": float}
+
+# poe.ninja page slugs and the item overview type they are backed by
+_overview_types = {
+    "skill-gems": "SkillGem",
+    "cluster-jewels": "ClusterJewel",
+    "unique-jewels": "UniqueJewel",
+    "unique-flasks": "UniqueFlask",
+    "unique-weapons": "UniqueWeapon",
+    "unique-armours": "UniqueArmour",
+    "unique-accessories": "UniqueAccessory",
+    "unique-maps": "UniqueMap",
+    "divination-cards": "DivinationCard",
+    "base-types": "BaseType",
+    "maps": "Map",
+    "essences": "Essence",
+    "fossils": "Fossil",
+    "scarabs": "Scarab",
+}
+
+
+def fetch_data(url: str, mode: str = "auto", name: str = "") -> list[str]:
+    # mode "http" reads poe.ninja's JSON api, "browser" renders the page with
+    # Selenium, "auto" tries the api first and falls back to the browser.
+    # The table is saved as data/ninja/<name>.csv, by default named after the
+    # url like its snapshot.
+    if mode == "http":
+        data = fetch_overview(url)
+    elif mode == "browser":
+        data = parse_table(fetch_page_source(url))
+    elif mode == "auto":
+        try:
+            data = fetch_overview(url)
+        except (requests.RequestException, ValueError, KeyError) as e:
+            print("Error: ", e)
+            data = parse_table(fetch_page_source(url))
+    else:
+        raise ValueError(f"Unknown mode: '{mode}'")
+    # an empty table is a failed scrape, it never replaces the saved one
+    if data.empty:
+        raise ValueError(f"No items found at: '{url}'")
+
+    save_data(data, name or _url_key(url))
+
+    return data["Name"].tolist()
+
+
+def fetch_snapshot(
+    url: str,
+    ttl: float = 3600.0,
+    mode: str = "auto",
+    refresh: bool = False,
+    name: str = "",
+) -> dict[str, Any]:
+    # The item names of a poe.ninja page cached on disk for `ttl` seconds.
+    # "hash" identifies the content, "changed" is False when the names are the
+    # same as in the previous snapshot of this url.
+    file_path = snapshot_path(url)
+    previous = load_snapshot(file_path)
+    if (
+        previous is not None
+        and not refresh
+        and time.time() - previous["fetched_at"] < ttl
+    ):
+        return {**previous, "changed": False}
+
+    item_names = fetch_data(url, mode, name)
+    # never the new baseline, the previous snapshot stays
+    if not item_names:
+        raise ValueError(f"poe.ninja returned no items for: '{url}'")
+    snapshot = {
+        "url": url,
+        "fetched_at": time.time(),
+        "hash": content_hash(item_names),
+        "item_names": item_names,
+    }
+    save_snapshot(file_path, snapshot)
+    changed = previous is None or previous["hash"] != snapshot["hash"]
+    return {**snapshot, "changed": changed}
+
+
+def content_hash(item_names: list[str]) -> str:
+    return hashlib.sha256(json.dumps(sorted(item_names)).encode()).hexdigest()
+
+
+def _url_key(url: str) -> str:
+    return hashlib.sha256(url.encode()).hexdigest()[:16]
+
+
+def snapshot_path(url: str) -> str:
+    current_working_dir = os.getcwd()
+    folder_path = os.path.join(current_working_dir, "data/ninja/snapshots")
+    return os.path.join(folder_path, f"{_url_key(url)}.json")
+
+
+def load_snapshot(file_path: str) -> dict[str, Any] | None:
+    if not os.path.exists(file_path):
+        return None
+    try:
+        with open(file_path, "r") as f:
+            return json.load(f)
+    except ValueError as e:
+        print("Error: ", e)
+        return None
+
+
+def save_snapshot(file_path: str, snapshot: dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    # write to a temporary file first so a crash never leaves half a snapshot
+    with tempfile.NamedTemporaryFile(
+        "w", dir=os.path.dirname(file_path), suffix=".tmp", delete=False
+    ) as f:
+        json.dump(snapshot, f)
+    os.replace(f.name, file_path)
+
+
+def overview_request(url: str) -> tuple[dict[str, str], dict[str, list[str]]]:
+    # https://poe.ninja/economy/<league>/<category>?<filters>
+    parsed = urlparse(url)
+    parts = [part for part in parsed.path.split("/") if part]
+    if len(parts) < 3 or parts[-1] not in _overview_types:
+        raise ValueError(f"Not a poe.ninja item overview url: {url}")
+    league = parts[-2].replace("-", " ").title()
+    overview_type = _overview_types[parts[-1]]
+    return {"league": league, "type": overview_type}, parse_qs(parsed.query)
+
+
+def fetch_overview(url: str) -> pd.DataFrame:
+    params, filters = overview_request(url)
+    response = requests.get(_api_url, params=params, timeout=(5, 30))
+    response.raise_for_status()
+    return overview_to_frame(response.json(), filters)
+
+
+def overview_to_frame(
+    overview: dict, filters: dict[str, list[str]] | None = None
+) -> pd.DataFrame:
+    filters = filters or {}
+    lines = overview["lines"]
+
+    # the same filters the poe.ninja page applies through its query string
+    if "level" in filters:
+        lines = [x for x in lines if x.get("gemLevel") == int(filters["level"][0])]
+    if "quality" in filters:
+        lines = [x for x in lines if x.get("gemQuality") == int(filters["quality"][0])]
+    if "corrupted" in filters:
+        corrupted = filters["corrupted"][0] == "Yes"
+        lines = [x for x in lines if x.get("corrupted", False) == corrupted]
+    if "gemType" in filters:
+        prefix = filters["gemType"][0] + " "
+        lines = [x for x in lines if x["name"].startswith(prefix)]
+    # e.g. a misspelled league, auto mode falls back to the browser
+    if not lines:
+        raise ValueError("The overview has no items matching the filters")
+
+    data = pd.DataFrame(
+        {
+            "Name": [x["name"] for x in lines],
+            "Level": [x.get("gemLevel", 0) for x in lines],
+            "Quality": [x.get("gemQuality", 0) for x in lines],
+            "Corrupt": ["Yes" if x.get("corrupted") else "No" for x in lines],
+            "Value": [x.get("chaosValue", 0.0) for x in lines],
+            "# Listed": [x.get("listingCount", 0) for x in lines],
+        }
+    )
+    data["Level"] = data["Level"].astype(int)
+    data["Value"] = data["Value"].astype(float)
+    return data
+
+
+def fetch_page_source(url: str) -> str:
+    if webdriver is None:
+        raise ImportError("selenium is required to scrape poe.ninja with a browser")
 
-def fetch_data(url: str) -> list[str]:
     options = webdriver.ChromeOptions()
     options.add_argument("headless")
     driver = webdriver.Chrome(options=options)
@@ -29,40 +221,150 @@ def fetch_data(url: str) -> list[str]:
 
     driver.quit()
 
-    soup = BeautifulSoup(html_content, "html.parser")
-
-    tr_elements = soup.find_all("tr")
-    column_names = []
-    datalist = []
-
-    for tr in tr_elements:
-        td_elements = tr.find_all("td")
-        if len(td_elements) < 2:
-            th_elements = soup.find_all("th")
-            for element in th_elements:
-                column_names.append(element.text)
-        else:
-            items_dict = {}
-            for i in range(0, len(td_elements)):
-                if i == 0:
-                    anchor_href = td_elements[i].find("a")
-                    items_dict[column_names[i]] = anchor_href.find("span").text
-                else:
-                    items_dict[column_names[i]] = td_elements[i].text
-            datalist.append(items_dict)
-    data = pd.DataFrame(datalist)
-    data["Level"] = data["Level"].astype(int)
-    data["Value"] = data["Value"].astype(float)
+    return html_content
 
-    save_data(data)
 
-    return data["Name"].tolist()
+class _TableTarget:
+    # Collects the cells of every <tr> from parser events. The header row is
+    # read once, from the first row made of <th> cells. The name cell keeps
+    # the text of the first <span> in its link, like the page shows it.
+
+    def __init__(self) -> None:
+        self.headers: list[str] = []
+        self.rows: list[list[str]] = []
+        self._cells: list[str] = []
+        self._header_cells: list[str] = []
+        self._text: list[str] | None = None
+        self._span_text: list[str] | None = None
+        self._name: str | None = None
+        self._in_anchor = False
+
+    def start(self, tag: str, attrs: Any) -> None:
+        if tag == "tr":
+            self._cells = []
+            self._header_cells = []
+        elif tag in ("td", "th"):
+            self._text = []
+            self._name = None
+        elif tag == "a" and self._text is not None:
+            self._in_anchor = True
+        elif tag == "span" and self._in_anchor and self._name is None:
+            self._span_text = []
+
+    def end(self, tag: str) -> None:
+        if tag == "span" and self._span_text is not None:
+            self._name = "".join(self._span_text)
+            self._span_text = None
+        elif tag == "a":
+            self._in_anchor = False
+        elif tag in ("td", "th") and self._text is not None:
+            text = "".join(self._text)
+            if tag == "th":
+                self._header_cells.append(text)
+            elif not self._cells and self._name is not None:
+                self._cells.append(self._name)
+            else:
+                self._cells.append(text)
+            self._text = None
+        elif tag == "tr":
+            if len(self._cells) >= 2:
+                self.rows.append(self._cells)
+            elif self._header_cells and not self.headers:
+                self.headers = self._header_cells
+
+    def data(self, text: str) -> None:
+        if self._text is not None:
+            self._text.append(text)
+        if self._span_text is not None:
+            self._span_text.append(text)
+
+    def close(self) -> None:
+        pass
+
+
+class _StdlibTableParser(HTMLParser):
+    def __init__(self, target: _TableTarget) -> None:
+        super().__init__()
+        self.target = target
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        self.target.start(tag, attrs)
+
+    def handle_endtag(self, tag: str) -> None:
+        self.target.end(tag)
+
+    def handle_data(self, data: str) -> None:
+        self.target.data(data)
+
+
+def _table_parser(target: _TableTarget, backend: str | None) -> Any:
+    if backend is None:
+        backend = "html.parser" if etree is None else "lxml"
+    if backend == "lxml":
+        if etree is None:
+            raise ImportError("lxml is required for the lxml table parser")
+        return etree.HTMLParser(target=target)
+    if backend == "html.parser":
+        return _StdlibTableParser(target)
+    raise ValueError(f"Unknown backend: '{backend}'")
+
+
+def iter_table_rows(
+    html_content: str, backend: str | None = None, chunk_size: int = 1 << 16
+) -> Iterator[tuple[list[str], list[Any]]]:
+    # Parses the page in one pass and yields (headers, row) as soon as each
+    # row is complete, with the typed columns converted. Rows whose typed
+    # columns are empty or not numbers, like separator rows, are skipped.
+    target = _TableTarget()
+    parser = _table_parser(target, backend)
+
+    def drain() -> Iterator[tuple[list[str], list[Any]]]:
+        rows, target.rows = target.rows, []
+        for row in rows:
+            typed = _typed_row(target.headers, row)
+            if typed is not None:
+                yield target.headers, typed
+
+    for start in range(0, len(html_content), chunk_size):
+        parser.feed(html_content[start : start + chunk_size])
+        yield from drain()
+    parser.close()
+    yield from drain()
+
+
+def _typed_row(headers: list[str], row: list[str]) -> list[Any] | None:
+    typed = row[: len(headers)] + [""] * (len(headers) - len(row))
+    for i, header in enumerate(headers):
+        if header in _column_types:
+            try:
+                typed[i] = _column_types[header](typed[i])
+            except ValueError:
+                return None
+    return typed
+
+
+def parse_table(html_content: str, backend: str | None = None) -> pd.DataFrame:
+    headers: list[str] = []
+    columns: list[list[Any]] = []
+    for headers, row in iter_table_rows(html_content, backend):
+        if not columns:
+            columns = [[] for _ in headers]
+        for column, value in zip(columns, row):
+            column.append(value)
+
+    return pd.DataFrame(dict(zip(headers, columns)))
 
 
-def save_data(data: pd.DataFrame) -> None:
+def save_data(data: pd.DataFrame, name: str) -> None:
+    # one file per group, groups are scraped concurrently
     current_working_dir = os.getcwd()
     folder_path = os.path.join(current_working_dir, "data/ninja")
     if not os.path.exists(folder_path):
-        os.makedirs(folder_path)
-    file_path = os.path.join(folder_path, "poe_ninja_data.csv")
-    data.to_csv(file_path)
+        os.makedirs(folder_path, exist_ok=True)
+    file_path = os.path.join(folder_path, f"{name}.csv")
+    # readers never see a half written file
+    with tempfile.NamedTemporaryFile(
+        "w", dir=folder_path, suffix=".tmp", delete=False
+    ) as f:
+        data.to_csv(f)
+    os.replace(f.name, file_path)
@@ -1,41 +1,114 @@
 import dataclasses
 import json
+import math
 import os
-import time
-from dataclasses import dataclass
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Any
+from typing import Any, Callable, ClassVar, Iterable, Iterator
+from urllib.parse import quote
 
+import metrics
+import numpy as np
 import poe_ninja_scraper as poe_ninja_scraper
 import requests
+from batch_valuation import profit_pairs
+from currency_rates import CurrencyRates, shared_rates
 from dotenv import load_dotenv
+from estimators import AdaptiveEstimator
+from groups import get_group
+from price_history import PriceHistory, PriceStats
+from query_cache import TTLCache, query_key
+from rate_limiter import RateLimiter
+from scheduler import RefreshScheduler, SchedulerWeights
+from storage import (
+    SqliteStorage,
+    StorageBackend,
+    item_entry_key,
+    modifiers_key,
+    profit_strat_key,
+    strat_profit,
+)
+from strat_index import StratIndex
+from trade_pipeline import TradePipeline
+from trade_session import TradeSession
 
 load_dotenv()
 
+_fetch_errors = metrics.registry.counter(
+    "fetch_errors_total", "Valuations that failed with a request error"
+)
+_separate_searches = metrics.registry.counter(
+    "variant_fallback_searches_total",
+    "Variants a shared search did not cover, searched on their own",
+)
+_listing_parse = metrics.registry.histogram(
+    "listing_parse_seconds", "Time to read a page of fetched listings"
+)
+_profit_recompute = metrics.registry.histogram(
+    "profit_recompute_seconds", "Time to update the strats of a valued entry"
+)
+_items_refreshed = metrics.registry.meter("items_refreshed_total", "Valuations stored")
+metrics.registry.gauge(
+    "items_refreshed_per_minute",
+    "Valuations stored in the last minute",
+    _items_refreshed.recent,
+)
 
-@dataclass
+
+@dataclass(slots=True)
 class Listing:
     price: float
     currency: str
+    gem_level: int | None = None
+    quality: int | None = None
+    corrupted: bool = False
+    rates: ClassVar[CurrencyRates] = shared_rates
 
     def __post_init__(self) -> None:
-        if self.currency == "chaos":
-            self.price = self.price / 120.0
+        # prices are kept in divine, nan when the currency has no rate
+        if self.currency != "divine":
+            self.price = self.price * Listing.rates.rate(self.currency)
             self.currency = "divine"
 
 
 class Fetcher:
     _trade_url = "https://www.pathofexile.com/api/trade/search/Necropolis"
+    _fetch_url = "https://www.pathofexile.com/api/trade/fetch"
+    _search_page_url = "https://www.pathofexile.com/trade/search/Necropolis"
+    # the fetch endpoint accepts at most 10 result ids per call
+    _page_size = 10
     _header = {"user-agent": str(os.getenv("EMAIL"))}
-    _last_query_time = datetime(2024, 1, 1, 00, 00, 00)
+    # shared by every Fetcher, search and fetch have separate budgets
+    _rate_limiter = RateLimiter()
+    _session = TradeSession(_header, _rate_limiter)
+    # identical searches within a minute reuse the same response
+    _cache = TTLCache(maxsize=512, ttl=60.0)
+    _estimator = AdaptiveEstimator()
 
-    def __init__(self, item_name: str, modifiers: dict[str, Any]) -> None:
+    def __init__(
+        self,
+        item_name: str,
+        modifiers: dict[str, Any],
+        stop_event: threading.Event | None = None,
+    ) -> None:
         self.item_name = item_name
         self.modifiers = modifiers
+        # cancels rate limit and retry waits of this fetcher's requests
+        self.stop_event = stop_event
         self.query = Fetcher.build_query(item_name, modifiers)
+        self.query_key = query_key(self.query)
         self.listings = []
         self.number_listed = 0
         self.result_id = ""
+        self.result_ids: list[str] = []
+        # when the oldest response behind the listings was received, cached
+        # responses can be up to the cache's ttl old
+        self.fetched_at: datetime | None = None
+        self.error: requests.RequestException | None = None
 
     @staticmethod
     def build_query(item_name, modifiers):
@@ -88,40 +161,277 @@ class Fetcher:
         return query
 
     def fetch(self) -> None:
-        seconds_since_last_query = (datetime.now() - self._last_query_time).seconds
-        while seconds_since_last_query < 10:
-            time.sleep(10 - seconds_since_last_query)
-            seconds_since_last_query = (datetime.now() - self._last_query_time).seconds
-
         try:
-            Fetcher._last_query_time = datetime.now()
-            r = requests.post(self._trade_url, headers=self._header, json=self.query)
-            r.raise_for_status()
-            self.number_listed: int = r.json().get("total", 0)
-            result = r.json().get("result", [])[:10]
-            self.result_id = r.json().get("id", "")
-            text_result = ",".join(result)
-            fetch_url = f"https://www.pathofexile.com/api/trade/fetch/{text_result}?query={self.result_id}"
-            response = requests.get(fetch_url, headers=self._header)
-            response.raise_for_status()
-
-            self.listings = self.extract_listings(response)
-
+            self.search()
+            self.fetch_listings()
         except requests.RequestException as e:
-            print("Error: ", e)
+            # counted for the status panel, the entry keeps its last value
+            _fetch_errors.inc()
+            self.error = e
+
+    def search(self) -> None:
+        (number_listed, result_ids, result_id), searched_at = (
+            self._cache.get_or_compute(
+                ("search", self.query_key), lambda: _received(self._search)
+            )
+        )
+        self.fetched_at = searched_at
+        self.number_listed: int = number_listed
+        self.result_ids = list(result_ids)
+        self.result_id = result_id
+
+    def _search(self) -> tuple[int, tuple[str, ...], str]:
+        r = self._session.post(
+            "search", self._trade_url, stop_event=self.stop_event, json=self.query
+        )
+        r.raise_for_status()
+        return (
+            r.json().get("total", 0),
+            tuple(r.json().get("result", [])),
+            r.json().get("id", ""),
+        )
+
+    def fetch_listings(
+        self,
+        pages: int | None = None,
+        enough: Callable[[list[Listing]], bool] | None = None,
+    ) -> None:
+        # Fetches up to `pages` pages of results, stopping early once
+        # `enough` is satisfied by the listings fetched so far. By default the
+        # estimator decides how many pages are needed.
+        if pages is None:
+            pages = self._estimator.max_pages
+            enough = self._estimator_rule()
+        self.listings = []
+        for start in range(0, pages * self._page_size, self._page_size):
+            page_ids = self.result_ids[start : start + self._page_size]
+            if page_ids == []:
+                break
+            text_result = ",".join(page_ids)
+            listings, fetched_at = self._cache.get_or_compute(
+                ("fetch", self.result_id, text_result),
+                lambda: _received(lambda: self._fetch(text_result)),
+            )
+            self.fetched_at = min(self.fetched_at or fetched_at, fetched_at)
+            self.listings.extend(listings)
+            if enough is not None and enough(self.listings):
+                break
+
+    def _estimator_rule(self) -> Callable[[list[Listing]], bool]:
+        rule = self._estimator.stopping_rule()
+        return lambda listings: rule([listing.price for listing in listings])
+
+    def apply_to(self, item_entry: "ItemEntry") -> None:
+        item_entry.apply_fetcher(self)
+
+    @property
+    def url(self) -> str:
+        return f"{self._search_page_url}/{self.result_id}"
+
+    @property
+    def fetched_all(self) -> bool:
+        return len(self.listings) >= min(self.number_listed, len(self.result_ids))
+
+    def _fetch(self, text_result: str) -> list[Listing]:
+        fetch_url = f"{self._fetch_url}/{text_result}?query={self.result_id}"
+        response = self._session.get("fetch", fetch_url, stop_event=self.stop_event)
+        response.raise_for_status()
+        return self.extract_listings(response)
 
     @staticmethod
     def extract_listings(response: requests.Response) -> list[Listing]:
+        with _listing_parse.time():
+            return Fetcher._extract_listings(response)
+
+    @staticmethod
+    def _extract_listings(response: requests.Response) -> list[Listing]:
         results = response.json().get("result", [])
+        price_infos = [result.get("listing", {}).get("price", {}) for result in results]
+        # the whole page is converted to divine with one rate lookup
+        currencies: dict[str, int] = {}
+        prices = Listing.rates.to_divine(
+            np.array([info.get("amount") for info in price_infos], np.float64),
+            np.array(
+                [
+                    currencies.setdefault(info.get("currency", ""), len(currencies))
+                    for info in price_infos
+                ],
+                np.int64,
+            ),
+            list(currencies),
+        )
         listings = []
-        for result in results:
-            price_info = result.get("listing", {}).get("price", {})
-            price_amount = price_info.get("amount", "")
-            currency = price_info.get("currency", "")
-            listings.append(Listing(price=price_amount, currency=currency))
+        for result, price in zip(results, prices.tolist()):
+            if math.isnan(price):
+                # no price or a currency without a rate
+                continue
+            item = result.get("item", {})
+            properties = {
+                prop.get("name"): prop.get("values", [[""]])[0][0]
+                for prop in item.get("properties", [])
+                if prop.get("values")
+            }
+            listings.append(
+                Listing(
+                    price=price,
+                    currency="divine",
+                    gem_level=_leading_int(properties.get("Level")),
+                    quality=_leading_int(properties.get("Quality")),
+                    corrupted=item.get("corrupted", False),
+                )
+            )
         return listings
 
 
+# hits and misses of the search and fetch response cache
+for _stat in ("hits", "misses", "coalesced"):
+    metrics.registry.gauge(
+        f"query_cache_{_stat}",
+        f"Trade response cache {_stat} since start",
+        lambda stat=_stat: getattr(Fetcher._cache, stat),
+    )
+
+
+def _received(request: Callable[[], Any]) -> tuple[Any, datetime]:
+    # a response together with the time it arrived, cached as one value
+    response = request()
+    return response, datetime.now()
+
+
+def _leading_int(text: str | None) -> int | None:
+    # property values look like "5 (Max)" or "+20%"
+    digits = re.match(r"\D*(\d+)", text or "")
+    return int(digits.group(1)) if digits else None
+
+
+class VariantFetcher:
+    # One broad search for all modifier variants of an item. The listings are
+    # assigned to the variants client-side, a variant with too few matches
+    # falls back to its own search.
+    #
+    # The search is sorted by price, so when the variants are priced far
+    # apart, like a level 1 and a level 20 gem, the first pages only hold the
+    # cheap one and the shared search costs more requests than it saves.
+    # Such items are valued with separate searches for their next
+    # `separate_refreshes` refreshes before sharing is tried again.
+    separate_refreshes = 10
+    _separate: ClassVar[dict[str, int]] = {}
+    _separate_lock = threading.Lock()
+
+    def __init__(
+        self,
+        item_name: str,
+        modifiers_list: list[dict[str, Any]],
+        min_listings: int = 3,
+        max_pages: int = 3,
+        stop_event: threading.Event | None = None,
+    ) -> None:
+        self.item_name = item_name
+        self.modifiers_list = modifiers_list
+        self.min_listings = min_listings
+        self.max_pages = max_pages
+        common = {
+            key: value
+            for key, value in modifiers_list[0].items()
+            if all(modifiers.get(key) == value for modifiers in modifiers_list[1:])
+        }
+        self.stop_event = stop_event
+        self.fetcher = Fetcher(item_name, common, stop_event)
+
+    @classmethod
+    def should_share(cls, item_name: str) -> bool:
+        with cls._separate_lock:
+            remaining = cls._separate.pop(item_name, 0)
+            if remaining > 1:
+                cls._separate[item_name] = remaining - 1
+            return remaining == 0
+
+    def search(self) -> None:
+        self.fetcher.search()
+
+    def fetch_listings(self) -> None:
+        rules = [Fetcher._estimator.stopping_rule() for _ in self.modifiers_list]
+
+        def enough(listings: list[Listing]) -> bool:
+            # every rule sees every page, they keep the estimates of earlier
+            # pages to tell whether their variant has converged
+            done = [
+                rule(
+                    [
+                        listing.price
+                        for listing in listings
+                        if listing_matches(modifiers, listing)
+                    ]
+                )
+                for rule, modifiers in zip(rules, self.modifiers_list)
+            ]
+            return all(done)
+
+        self.fetcher.fetch_listings(pages=self.max_pages, enough=enough)
+
+    def apply_to(self, item_entry: "ItemEntry") -> None:
+        listings = [
+            listing
+            for listing in self.fetcher.listings
+            if listing_matches(item_entry.modifiers, listing)
+        ]
+        if len(listings) < self.min_listings and not self.fetcher.fetched_all:
+            with self._separate_lock:
+                self._separate[self.item_name] = self.separate_refreshes
+            _separate_searches.inc()
+            item_entry.get_value_from_trade(self.stop_event)
+            return
+
+        if self.fetcher.fetched_all:
+            number_listed = len(listings)
+        else:
+            # estimated from the share of matching listings on the fetched pages
+            share = len(listings) / len(self.fetcher.listings)
+            number_listed = round(self.fetcher.number_listed * share)
+        query = Fetcher.build_query(item_entry.item_name, item_entry.modifiers)
+        url = f"{Fetcher._search_page_url}?q={quote(json.dumps(query))}"
+        item_entry.apply_listings(listings, number_listed, url, self.fetcher.fetched_at)
+
+
+# modifiers that can be checked against the properties of a fetched listing
+_listing_modifiers = {"max_gem_level", "min_gem_level", "min_quality", "corrupted"}
+
+
+def listing_matches(modifiers: dict[str, Any], listing: Listing) -> bool:
+    level = listing.gem_level
+    if "max_gem_level" in modifiers and (
+        level is None or level > modifiers["max_gem_level"]
+    ):
+        return False
+    if "min_gem_level" in modifiers and (
+        level is None or level < modifiers["min_gem_level"]
+    ):
+        return False
+    if "min_quality" in modifiers and (listing.quality or 0) < modifiers["min_quality"]:
+        return False
+    if "corrupted" in modifiers:
+        return listing.corrupted == (modifiers["corrupted"] == "true")
+    return True
+
+
+def can_share_search(modifiers_list: list[dict[str, Any]]) -> bool:
+    return len(modifiers_list) > 1 and all(
+        set(modifiers) <= _listing_modifiers for modifiers in modifiers_list
+    )
+
+
+def make_fetcher(
+    item_entries: list["ItemEntry"], stop_event: threading.Event | None = None
+) -> Fetcher | VariantFetcher:
+    if len(item_entries) == 1:
+        return Fetcher(item_entries[0].item_name, item_entries[0].modifiers, stop_event)
+    return VariantFetcher(
+        item_entries[0].item_name,
+        [item.modifiers for item in item_entries],
+        stop_event=stop_event,
+    )
+
+
 @dataclass
 class ItemEntry:
     item_name: str
@@ -130,6 +440,14 @@ class ItemEntry:
     value: float = 0
     number_listed: int = 0
     updated_at: datetime = datetime(1, 1, 1, 0, 0, 0, 1)
+    # prices of the listings behind the last valuation, kept for the price
+    # history and never written to storage
+    listing_prices: list[float] = field(default_factory=list, repr=False)
+
+    def __post_init__(self) -> None:
+        # stored entries come back with their timestamp as text
+        if isinstance(self.updated_at, str):
+            self.updated_at = datetime.fromisoformat(self.updated_at)
 
     def __eq__(self, other: object) -> bool:
         return (
@@ -149,26 +467,39 @@ class ItemEntry:
 
         return mod_str
 
-    def get_value_from_trade(self) -> None:
-        fetcher = Fetcher(self.item_name, self.modifiers)
+    def get_value_from_trade(self, stop_event: threading.Event | None = None) -> None:
+        fetcher = Fetcher(self.item_name, self.modifiers, stop_event)
         fetcher.fetch()
+        self.apply_fetcher(fetcher)
 
-        if fetcher.listings == []:
-            return
+    def apply_fetcher(self, fetcher: Fetcher) -> None:
+        self.apply_listings(
+            fetcher.listings, fetcher.number_listed, fetcher.url, fetcher.fetched_at
+        )
 
-        price_sum = 0.0
-        for listing in fetcher.listings:
-            price_sum += listing.price
+    def apply_listings(
+        self,
+        listings: list[Listing],
+        number_listed: int,
+        url: str,
+        fetched_at: datetime | None = None,
+    ) -> None:
+        # dated by when the listings were received, not when they are applied
+        if listings == []:
+            # nothing new, e.g. the fetch failed, the last valuation stays
+            self.listing_prices = []
+            return
 
-        price_mean = price_sum / len(fetcher.listings)
+        self.listing_prices = [listing.price for listing in listings]
+        price = Fetcher._estimator.estimate(self.listing_prices)
 
-        self.value = round(price_mean, 1)
-        self.updated_at = datetime.now()
-        self.number_listed = fetcher.number_listed
-        self.url = f"https://www.pathofexile.com/trade/search/Necropolis/{fetcher.result_id}"
+        self.value = round(price, 1)
+        self.updated_at = fetched_at or datetime.now()
+        self.number_listed = number_listed
+        self.url = url
 
 
-@dataclass
+@dataclass(slots=True)
 class ProfitStrat:
     item_name: str
     buy_item: ItemEntry
@@ -181,10 +512,18 @@ class ProfitStrat:
         if isinstance(self.sell_item, dict):
             self.sell_item = ItemEntry(**self.sell_item)
 
-        if self.sell_item.value > 0 and self.buy_item.value > 0:
-            self.profit = round(self.sell_item.value - self.buy_item.value, 1)
-        else:
-            self.profit = 0
+        self.update_profit()
+
+    @property
+    def key(self) -> tuple[str, str, str]:
+        return (
+            self.item_name,
+            modifiers_key(self.buy_item.modifiers),
+            modifiers_key(self.sell_item.modifiers),
+        )
+
+    def update_profit(self) -> None:
+        self.profit = strat_profit(self.buy_item.value, self.sell_item.value)
 
     def __eq__(self, other: object) -> bool:
         return (
@@ -194,92 +533,399 @@ class ProfitStrat:
         )
 
 
-class EnhancedJSONEncoder(json.JSONEncoder):
-    def default(self, o):
-        if dataclasses.is_dataclass(o):
-            return dataclasses.asdict(o)
-        return super().default(o)
+class ProfitEngine:
+    # Keeps every variant of an item in memory so a single price change only
+    # touches the strats of that item. Strats reference the live ItemEntry
+    # objects, and `index` keeps them queryable by profit, item and age.
+
+    def __init__(self) -> None:
+        self._variants: dict[str, dict[str, ItemEntry]] = {}
+        self._strats: dict[tuple[str, str, str], ProfitStrat] = {}
+        self.index = StratIndex()
+
+    def load(self, item_entries: Iterable[ItemEntry]) -> None:
+        if self._variants:
+            for item_entry in item_entries:
+                self.update_item_entry(item_entry)
+            return
+
+        # an empty engine pairs up all variants at once, see profit_pairs
+        for item_entry in item_entries:
+            variants = self._variants.setdefault(item_entry.item_name, {})
+            variants[modifiers_key(item_entry.modifiers)] = item_entry
+        names: dict[str, int] = {}
+        entries = []
+        keys = []
+        for item_name, variants in self._variants.items():
+            names[item_name] = len(names)
+            entries.extend(variants.values())
+            keys.extend(variants)
+        name_codes = np.fromiter(
+            (names[entry.item_name] for entry in entries), np.int64, len(entries)
+        )
+        values = np.fromiter(
+            (entry.value for entry in entries), np.float64, len(entries)
+        )
+        buys, sells, _ = profit_pairs(name_codes, values)
+        for buy, sell in zip(buys.tolist(), sells.tolist()):
+            item_name = entries[buy].item_name
+            self._strats[(item_name, keys[buy], keys[sell])] = ProfitStrat(
+                item_name, entries[buy], entries[sell]
+            )
+        self.index.load(self._strats.values())
+
+    def update_item_entry(
+        self, item_entry: ItemEntry
+    ) -> tuple[list[ProfitStrat], list[ProfitStrat]]:
+        variants = self._variants.setdefault(item_entry.item_name, {})
+        entry_key = modifiers_key(item_entry.modifiers)
+        variants[entry_key] = item_entry
+
+        changed: list[ProfitStrat] = []
+        removed: list[ProfitStrat] = []
+        for other_key, other in variants.items():
+            if other_key == entry_key:
+                continue
+            for buy, sell in ((item_entry, other), (other, item_entry)):
+                strat_key = (
+                    item_entry.item_name,
+                    modifiers_key(buy.modifiers),
+                    modifiers_key(sell.modifiers),
+                )
+                strat = self._strats.get(strat_key)
+                if sell.value < buy.value:
+                    if strat is not None:
+                        self.index.remove(strat_key)
+                        del self._strats[strat_key]
+                        removed.append(strat)
+                    continue
+
+                if strat is None:
+                    strat = ProfitStrat(item_entry.item_name, buy, sell)
+                    self._strats[strat_key] = strat
+                else:
+                    strat.buy_item = buy
+                    strat.sell_item = sell
+                    strat.update_profit()
+                self.index.upsert(strat)
+                changed.append(strat)
+
+        return changed, removed
+
+    def remove_item_entry(self, item_entry: ItemEntry) -> list[ProfitStrat]:
+        # Forgets the entry and returns the strats that were built on it
+        variants = self._variants.get(item_entry.item_name, {})
+        entry_key = modifiers_key(item_entry.modifiers)
+        if variants.pop(entry_key, None) is None:
+            return []
+        if not variants:
+            del self._variants[item_entry.item_name]
+
+        removed: list[ProfitStrat] = []
+        for other_key in variants:
+            for strat_key in (
+                (item_entry.item_name, entry_key, other_key),
+                (item_entry.item_name, other_key, entry_key),
+            ):
+                strat = self._strats.pop(strat_key, None)
+                if strat is not None:
+                    self.index.remove(strat_key)
+                    removed.append(strat)
+        return removed
+
+    def get_item_entries(self, item_name: str) -> list[ItemEntry]:
+        return list(self._variants.get(item_name, {}).values())
+
+    def get_all_item_entries(self) -> list[ItemEntry]:
+        return [
+            item_entry
+            for variants in self._variants.values()
+            for item_entry in variants.values()
+        ]
+
+    def best_profit(self, item_entry: ItemEntry) -> float:
+        entry_key = modifiers_key(item_entry.modifiers)
+        profits = [
+            strat.profit
+            for strat in self.get_profit_strats(item_entry.item_name)
+            if entry_key in strat.key[1:]
+        ]
+        return max(profits, default=0.0)
+
+    def get_profit_strats(self, item_name: str) -> list[ProfitStrat]:
+        variants = self._variants.get(item_name, {})
+        return [
+            self._strats[(item_name, buy_key, sell_key)]
+            for buy_key in variants
+            for sell_key in variants
+            if (item_name, buy_key, sell_key) in self._strats
+        ]
+
+    def ranked(self, limit: int | None = None) -> list[ProfitStrat]:
+        return self.index.top(limit)
+
+
+def _storage_row(obj: Any) -> dict[str, Any]:
+    # listing prices go to the price history, not to the storage backend
+    return dataclasses.asdict(
+        obj,
+        dict_factory=lambda items: {
+            key: value for key, value in items if key != "listing_prices"
+        },
+    )
 
 
 class DataHandler:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        backend: StorageBackend | None = None,
+        scheduler_weights: SchedulerWeights | None = None,
+        store: str = "awakened_gems",
+    ) -> None:
+        # every group has its own store, see groups.py
+        self.store = store
         current_working_dir = os.getcwd()
         item_folder_path = os.path.join(current_working_dir, "data/item_entries")
-        self.item_entry_file = os.path.join(item_folder_path, "awakened_gems.json")
+        self.item_entry_file = os.path.join(item_folder_path, f"{store}.json")
 
         profit_folder_path = os.path.join(current_working_dir, "data/profit_strats")
-        self.profit_strat_file = os.path.join(profit_folder_path, "awakened_gems.json")
+        self.profit_strat_file = os.path.join(profit_folder_path, f"{store}.json")
+
+        self.history_folder = os.path.join(current_working_dir, "data/history", store)
+
+        snapshot_folder_path = os.path.join(current_working_dir, "data/snapshots")
+        self.item_entry_snapshot = os.path.join(
+            snapshot_folder_path, f"{store}.entries.arrow"
+        )
+        self.profit_strat_snapshot = os.path.join(
+            snapshot_folder_path, f"{store}.strats.arrow"
+        )
+
+        db_folder_path = os.path.join(current_working_dir, "data/db")
 
         # ensure the directory exists, no error is raised if it does.
         os.makedirs(item_folder_path, exist_ok=True)
         os.makedirs(profit_folder_path, exist_ok=True)
+        os.makedirs(db_folder_path, exist_ok=True)
 
-        # check if item entry file exists
-        if not os.path.exists(self.item_entry_file):
-            with open(self.item_entry_file, "w") as json_file:
-                json.dump({}, json_file)
-        # check if profit strat file exists
-        if not os.path.exists(self.profit_strat_file):
-            with open(self.profit_strat_file, "w") as json_file:
-                json.dump({}, json_file)
+        if backend is None:
+            backend = SqliteStorage(os.path.join(db_folder_path, f"{store}.db"))
+            # pick up existing data the first time the database is used, the
+            # binary snapshot loads much faster than the JSON export. It is
+            # only used when both of its files are there.
+            snapshot_files = (self.item_entry_snapshot, self.profit_strat_snapshot)
+            has_snapshot = all(os.path.exists(f) for f in snapshot_files)
+            if backend.is_empty() and has_snapshot:
+                backend.import_snapshot(
+                    self.item_entry_snapshot, self.profit_strat_snapshot
+                )
+            elif backend.is_empty():
+                backend.import_json(self.item_entry_file, self.profit_strat_file)
+        self.backend = backend
+        # shared by the update workers, guards the batch, the engine and the
+        # scheduler so concurrent valuations are stored one at a time
+        self._lock = threading.RLock()
+        # pending writes while inside a batch(), keyed like the storage backend
+        self._batch: tuple[dict, dict, set, set] | None = None
+        self._profit_engine: ProfitEngine | None = None
+        self.scheduler_weights = scheduler_weights
+        self._scheduler: RefreshScheduler | None = None
+        self._history: PriceHistory | None = None
+        # called after every committed write, e.g. to wake the UI's loader
+        self.listeners: list[Callable[[], None]] = []
+        # content hash of the last poe.ninja snapshot synced per url
+        self._synced_snapshots: dict[str, str] = {}
+        self._storage_read = metrics.registry.histogram(
+            "storage_read_seconds", "Time to read entries or strats", store=store
+        )
+        self._storage_write = metrics.registry.histogram(
+            "storage_write_seconds", "Time to commit writes", store=store
+        )
+
+    @property
+    def profit_engine(self) -> ProfitEngine:
+        with self._lock:
+            if self._profit_engine is None:
+                self._profit_engine = ProfitEngine()
+                self._profit_engine.load(self.read_all_item_entries())
+            return self._profit_engine
+
+    @property
+    def scheduler(self) -> RefreshScheduler:
+        with self._lock:
+            if self._scheduler is None:
+                self._scheduler = RefreshScheduler(self.scheduler_weights)
+                item_entries = self.profit_engine.get_all_item_entries()
+                if self._scheduler.weights.volatility:
+                    # start from the recorded volatility instead of zero
+                    for item_entry in item_entries:
+                        self._scheduler.seed_volatility(
+                            item_entry, self.price_stats(item_entry).volatility
+                        )
+                for item_entry in item_entries:
+                    self._scheduler.push(
+                        item_entry, profit=self.profit_engine.best_profit(item_entry)
+                    )
+            return self._scheduler
+
+    @property
+    def history(self) -> PriceHistory:
+        with self._lock:
+            if self._history is None:
+                self._history = PriceHistory(self.history_folder)
+            return self._history
+
+    def close(self) -> None:
+        # the history's log file and the storage connection
+        with self._lock:
+            if self._history is not None:
+                self._history.close()
+                self._history = None
+            self.backend.close()
+
+    def price_stats(self, item_entry: ItemEntry, window: float = 86400.0) -> PriceStats:
+        # rolling statistics over the valuations of the last `window` seconds
+        return self.history.stats(item_entry.item_name, item_entry.modifiers, window)
+
+    def import_json(self) -> None:
+        self.backend.import_json(self.item_entry_file, self.profit_strat_file)
+
+    def export_json(self) -> None:
+        self.backend.export_json(self.item_entry_file, self.profit_strat_file)
+
+    def import_snapshot(self) -> None:
+        self.backend.import_snapshot(
+            self.item_entry_snapshot, self.profit_strat_snapshot
+        )
+
+    def export_snapshot(self) -> None:
+        self.backend.export_snapshot(
+            self.item_entry_snapshot, self.profit_strat_snapshot
+        )
+
+    def _notify(self) -> None:
+        for listener in self.listeners:
+            listener()
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        # Collect all writes made inside the block and commit them in one pass
+        # on exit. Nothing is written if the block raises.
+        with self._lock:
+            if self._batch is not None:
+                yield
+                return
+
+            self._batch = ({}, {}, set(), set())
+            try:
+                yield
+                item_entries, profit_strats, deleted_strats, deleted_items = self._batch
+                with self._storage_write.time():
+                    self.backend.apply_batch(
+                        item_entries.values(),
+                        profit_strats.values(),
+                        deleted_strats,
+                        deleted_items,
+                    )
+                self._notify()
+            finally:
+                self._batch = None
 
     def write_profit_strat(self, profit_strat: ProfitStrat) -> None:
-        strats = []
-        # The rest is basically the same as write_item_entry
-        with open(self.profit_strat_file, "r") as f:
-            data = json.load(f)
-            for s in data:
-                strat = ProfitStrat(**s)
-                strats.append(strat)
-
-        if profit_strat in strats:
-            strats[strats.index(profit_strat)] = profit_strat
-        else:
-            strats.append(profit_strat)
+        self.write_profit_strats([profit_strat])
+
+    def write_profit_strats(self, profit_strats: Iterable[ProfitStrat]) -> None:
+        with self._lock:
+            rows = [_storage_row(profit_strat) for profit_strat in profit_strats]
+            if self._batch is None:
+                with self._storage_write.time():
+                    self.backend.upsert_profit_strats(rows)
+                self._notify()
+                return
+            for row in rows:
+                key = profit_strat_key(row)
+                self._batch[1][key] = row
+                self._batch[2].discard(key)
 
-        with open(self.profit_strat_file, "w") as f:
-            strats = [strat.__dict__ for strat in strats]
-            json.dump(strats, f, cls=EnhancedJSONEncoder)
+    def delete_profit_strats(self, profit_strats: Iterable[ProfitStrat]) -> None:
+        with self._lock:
+            keys = [profit_strat.key for profit_strat in profit_strats]
+            if self._batch is None:
+                with self._storage_write.time():
+                    self.backend.delete_profit_strats(keys)
+                self._notify()
+                return
+            for key in keys:
+                self._batch[1].pop(key, None)
+                self._batch[2].add(key)
 
     def write_item_entry(self, item_entry: ItemEntry) -> None:
-        items = self.read_all_item_entries()
+        self.write_item_entries([item_entry])
 
-        if item_entry in items:
-            items[items.index(item_entry)] = item_entry
-        else:
-            items.append(item_entry)
+    def write_item_entries(self, item_entries: Iterable[ItemEntry]) -> None:
+        with self._lock:
+            rows = [_storage_row(item_entry) for item_entry in item_entries]
+            if self._batch is None:
+                with self._storage_write.time():
+                    self.backend.upsert_item_entries(rows)
+                self._notify()
+                return
+            for row in rows:
+                key = item_entry_key(row)
+                self._batch[0][key] = row
+                self._batch[3].discard(key)
 
-        with open(self.item_entry_file, "w") as f:
-            items = [item.__dict__ for item in items]
-            json.dump(items, f, default=str)
+    def delete_item_entries(self, item_entries: Iterable[ItemEntry]) -> None:
+        with self._lock:
+            keys = [
+                (item_entry.item_name, modifiers_key(item_entry.modifiers))
+                for item_entry in item_entries
+            ]
+            if self._batch is None:
+                with self._storage_write.time():
+                    self.backend.delete_item_entries(keys)
+                self._notify()
+                return
+            for key in keys:
+                self._batch[0].pop(key, None)
+                self._batch[3].add(key)
 
     def read_all_item_entries(self) -> list[ItemEntry]:
-        items = []
-        with open(self.item_entry_file, "r") as f:
-            data = json.load(f)
-            for i in data:
-                item = ItemEntry(**i)
-                items.append(item)
-        return items
+        with self._storage_read.time():
+            return [ItemEntry(**i) for i in self.backend.read_item_entries()]
 
     def get_item_entries_by_item_name(self, item_name: str) -> list[ItemEntry]:
-        items = self.read_all_item_entries()
-        items = [item for item in items if item.item_name == item_name]
-        return items
+        with self._storage_read.time():
+            return [ItemEntry(**i) for i in self.backend.read_item_entries(item_name)]
 
     def read_all_profit_strats(self) -> list[ProfitStrat]:
-        strats: list[ProfitStrat] = []
-        with open(self.profit_strat_file, "r") as f:
-            data = json.load(f)
-            for i in data:
-                strat = ProfitStrat(**i)
-                strats.append(strat)
-        return strats
+        return self._read_profit_strats()
 
     def get_profit_strats_by_item_name(self, item_name: str) -> list[ProfitStrat]:
-        strats = self.read_all_profit_strats()
-        strats = [strat for strat in strats if strat.buy_item.item_name == item_name]
-        return strats
+        return self._read_profit_strats(item_name)
+
+    def _read_profit_strats(self, item_name: str | None = None) -> list[ProfitStrat]:
+        with self._storage_read.time():
+            return self._resolve_profit_strats(item_name)
+
+    def _resolve_profit_strats(self, item_name: str | None) -> list[ProfitStrat]:
+        # Strats are stored as (buy_id, sell_id). Every entry is built once,
+        # when a strat first refers to it, and shared by all of its strats.
+        rows = self.backend.read_item_entries_by_id(item_name)
+        item_entries: dict[int, ItemEntry] = {}
+
+        def resolve(entry_id: int) -> ItemEntry:
+            if entry_id not in item_entries:
+                item_entries[entry_id] = ItemEntry(**rows[entry_id])
+            return item_entries[entry_id]
+
+        profit_strats = []
+        for buy_id, sell_id in self.backend.read_profit_strat_ids(item_name):
+            buy_item = resolve(buy_id)
+            profit_strats.append(
+                ProfitStrat(buy_item.item_name, buy_item, resolve(sell_id))
+            )
+        return profit_strats
 
     def get_oldest_item_entry(self) -> ItemEntry:
         items = self.read_all_item_entries()
@@ -289,41 +935,244 @@ class DataHandler:
                 oldest = item
         return oldest
 
-    def update_oldest_item_entry(self) -> None:
-        item = self.get_oldest_item_entry()
-        item.get_value_from_trade()
-        self.write_item_entry(item)
-        self.update_profit_strats(item.item_name)
+    def get_next_item_entry(self) -> ItemEntry:
+        return self.scheduler.pop()
+
+    def update_next_item_entry(self) -> None:
+        item = self.get_next_item_entry()
+        try:
+            item.get_value_from_trade()
+            self._store_refreshed_item_entry(item)
+        finally:
+            with self._lock:
+                self.scheduler.push(item, profit=self.profit_engine.best_profit(item))
+
+    def update_next_item_entries(
+        self,
+        count: int,
+        stop_event: threading.Event | None = None,
+        batched: bool = True,
+        on_claim: Callable[[list[ItemEntry]], None] | None = None,
+    ) -> int:
+        # Values the next `count` scheduled entries concurrently, each one is
+        # stored as soon as its valuation is done. In batched mode all variants
+        # of an item are valued together from a single search. Several
+        # workers can call this at once: entries are claimed under the lock
+        # and stay out of the scheduler until they are stored again.
+        with self._lock:
+            count = min(count, len(self.scheduler))
+            items = [self.get_next_item_entry() for _ in range(count)]
+            groups = []
+            for item_name in dict.fromkeys(item.item_name for item in items):
+                variants = self.profit_engine.get_item_entries(item_name)
+                if (
+                    batched
+                    and can_share_search([v.modifiers for v in variants])
+                    and VariantFetcher.should_share(item_name)
+                ):
+                    for variant in variants:
+                        self.scheduler.discard(variant)
+                    groups.append(variants)
+                else:
+                    groups.extend(
+                        [item] for item in items if item.item_name == item_name
+                    )
+        pending = {id(item): item for group in groups for item in group}
+        if on_claim is not None:
+            on_claim(list(pending.values()))
+        pipeline = TradePipeline(
+            lambda group: make_fetcher(group, stop_event), stop_event=stop_event
+        )
+
+        def on_result(item: ItemEntry) -> None:
+            del pending[id(item)]
+            try:
+                self._store_refreshed_item_entry(item)
+            finally:
+                with self._lock:
+                    self.scheduler.push(
+                        item, profit=self.profit_engine.best_profit(item)
+                    )
+
+        try:
+            pipeline.run_sync(groups, on_result)
+        finally:
+            # entries skipped after a stop go back into the queue unchanged
+            with self._lock:
+                for item in pending.values():
+                    self.scheduler.push(
+                        item, profit=self.profit_engine.best_profit(item)
+                    )
+        return count
+
+    def _store_refreshed_item_entry(self, item_entry: ItemEntry) -> None:
+        with self.batch():
+            self.write_item_entry(item_entry)
+            self._update_strats_for(item_entry)
+        # Entries without new listings, e.g. after a failed fetch, keep their
+        # timestamp and are neither counted nor recorded. The history has its
+        # own lock, appends and their compactions don't hold up the workers.
+        if item_entry.listing_prices:
+            _items_refreshed.mark()
+            self.history.append(
+                item_entry.item_name,
+                item_entry.modifiers,
+                item_entry.updated_at,
+                item_entry.value,
+                item_entry.number_listed,
+                item_entry.listing_prices,
+            )
+
+    def _update_strats_for(self, item_entry: ItemEntry) -> None:
+        with _profit_recompute.time():
+            changed, removed = self.profit_engine.update_item_entry(item_entry)
+        self.write_profit_strats(changed)
+        self.delete_profit_strats(removed)
 
     def initialize_item_entries(
         self, item_names: list[str], modifiers_list: list[dict[str, Any]]
     ) -> None:
-        for item_name in item_names:
-            for modifiers in modifiers_list:
-                item_entry = ItemEntry(item_name=item_name, modifiers=modifiers)
-                self.write_item_entry(item_entry)
+        self.write_item_entries(
+            ItemEntry(item_name=item_name, modifiers=modifiers)
+            for item_name in item_names
+            for modifiers in modifiers_list
+        )
 
     def update_profit_strats(self, item_name: str) -> None:
-        item_entries = self.get_item_entries_by_item_name(item_name=item_name)
-        for buy in item_entries:
-            for sell in item_entries:
-                if sell.value >= buy.value and sell.modifiers != buy.modifiers:
-                    profit_strat = ProfitStrat(item_name, buy_item=buy, sell_item=sell)
-                    self.write_profit_strat(profit_strat)
-
-    def initialize_from_ninja(self, group: str) -> None:
-        if group == "Awakened Gems":
-            poe_ninja_url = "https://poe.ninja/economy/affliction/skill-gems?level=5&quality=20&corrupted=No&gemType=Awakened"
-            modifiers = [
-                {"max_gem_level": 1, "corrupted": "false"},
-                {"min_gem_level": 5, "corrupted": "false", "min_quality": 20},
+        # Full recompute for one item, picks up entries written outside the engine.
+        # The entries are pushed before the lock is released, a refresh stored
+        # in between would be queued with a stale profit otherwise.
+        with self._lock:
+            item_entries = self.get_item_entries_by_item_name(item_name=item_name)
+            with self.batch():
+                for item_entry in item_entries:
+                    self._update_strats_for(item_entry)
+            for item_entry in item_entries:
+                self.scheduler.push(
+                    item_entry, profit=self.profit_engine.best_profit(item_entry)
+                )
+
+    def get_ranked_profit_strats(self, limit: int | None = None) -> list[ProfitStrat]:
+        return self.profit_engine.ranked(limit)
+
+    def query_profit_strats(
+        self,
+        limit: int | None = None,
+        item_name: str | None = None,
+        min_profit: float | None = None,
+        min_listed: int = 0,
+        max_age: float | None = None,
+    ) -> list[ProfitStrat]:
+        # Best strats first, e.g. the best 50 with 5+ listings valued within
+        # the last 30 min: query_profit_strats(50, min_listed=5, max_age=1800).
+        # Served from the engine's indexes, nothing is read from storage.
+        with self._lock:
+            return self.profit_engine.index.top(
+                limit, item_name, min_profit, min_listed, max_age
+            )
+
+    def retire_item_entries(self, item_entries: Iterable[ItemEntry]) -> None:
+        # Removes entries that are no longer listed upstream, with their strats
+        item_entries = list(item_entries)
+        with self.batch():
+            for item_entry in item_entries:
+                self.scheduler.discard(item_entry)
+                self.delete_profit_strats(
+                    self.profit_engine.remove_item_entry(item_entry)
+                )
+            self.delete_item_entries(item_entries)
+
+    def sync_item_entries(
+        self, item_names: list[str], modifiers_list: list[dict[str, Any]]
+    ) -> tuple[list[ItemEntry], list[ItemEntry]]:
+        # Diffs the (item, modifiers) pairs of a group against the stored
+        # entries: missing ones are added, entries of the group whose item is
+        # gone are retired. Untouched entries keep their values and strats.
+        if not item_names:
+            # a failed scrape, not a group without items
+            raise ValueError("No item names, the group's entries are kept")
+        with self._lock:
+            wanted = {
+                (item_name, modifiers_key(modifiers)): (item_name, modifiers)
+                for item_name in item_names
+                for modifiers in modifiers_list
+            }
+            group_keys = {modifiers_key(modifiers) for modifiers in modifiers_list}
+            stored = {
+                (item_entry.item_name, modifiers_key(item_entry.modifiers)): item_entry
+                for item_entry in self.profit_engine.get_all_item_entries()
+                if modifiers_key(item_entry.modifiers) in group_keys
+            }
+
+            added = [
+                ItemEntry(item_name=item_name, modifiers=modifiers)
+                for key, (item_name, modifiers) in wanted.items()
+                if key not in stored
+            ]
+            retired = [
+                item_entry for key, item_entry in stored.items() if key not in wanted
             ]
-        else:
-             raise NotImplementedError(f"This group: '{group}' is not implemented yet")
 
-        item_names = poe_ninja_scraper.fetch_data(poe_ninja_url)
+            self.retire_item_entries(retired)
+            with self.batch():
+                self.write_item_entries(added)
+                for item_entry in added:
+                    self._update_strats_for(item_entry)
+            for item_entry in added:
+                self.scheduler.push(
+                    item_entry, profit=self.profit_engine.best_profit(item_entry)
+                )
+            return added, retired
 
-        self.initialize_item_entries(item_names=item_names, modifiers_list=modifiers)
+    def initialize_from_ninja(self, group: str, refresh: bool = False) -> None:
+        ninja_group = get_group(group)
+
+        # poe.ninja is only scraped again once the cached snapshot is stale
+        snapshot = poe_ninja_scraper.fetch_snapshot(
+            ninja_group.url, refresh=refresh, name=ninja_group.store
+        )
+        if self._synced_snapshots.get(ninja_group.url) == snapshot["hash"]:
+            return
+        self.sync_item_entries(snapshot["item_names"], ninja_group.modifiers_list)
+        self._synced_snapshots[ninja_group.url] = snapshot["hash"]
+
+
+def initialize_groups(
+    groups: Iterable[str],
+    max_workers: int = 4,
+    on_progress: Callable[[str, str], None] | None = None,
+    refresh: bool = False,
+    datahandlers: dict[str, "DataHandler"] | None = None,
+) -> dict[str, Exception | None]:
+    # Scrapes and syncs several groups at once, each into its own store.
+    # on_progress is called from the worker threads with the group name and
+    # "started", "done" or "failed". Returns the error per group, or None.
+    # Stores that are already open elsewhere are passed in `datahandlers` so
+    # their engine and scheduler see the new entries.
+    datahandlers = datahandlers or {}
+
+    def initialize(group: str) -> Exception | None:
+        if on_progress is not None:
+            on_progress(group, "started")
+        try:
+            store = get_group(group).store
+            if store in datahandlers:
+                datahandlers[store].initialize_from_ninja(group, refresh=refresh)
+            else:
+                datahandler = DataHandler(store=store)
+                try:
+                    datahandler.initialize_from_ninja(group, refresh=refresh)
+                finally:
+                    datahandler.close()
+        except Exception as e:
+            print("Error: ", e)
+            if on_progress is not None:
+                on_progress(group, "failed")
+            return e
+        if on_progress is not None:
+            on_progress(group, "done")
+        return None
 
-        for item_name in item_names:
-            self.update_profit_strats(item_name)
+    groups = list(dict.fromkeys(groups))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return dict(zip(groups, pool.map(initialize, groups)))
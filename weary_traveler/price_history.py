@@ -0,0 +1,455 @@
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Iterable
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from snapshot import _column, _read_ipc, _write_ipc
+from storage import modifiers_key
+
+_epoch = datetime(1970, 1, 1)
+_hour_us = 3_600_000_000
+
+_schema = pa.schema(
+    [
+        ("item_name", pa.dictionary(pa.int32(), pa.string())),
+        ("modifiers", pa.dictionary(pa.int32(), pa.string())),
+        ("timestamp", pa.timestamp("us")),
+        ("estimate", pa.float32()),
+        ("number_listed", pa.int32()),
+        ("prices", pa.list_(pa.float32())),
+    ]
+)
+
+_segment_file = re.compile(r"segment-(\d+)\.arrow")
+_pending_file = re.compile(r"log-(\d+)\.jsonl")
+
+
+@dataclass(slots=True)
+class PriceStats:
+    count: int = 0
+    mean: float = 0.0
+    # mean relative change between consecutive observations, like the
+    # scheduler's estimate but over a fixed window
+    volatility: float = 0.0
+    # least squares slope of the estimate, in divine per hour
+    trend: float = 0.0
+    last: float = 0.0
+
+
+@dataclass(slots=True)
+class PriceSeries:
+    # timestamps are microseconds since the epoch, in local time like
+    # ItemEntry.updated_at
+    timestamps: np.ndarray
+    estimates: np.ndarray
+    number_listed: np.ndarray
+    prices: pa.ListArray
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def stats(self) -> PriceStats:
+        if not len(self):
+            return PriceStats()
+        values = self.estimates.astype(np.float64)
+        previous = values[:-1]
+        moved = previous > 0
+        changes = np.abs(np.diff(values))[moved] / previous[moved]
+        hours = (self.timestamps - self.timestamps[0]) / _hour_us
+        hours = hours - hours.mean()
+        spread = float(np.dot(hours, hours))
+        mean = float(values.mean())
+        return PriceStats(
+            count=len(values),
+            mean=mean,
+            volatility=float(changes.mean()) if len(changes) else 0.0,
+            trend=float(np.dot(hours, values - mean)) / spread if spread else 0.0,
+            last=float(values[-1]),
+        )
+
+    def hourly_profile(self) -> np.ndarray:
+        # mean estimate per hour of the day, nan for hours without observations
+        hours = (self.timestamps // _hour_us) % 24
+        counts = np.bincount(hours, minlength=24)
+        sums = np.bincount(hours, weights=self.estimates, minlength=24)
+        return np.divide(sums, counts, out=np.full(24, np.nan), where=counts > 0)
+
+    def between(self, start: int | None, end: int | None) -> "PriceSeries":
+        # slices of the sorted timestamps, still views on the same buffers
+        first = 0 if start is None else np.searchsorted(self.timestamps, start)
+        stop = (
+            len(self)
+            if end is None
+            else np.searchsorted(self.timestamps, end, side="right")
+        )
+        return PriceSeries(
+            self.timestamps[first:stop],
+            self.estimates[first:stop],
+            self.number_listed[first:stop],
+            self.prices[first:stop],
+        )
+
+
+class _Segment:
+    # One compacted Arrow file, sorted by item_name, modifiers and timestamp so
+    # every series is a contiguous run of rows.
+
+    def __init__(self, number: int, file_path: str) -> None:
+        self.number = number
+        self.file_path = file_path
+        table = _read_ipc(file_path)
+        metadata = table.schema.metadata or {}
+        # numbers of the older segments merged into this one
+        self.covers = set(json.loads(metadata.get(b"covers", b"[]")))
+        # 0 for a compacted log, one more than its inputs for a merge
+        self.level = int(metadata.get(b"level", b"0"))
+        self.table = table
+        self.timestamps = _column(table, "timestamp").cast(pa.int64()).to_numpy()
+        self.estimates = _column(table, "estimate").to_numpy()
+        self.number_listed = _column(table, "number_listed").to_numpy()
+        self.prices = _column(table, "prices")
+        self.index = _run_index(
+            _column(table, "item_name"), _column(table, "modifiers")
+        )
+
+    def series(self, key: tuple[str, str]) -> PriceSeries | None:
+        span = self.index.get(key)
+        if span is None:
+            return None
+        start, stop = span
+        return PriceSeries(
+            self.timestamps[start:stop],
+            self.estimates[start:stop],
+            self.number_listed[start:stop],
+            self.prices[start:stop],
+        )
+
+
+def _run_index(
+    item_names: pa.DictionaryArray, modifiers: pa.DictionaryArray
+) -> dict[tuple[str, str], tuple[int, int]]:
+    name_codes = item_names.indices.to_numpy()
+    modifier_codes = modifiers.indices.to_numpy()
+    if not len(name_codes):
+        return {}
+    changed = (name_codes[1:] != name_codes[:-1]) | (
+        modifier_codes[1:] != modifier_codes[:-1]
+    )
+    starts = np.concatenate(([0], np.flatnonzero(changed) + 1))
+    stops = np.append(starts[1:], len(name_codes))
+    names = item_names.dictionary.to_pylist()
+    modifier_keys = modifiers.dictionary.to_pylist()
+    return {
+        (names[name_codes[start]], modifier_keys[modifier_codes[start]]): (
+            start,
+            stop,
+        )
+        for start, stop in zip(starts.tolist(), stops.tolist())
+    }
+
+
+def _sorted_table(
+    table: pa.Table, covers: Iterable[int] = (), level: int = 0
+) -> pa.Table:
+    # plain string keys sort by value, the sorted keys are then dictionary
+    # encoded again so each series is a run of equal codes
+    table = table.sort_by(
+        [
+            ("item_name", "ascending"),
+            ("modifiers", "ascending"),
+            ("timestamp", "ascending"),
+        ]
+    )
+    columns = [
+        (
+            pc.dictionary_encode(table.column(name)).cast(_schema.field(name).type)
+            if name in ("item_name", "modifiers")
+            else table.column(name)
+        )
+        for name in _schema.names
+    ]
+    metadata = {"covers": json.dumps(sorted(covers)), "level": str(level)}
+    table = pa.Table.from_arrays(columns, schema=_schema.with_metadata(metadata))
+    # one record batch, so the columns read back as views without a concat
+    return table.unify_dictionaries().combine_chunks()
+
+
+def _records_table(records: list[dict[str, Any]]) -> pa.Table:
+    return pa.Table.from_arrays(
+        [
+            pa.array([record["item_name"] for record in records], pa.string()),
+            pa.array([record["modifiers"] for record in records], pa.string()),
+            pa.array([record["timestamp"] for record in records], pa.int64()).cast(
+                pa.timestamp("us")
+            ),
+            pa.array([record["estimate"] for record in records], pa.float32()),
+            pa.array([record["number_listed"] for record in records], pa.int32()),
+            pa.array([record["prices"] for record in records], pa.list_(pa.float32())),
+        ],
+        names=_schema.names,
+    )
+
+
+def _read_log(file_path: str) -> list[dict[str, Any]]:
+    records = []
+    with open(file_path, "r") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # the last line is cut short if the app died while writing it
+                continue
+    return records
+
+
+class PriceHistory:
+    # Every valuation of an entry, kept per (item_name, modifiers).
+    # New observations are appended to log.jsonl. Every `compact_every`
+    # records the log is rewritten as a sorted Arrow segment that is memory
+    # mapped for reads. Segments are merged in tiers: once there are `fanout`
+    # segments of one level they are merged into one of the next level, so
+    # every record is rewritten about log(records) / log(fanout) times.
+    # Segments are never changed after they are written, a merged segment
+    # lists the segments it replaces so a merge that was cut short is
+    # finished on the next open. Compactions and merges write their files
+    # without holding the lock, appends and reads go on meanwhile.
+
+    def __init__(self, folder: str, compact_every: int = 1000, fanout: int = 4) -> None:
+        self.folder = folder
+        self.compact_every = compact_every
+        self.fanout = fanout
+        self.log_file = os.path.join(folder, "log.jsonl")
+        os.makedirs(folder, exist_ok=True)
+        self._lock = threading.Lock()
+        # held for a whole compaction and its merges, one at a time
+        self._compaction = threading.Lock()
+        self._segments: list[_Segment] = []
+        self._tail: dict[tuple[str, str], list[dict[str, Any]]] = {}
+        self._tail_size = 0
+        # the tail being written as a segment, still read until it is mapped
+        self._compacting: dict[tuple[str, str], list[dict[str, Any]]] = {}
+        # newest timestamp per series, older observations are dropped
+        self._latest: dict[tuple[str, str], int] = {}
+        self._open()
+        self._log = open(self.log_file, "a")
+
+    def _open(self) -> None:
+        segments = {}
+        pending = {}
+        for file_name in os.listdir(self.folder):
+            if match := _segment_file.fullmatch(file_name):
+                segments[int(match[1])] = os.path.join(self.folder, file_name)
+            elif match := _pending_file.fullmatch(file_name):
+                pending[int(match[1])] = os.path.join(self.folder, file_name)
+        self._segments = [
+            _Segment(number, segments[number]) for number in sorted(segments)
+        ]
+        self._drop_covered()
+        self._next = max([*segments, *pending], default=0) + 1
+        for number in sorted(pending):
+            # the log was moved aside for compaction but not removed
+            if number not in segments:
+                self._segments.append(
+                    self._write_segment(
+                        number, _records_table(_read_log(pending[number]))
+                    )
+                )
+            os.remove(pending[number])
+        self._segments.sort(key=lambda segment: segment.number)
+        if os.path.exists(self.log_file):
+            for record in _read_log(self.log_file):
+                self._add_to_tail(record)
+        for segment in self._segments:
+            for key, (_, stop) in segment.index.items():
+                newest = int(segment.timestamps[stop - 1])
+                self._latest[key] = max(self._latest.get(key, newest), newest)
+
+    def close(self) -> None:
+        # waits for a running compaction
+        with self._compaction, self._lock:
+            self._log.close()
+
+    def append(
+        self,
+        item_name: str,
+        modifiers: dict[str, Any],
+        timestamp: datetime,
+        estimate: float,
+        number_listed: int,
+        prices: list[float],
+    ) -> bool:
+        # False when the series already has an observation this new
+        record = {
+            "item_name": item_name,
+            "modifiers": modifiers_key(modifiers),
+            "timestamp": (timestamp - _epoch) // timedelta(microseconds=1),
+            "estimate": estimate,
+            "number_listed": number_listed,
+            "prices": list(prices),
+        }
+        with self._lock:
+            key = (item_name, record["modifiers"])
+            if record["timestamp"] <= self._latest.get(key, -(2**63)):
+                return False
+            self._log.write(json.dumps(record) + "\n")
+            self._log.flush()
+            self._add_to_tail(record)
+            full = self._tail_size >= self.compact_every
+        # a compaction that is already running picks the rest up next time
+        if full and self._compaction.acquire(blocking=False):
+            try:
+                self._compact()
+            finally:
+                self._compaction.release()
+        return True
+
+    def _add_to_tail(self, record: dict[str, Any]) -> None:
+        key = (record["item_name"], record["modifiers"])
+        self._tail.setdefault(key, []).append(record)
+        self._tail_size += 1
+        newest = record["timestamp"]
+        self._latest[key] = max(self._latest.get(key, newest), newest)
+
+    def compact(self) -> None:
+        with self._compaction:
+            self._compact()
+
+    def _compact(self) -> None:
+        with self._lock:
+            if not self._tail_size:
+                return
+            number = self._next
+            self._next += 1
+            pending = os.path.join(self.folder, f"log-{number:06d}.jsonl")
+            self._log.close()
+            os.replace(self.log_file, pending)
+            self._log = open(self.log_file, "a")
+            self._compacting = self._tail
+            self._tail = {}
+            self._tail_size = 0
+        records = [r for records in self._compacting.values() for r in records]
+        segment = self._write_segment(number, _records_table(records))
+        with self._lock:
+            self._segments.append(segment)
+            self._compacting = {}
+        os.remove(pending)
+        self._merge_tiers()
+
+    def _write_segment(
+        self, number: int, table: pa.Table, covers: Iterable[int] = (), level: int = 0
+    ) -> _Segment:
+        file_path = os.path.join(self.folder, f"segment-{number:06d}.arrow")
+        _write_ipc(file_path, _sorted_table(table, covers, level))
+        return _Segment(number, file_path)
+
+    def _merge_tiers(self) -> None:
+        while True:
+            with self._lock:
+                levels: dict[int, list[_Segment]] = {}
+                for segment in self._segments:
+                    levels.setdefault(segment.level, []).append(segment)
+                full = [group for group in levels.values() if len(group) >= self.fanout]
+                if not full:
+                    return
+                merged = full[0][: self.fanout]
+                number = self._next
+                self._next += 1
+            tables = [
+                segment.table.cast(
+                    pa.schema(
+                        [
+                            (
+                                field.with_type(pa.string())
+                                if pa.types.is_dictionary(field.type)
+                                else field
+                            )
+                            for field in _schema
+                        ]
+                    )
+                )
+                for segment in merged
+            ]
+            segment = self._write_segment(
+                number,
+                pa.concat_tables(tables),
+                [segment.number for segment in merged],
+                merged[0].level + 1,
+            )
+            with self._lock:
+                self._segments.append(segment)
+                self._drop_covered()
+
+    def _drop_covered(self) -> None:
+        covered = set().union(*(segment.covers for segment in self._segments))
+        for segment in [s for s in self._segments if s.number in covered]:
+            self._segments.remove(segment)
+            try:
+                os.remove(segment.file_path)
+            except OSError:
+                # still mapped on Windows, removed on the next open
+                pass
+
+    def series(
+        self,
+        item_name: str,
+        modifiers: dict[str, Any],
+        start: datetime | None = None,
+        end: datetime | None = None,
+    ) -> PriceSeries:
+        # Every observation between start and end, inclusive. A range inside
+        # a single segment is returned without copying.
+        key = (item_name, modifiers_key(modifiers))
+        first = None if start is None else (start - _epoch) // timedelta(microseconds=1)
+        last = None if end is None else (end - _epoch) // timedelta(microseconds=1)
+        with self._lock:
+            parts = [segment.series(key) for segment in self._segments]
+            tail = [*self._compacting.get(key, ()), *self._tail.get(key, ())]
+        if tail:
+            parts.append(
+                PriceSeries(
+                    np.array([r["timestamp"] for r in tail], np.int64),
+                    np.array([r["estimate"] for r in tail], np.float32),
+                    np.array([r["number_listed"] for r in tail], np.int32),
+                    pa.array([r["prices"] for r in tail], pa.list_(pa.float32())),
+                )
+            )
+        # segments hold disjoint time ranges of a series, appends are never
+        # older than what is stored. Merged segments can hold older ranges
+        # than segments with a lower number, so they are put in time order.
+        parts = [part.between(first, last) for part in parts if part is not None]
+        parts = [part for part in parts if len(part)]
+        parts.sort(key=lambda part: part.timestamps[0])
+        if len(parts) == 1:
+            return parts[0]
+        if not parts:
+            return PriceSeries(
+                np.empty(0, np.int64),
+                np.empty(0, np.float32),
+                np.empty(0, np.int32),
+                pa.array([], pa.list_(pa.float32())),
+            )
+        return PriceSeries(
+            np.concatenate([part.timestamps for part in parts]),
+            np.concatenate([part.estimates for part in parts]),
+            np.concatenate([part.number_listed for part in parts]),
+            pa.concat_arrays([part.prices for part in parts]),
+        )
+
+    def stats(
+        self,
+        item_name: str,
+        modifiers: dict[str, Any],
+        window: float = 86400.0,
+        now: datetime | None = None,
+    ) -> PriceStats:
+        # rolling statistics over the last `window` seconds
+        now = now or datetime.now()
+        return self.series(
+            item_name, modifiers, now - timedelta(seconds=window), now
+        ).stats()
@@ -0,0 +1,146 @@
+import threading
+import time
+from typing import Mapping
+
+# Used until the first response tells us the real policy of an endpoint.
+_default_rules = {
+    "search": [(1, 10.0)],
+    "fetch": [(1, 10.0)],
+}
+
+
+class TokenBucket:
+    def __init__(self, capacity: int, period: float) -> None:
+        self.capacity = capacity
+        self.period = period
+        self.rate = capacity / period
+        self.tokens = float(capacity)
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def wait_time(self, now: float) -> float:
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def sync(self, hits: int, now: float) -> None:
+        # the server's count of hits in the current window is authoritative
+        self._refill(now)
+        self.tokens = min(self.tokens, self.capacity - hits)
+
+
+class RateLimiter:
+    # Token buckets per endpoint, one for every (hits, period) rule the server
+    # reports through the X-Rate-Limit-* headers. Safe to share between threads.
+
+    def __init__(
+        self, default_rules: Mapping[str, list[tuple[int, float]]] | None = None
+    ) -> None:
+        self._lock = threading.Lock()
+        self._default_rules = dict(default_rules or _default_rules)
+        self._buckets: dict[str, dict[tuple[str, float], TokenBucket]] = {}
+        self._blocked_until: dict[str, float] = {}
+
+    def _endpoint_buckets(self, endpoint: str) -> dict[tuple[str, float], TokenBucket]:
+        if endpoint not in self._buckets:
+            self._buckets[endpoint] = {
+                ("default", period): TokenBucket(hits, period)
+                for hits, period in self._default_rules.get(endpoint, [])
+            }
+        return self._buckets[endpoint]
+
+    def _wait_time(self, endpoint: str, now: float) -> float:
+        wait = max(self._blocked_until.get(endpoint, 0.0) - now, 0.0)
+        for bucket in self._endpoint_buckets(endpoint).values():
+            wait = max(wait, bucket.wait_time(now))
+        return wait
+
+    def wait_time(self, endpoint: str) -> float:
+        with self._lock:
+            return self._wait_time(endpoint, time.monotonic())
+
+    def try_acquire(self, endpoint: str) -> float:
+        # Takes a token if one is available and returns 0, otherwise returns
+        # how long to wait before trying again.
+        with self._lock:
+            now = time.monotonic()
+            wait = self._wait_time(endpoint, now)
+            if wait <= 0:
+                for bucket in self._endpoint_buckets(endpoint).values():
+                    bucket.consume(now)
+            return wait
+
+    def acquire(self, endpoint: str, stop_event: threading.Event | None = None) -> bool:
+        while True:
+            wait = self.try_acquire(endpoint)
+            if wait <= 0:
+                return True
+            if stop_event is None:
+                time.sleep(wait)
+            elif stop_event.wait(wait):
+                return False
+
+    def update_from_headers(
+        self, endpoint: str, headers: Mapping[str, str], status_code: int = 200
+    ) -> None:
+        with self._lock:
+            now = time.monotonic()
+            rules = headers.get("X-Rate-Limit-Rules")
+            if rules:
+                self._learn_rules(endpoint, rules, headers, now)
+
+            retry_after = headers.get("Retry-After")
+            if retry_after or status_code == 429:
+                blocked_for = float(retry_after) if retry_after else 60.0
+                self._block(endpoint, now + blocked_for)
+
+    def _learn_rules(
+        self, endpoint: str, rules: str, headers: Mapping[str, str], now: float
+    ) -> None:
+        old_buckets = self._endpoint_buckets(endpoint)
+        buckets: dict[tuple[str, float], TokenBucket] = {}
+        for rule in (r.strip() for r in rules.split(",")):
+            limits = _parse_rule_header(headers.get(f"X-Rate-Limit-{rule}", ""))
+            states = _parse_rule_header(headers.get(f"X-Rate-Limit-{rule}-State", ""))
+            state_by_period = {
+                period: (hits, active) for hits, period, active in states
+            }
+
+            for max_hits, period, _ in limits:
+                key = (rule, period)
+                bucket = old_buckets.get(key)
+                if bucket is None or bucket.capacity != max_hits:
+                    bucket = TokenBucket(max_hits, period)
+                hits, active = state_by_period.get(period, (0, 0))
+                bucket.sync(hits, now)
+                if active > 0:
+                    self._block(endpoint, now + active)
+                buckets[key] = bucket
+
+        if buckets:
+            self._buckets[endpoint] = buckets
+
+    def _block(self, endpoint: str, until: float) -> None:
+        self._blocked_until[endpoint] = max(
+            self._blocked_until.get(endpoint, 0.0), until
+        )
+
+
+def _parse_rule_header(value: str) -> list[tuple[int, float, int]]:
+    # "hits:period:restriction,..." e.g. "8:10:60,15:60:300"
+    parsed = []
+    for part in value.split(","):
+        fields = part.strip().split(":")
+        if len(fields) == 3:
+            parsed.append((int(fields[0]), float(fields[1]), int(fields[2])))
+    return parsed
@@ -0,0 +1,97 @@
+import heapq
+import itertools
+import math
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+from storage import modifiers_key
+
+_epoch = datetime(1970, 1, 1)
+
+
+@dataclass
+class SchedulerWeights:
+    # An entry becomes due base_interval seconds after its last update, divided
+    # by its boost. With all weights at zero this is plain oldest-first. By
+    # default 10 divines of profit or a mean price change of 10% per refresh
+    # make an entry due 6 and 2 times as often.
+    base_interval: float = 3600.0
+    profit: float = 0.5
+    volatility: float = 10.0
+    number_listed: float = 0.1
+
+    def boost(self, profit: float, volatility: float, number_listed: int) -> float:
+        return (
+            1.0
+            + self.profit * max(profit, 0.0)
+            + self.volatility * volatility
+            + self.number_listed * math.log1p(max(number_listed, 0))
+        )
+
+
+class RefreshScheduler:
+    # Min-heap on due time with lazy invalidation: re-pushing an entry leaves
+    # its old heap node behind, which is skipped when it reaches the top.
+
+    def __init__(
+        self, weights: SchedulerWeights | None = None, smoothing: float = 0.3
+    ) -> None:
+        self.weights = weights or SchedulerWeights()
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+        self._heap: list[tuple[float, int, tuple[str, str]]] = []
+        self._counter = itertools.count()
+        self._queued: dict[tuple[str, str], tuple[float, Any]] = {}
+        self._last_seen: dict[tuple[str, str], tuple[datetime, float]] = {}
+        self._volatility: dict[tuple[str, str], float] = {}
+
+    def __len__(self) -> int:
+        return len(self._queued)
+
+    def push(self, item_entry: Any, profit: float = 0.0) -> None:
+        key = (item_entry.item_name, modifiers_key(item_entry.modifiers))
+        with self._lock:
+            volatility = self._observe(key, item_entry)
+            boost = self.weights.boost(profit, volatility, item_entry.number_listed)
+            updated_at = (item_entry.updated_at - _epoch).total_seconds()
+            due = updated_at + self.weights.base_interval / boost
+            self._queued[key] = (due, item_entry)
+            heapq.heappush(self._heap, (due, next(self._counter), key))
+
+    def pop(self) -> Any:
+        with self._lock:
+            while self._heap:
+                due, _, key = heapq.heappop(self._heap)
+                queued = self._queued.get(key)
+                if queued is not None and queued[0] == due:
+                    del self._queued[key]
+                    return queued[1]
+        raise IndexError("pop from an empty scheduler")
+
+    def discard(self, item_entry: Any) -> None:
+        key = (item_entry.item_name, modifiers_key(item_entry.modifiers))
+        with self._lock:
+            self._queued.pop(key, None)
+
+    def volatility(self, item_entry: Any) -> float:
+        key = (item_entry.item_name, modifiers_key(item_entry.modifiers))
+        return self._volatility.get(key, 0.0)
+
+    def seed_volatility(self, item_entry: Any, volatility: float) -> None:
+        # e.g. from the price history, before the entry is first pushed
+        key = (item_entry.item_name, modifiers_key(item_entry.modifiers))
+        with self._lock:
+            self._volatility.setdefault(key, volatility)
+
+    def _observe(self, key: tuple[str, str], item_entry: Any) -> float:
+        # exponentially weighted mean of the relative price change per refresh
+        last = self._last_seen.get(key)
+        volatility = self._volatility.get(key, 0.0)
+        if last is not None and last[0] != item_entry.updated_at and last[1] > 0:
+            change = abs(item_entry.value - last[1]) / last[1]
+            volatility += self.smoothing * (change - volatility)
+        self._last_seen[key] = (item_entry.updated_at, item_entry.value)
+        self._volatility[key] = volatility
+        return volatility
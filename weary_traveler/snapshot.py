@@ -0,0 +1,223 @@
+import json
+import os
+import tempfile
+from datetime import datetime
+from typing import Any
+
+import numpy as np
+import pyarrow as pa
+
+# entries that were never valued are dated year 1, which datetime64[us] covers
+_entries_schema = pa.schema(
+    [
+        ("id", pa.int64()),
+        ("item_name", pa.dictionary(pa.int32(), pa.string())),
+        ("modifiers", pa.int32()),
+        ("url", pa.string()),
+        ("value", pa.float32()),
+        ("number_listed", pa.int32()),
+        ("updated_at", pa.timestamp("us")),
+    ]
+)
+
+_strats_schema = pa.schema([("buy_id", pa.int64()), ("sell_id", pa.int64())])
+
+
+class EntryTable:
+    # Item entries as one array per column instead of one object per entry.
+    # Names and modifier sets are stored once and referenced by code, prices
+    # are float32 and updated_at is in microseconds since the epoch. Rows are
+    # turned into the storage dict shape only when they are asked for.
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        names: list[str],
+        name_codes: np.ndarray,
+        modifier_sets: list[dict[str, Any]],
+        modifier_codes: np.ndarray,
+        urls: pa.Array,
+        values: np.ndarray,
+        number_listed: np.ndarray,
+        updated_at: np.ndarray,
+    ) -> None:
+        self.ids = ids
+        self.names = names
+        self.name_codes = name_codes
+        self.modifier_sets = modifier_sets
+        self.modifier_codes = modifier_codes
+        self.urls = urls
+        self.values = values
+        self.number_listed = number_listed
+        self.updated_at = updated_at
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_item_entries(cls, item_entries: dict[int, dict[str, Any]]) -> "EntryTable":
+        # takes the shape of StorageBackend.read_item_entries_by_id()
+        rows = list(item_entries.values())
+        names: dict[str, int] = {}
+        name_codes = [names.setdefault(row["item_name"], len(names)) for row in rows]
+        modifier_sets: dict[str, int] = {}
+        modifier_list = []
+        modifier_codes = []
+        for row in rows:
+            key = json.dumps(row["modifiers"], sort_keys=True)
+            if key not in modifier_sets:
+                modifier_sets[key] = len(modifier_list)
+                modifier_list.append(row["modifiers"])
+            modifier_codes.append(modifier_sets[key])
+        updated_at = [
+            (
+                datetime.fromisoformat(row["updated_at"])
+                if isinstance(row["updated_at"], str)
+                else row["updated_at"]
+            )
+            for row in rows
+        ]
+        return cls(
+            ids=np.fromiter(item_entries, np.int64, len(rows)),
+            names=list(names),
+            name_codes=np.array(name_codes, np.int32),
+            modifier_sets=modifier_list,
+            modifier_codes=np.array(modifier_codes, np.int32),
+            urls=pa.array([row.get("url", "") for row in rows], pa.string()),
+            values=np.array([row.get("value", 0) for row in rows], np.float32),
+            number_listed=np.array(
+                [row.get("number_listed", 0) for row in rows], np.int32
+            ),
+            updated_at=np.array(updated_at, "datetime64[us]").astype(np.int64),
+        )
+
+    def item_entry(self, index: int) -> dict[str, Any]:
+        return {
+            "item_name": self.names[self.name_codes[index]],
+            "modifiers": self.modifier_sets[self.modifier_codes[index]],
+            "url": self.urls[index].as_py(),
+            "value": float(str(self.values[index])),
+            "number_listed": int(self.number_listed[index]),
+            "updated_at": self.updated_at[index].astype("datetime64[us]").item(),
+        }
+
+    def to_item_entries(self) -> dict[int, dict[str, Any]]:
+        # float32 prices go through their shortest text so 12.3 comes back as
+        # 12.3, not as 12.300000190734863
+        columns = zip(
+            [self.names[code] for code in self.name_codes.tolist()],
+            [self.modifier_sets[code] for code in self.modifier_codes.tolist()],
+            self.urls.to_pylist(),
+            self.values.astype(str).astype(np.float64).tolist(),
+            self.number_listed.tolist(),
+            self.updated_at.astype("datetime64[us]").tolist(),
+        )
+        return {
+            entry_id: {
+                "item_name": item_name,
+                "modifiers": modifiers,
+                "url": url,
+                "value": value,
+                "number_listed": number_listed,
+                "updated_at": updated_at,
+            }
+            for entry_id, (
+                item_name,
+                modifiers,
+                url,
+                value,
+                number_listed,
+                updated_at,
+            ) in zip(self.ids.tolist(), columns)
+        }
+
+    def to_arrow(self) -> pa.Table:
+        item_names = pa.DictionaryArray.from_arrays(
+            pa.array(self.name_codes, pa.int32()), pa.array(self.names, pa.string())
+        )
+        metadata = {"modifier_sets": json.dumps(self.modifier_sets)}
+        return pa.Table.from_arrays(
+            [
+                pa.array(self.ids, pa.int64()),
+                item_names,
+                pa.array(self.modifier_codes, pa.int32()),
+                self.urls,
+                pa.array(self.values, pa.float32()),
+                pa.array(self.number_listed, pa.int32()),
+                pa.array(self.updated_at, pa.int64()).cast(pa.timestamp("us")),
+            ],
+            schema=_entries_schema.with_metadata(metadata),
+        )
+
+    @classmethod
+    def from_arrow(cls, table: pa.Table) -> "EntryTable":
+        # the numeric columns are views on the table's buffers, nothing is
+        # copied when the table is memory mapped
+        def column(name: str) -> pa.Array:
+            return _column(table, name)
+
+        item_names = column("item_name")
+        metadata = table.schema.metadata or {}
+        return cls(
+            ids=column("id").to_numpy(),
+            names=item_names.dictionary.to_pylist(),
+            name_codes=item_names.indices.to_numpy(),
+            modifier_sets=json.loads(metadata.get(b"modifier_sets", b"[]")),
+            modifier_codes=column("modifiers").to_numpy(),
+            urls=column("url"),
+            values=column("value").to_numpy(),
+            number_listed=column("number_listed").to_numpy(),
+            updated_at=column("updated_at").cast(pa.int64()).to_numpy(),
+        )
+
+
+def write_snapshot(
+    item_entry_file: str,
+    profit_strat_file: str,
+    item_entries: EntryTable,
+    pairs: list[tuple[int, int]],
+) -> None:
+    _write_ipc(item_entry_file, item_entries.to_arrow())
+    buy_ids, sell_ids = zip(*pairs) if pairs else ((), ())
+    _write_ipc(
+        profit_strat_file,
+        pa.Table.from_arrays(
+            [pa.array(buy_ids, pa.int64()), pa.array(sell_ids, pa.int64())],
+            schema=_strats_schema,
+        ),
+    )
+
+
+def read_snapshot(
+    item_entry_file: str, profit_strat_file: str
+) -> tuple[EntryTable, list[tuple[int, int]]]:
+    strats = _read_ipc(profit_strat_file)
+    pairs = list(
+        zip(strats.column("buy_id").to_pylist(), strats.column("sell_id").to_pylist())
+    )
+    return EntryTable.from_arrow(_read_ipc(item_entry_file)), pairs
+
+
+def _column(table: pa.Table, name: str) -> pa.Array:
+    # a single chunk is returned as is, without copying
+    chunks = table.column(name).chunks
+    if len(chunks) == 1:
+        return chunks[0]
+    if not chunks:
+        return pa.array([], table.schema.field(name).type)
+    return pa.concat_arrays(chunks)
+
+
+def _write_ipc(file_path: str, table: pa.Table) -> None:
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    # write to a temporary file first so a crash never leaves half a snapshot
+    with tempfile.NamedTemporaryFile(
+        "wb", dir=os.path.dirname(file_path), suffix=".tmp", delete=False
+    ) as f:
+        with pa.ipc.new_file(f, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(f.name, file_path)
+
+
+def _read_ipc(file_path: str) -> pa.Table:
+    return pa.ipc.open_file(pa.memory_map(file_path)).read_all()
@@ -0,0 +1,662 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Iterable
+
+from snapshot import EntryTable, read_snapshot, write_snapshot
+
+
+def modifiers_key(modifiers: dict[str, Any]) -> str:
+    return json.dumps(modifiers, sort_keys=True)
+
+
+def item_entry_key(item_entry: dict[str, Any]) -> tuple[str, str]:
+    return item_entry["item_name"], modifiers_key(item_entry["modifiers"])
+
+
+def profit_strat_key(profit_strat: dict[str, Any]) -> tuple[str, str, str]:
+    return (
+        profit_strat["item_name"],
+        modifiers_key(profit_strat["buy_item"]["modifiers"]),
+        modifiers_key(profit_strat["sell_item"]["modifiers"]),
+    )
+
+
+def strat_profit(buy_value: float, sell_value: float) -> float:
+    if sell_value > 0 and buy_value > 0:
+        return round(sell_value - buy_value, 1)
+    return 0
+
+
+class StorageBackend:
+    # Item entries and profit strats are passed around as plain dicts, the same
+    # shape they have in the JSON export, so backends don't depend on the models.
+    # Stored entries get an integer id and a strat is only the (buy_id,
+    # sell_id) pair of its entries, its profit is computed from their values.
+
+    def upsert_item_entry(self, item_entry: dict[str, Any]) -> None:
+        self.upsert_item_entries([item_entry])
+
+    def upsert_item_entries(self, item_entries: Iterable[dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def read_item_entries(self, item_name: str | None = None) -> list[dict[str, Any]]:
+        return list(self.read_item_entries_by_id(item_name).values())
+
+    def read_item_entries_by_id(
+        self, item_name: str | None = None
+    ) -> dict[int, dict[str, Any]]:
+        raise NotImplementedError
+
+    def delete_item_entries(self, keys: Iterable[tuple[str, str]]) -> None:
+        # the strats of deleted entries are deleted with them
+        raise NotImplementedError
+
+    def upsert_profit_strat(self, profit_strat: dict[str, Any]) -> None:
+        self.upsert_profit_strats([profit_strat])
+
+    def upsert_profit_strats(self, profit_strats: Iterable[dict[str, Any]]) -> None:
+        # Only the pair is stored. Entries that aren't stored yet are added
+        # from the strat's copy, stored entries are never overwritten by one.
+        raise NotImplementedError
+
+    def read_profit_strats(self, item_name: str | None = None) -> list[dict[str, Any]]:
+        item_entries = self.read_item_entries_by_id(item_name)
+        return [
+            _profit_strat_dict(item_entries[buy_id], item_entries[sell_id])
+            for buy_id, sell_id in self.read_profit_strat_ids(item_name)
+        ]
+
+    def read_profit_strat_ids(
+        self, item_name: str | None = None
+    ) -> list[tuple[int, int]]:
+        raise NotImplementedError
+
+    def delete_profit_strats(self, keys: Iterable[tuple[str, str, str]]) -> None:
+        raise NotImplementedError
+
+    def apply_batch(
+        self,
+        item_entries: Iterable[dict[str, Any]],
+        profit_strats: Iterable[dict[str, Any]],
+        deleted_strats: Iterable[tuple[str, str, str]],
+        deleted_items: Iterable[tuple[str, str]],
+    ) -> None:
+        # All writes of a DataHandler.batch, backends with transactions
+        # apply them in one
+        self.upsert_item_entries(item_entries)
+        self.upsert_profit_strats(profit_strats)
+        self.delete_profit_strats(deleted_strats)
+        self.delete_item_entries(deleted_items)
+
+    def version(self) -> Any:
+        # Cheap token that changes whenever the stored data changes, also for
+        # writes made through another backend on the same files
+        raise NotImplementedError
+
+    def is_empty(self) -> bool:
+        return self.read_item_entries() == [] and self.read_profit_strat_ids() == []
+
+    def close(self) -> None:
+        pass
+
+    def import_json(self, item_entry_file: str, profit_strat_file: str) -> None:
+        item_entries = _load_item_entries(_load_json(item_entry_file))
+        self.upsert_item_entries(item_entries.values())
+        self.upsert_profit_strats(
+            _load_profit_strats(_load_json(profit_strat_file), item_entries)
+        )
+
+    def export_json(self, item_entry_file: str, profit_strat_file: str) -> None:
+        _dump_item_entries(item_entry_file, self.read_item_entries_by_id())
+        _dump_profit_strats(profit_strat_file, self.read_profit_strat_ids())
+
+    def import_snapshot(self, item_entry_file: str, profit_strat_file: str) -> None:
+        table, pairs = read_snapshot(item_entry_file, profit_strat_file)
+        item_entries = table.to_item_entries()
+        self.upsert_item_entries(item_entries.values())
+        self.upsert_profit_strats(
+            _profit_strat_dict(item_entries[buy_id], item_entries[sell_id])
+            for buy_id, sell_id in pairs
+        )
+
+    def export_snapshot(self, item_entry_file: str, profit_strat_file: str) -> None:
+        # Arrow IPC files, see snapshot.py
+        write_snapshot(
+            item_entry_file,
+            profit_strat_file,
+            EntryTable.from_item_entries(self.read_item_entries_by_id()),
+            self.read_profit_strat_ids(),
+        )
+
+
+def _profit_strat_dict(
+    buy_item: dict[str, Any], sell_item: dict[str, Any]
+) -> dict[str, Any]:
+    return {
+        "item_name": buy_item["item_name"],
+        "buy_item": buy_item,
+        "sell_item": sell_item,
+        "profit": strat_profit(buy_item["value"], sell_item["value"]),
+    }
+
+
+def _load_json(file_path: str) -> Any:
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path, "r") as f:
+        return json.load(f)
+
+
+def _is_legacy(item_data: Any, strat_data: Any) -> bool:
+    return isinstance(item_data, list) or (
+        isinstance(strat_data, list)
+        and any(isinstance(row, dict) for row in strat_data)
+    )
+
+
+def _load_item_entries(data: Any) -> dict[int, dict[str, Any]]:
+    # {"modifier_sets": [...], "entries": [...]} where every entry refers to
+    # its modifiers by their index in modifier_sets
+    if isinstance(data, list):
+        # Older files embed the modifiers in every entry and have no ids
+        return dict(enumerate(data))
+    if not isinstance(data, dict) or "entries" not in data:
+        # Older files were initialized with an empty dict instead of a list
+        return {}
+    modifier_sets = data["modifier_sets"]
+    item_entries = {}
+    for row in data["entries"]:
+        item_entry = {key: value for key, value in row.items() if key != "id"}
+        item_entry["modifiers"] = modifier_sets[row["modifiers"]]
+        item_entries[row["id"]] = item_entry
+    return item_entries
+
+
+def _load_profit_strats(
+    data: Any, item_entries: dict[int, dict[str, Any]]
+) -> list[dict[str, Any]]:
+    # [[buy_id, sell_id], ...] with the ids of the item entry file
+    if not isinstance(data, list):
+        return []
+    profit_strats = []
+    for row in data:
+        if isinstance(row, dict):
+            # Older files embed full copies of both entries
+            profit_strats.append(row)
+        elif row[0] in item_entries and row[1] in item_entries:
+            profit_strats.append(
+                _profit_strat_dict(item_entries[row[0]], item_entries[row[1]])
+            )
+    return profit_strats
+
+
+def _dump_item_entries(file_path: str, item_entries: dict[int, dict[str, Any]]) -> None:
+    modifier_ids: dict[str, int] = {}
+    modifier_sets = []
+    rows = []
+    for entry_id, item_entry in item_entries.items():
+        key = modifiers_key(item_entry["modifiers"])
+        if key not in modifier_ids:
+            modifier_ids[key] = len(modifier_sets)
+            modifier_sets.append(item_entry["modifiers"])
+        rows.append({**item_entry, "id": entry_id, "modifiers": modifier_ids[key]})
+    with open(file_path, "w") as f:
+        json.dump({"modifier_sets": modifier_sets, "entries": rows}, f, default=str)
+
+
+def _dump_profit_strats(file_path: str, pairs: Iterable[tuple[int, int]]) -> None:
+    with open(file_path, "w") as f:
+        json.dump([list(pair) for pair in pairs], f)
+
+
+class JsonStorage(StorageBackend):
+    # Keeps the whole file in memory keyed on (item_name, modifiers), so
+    # lookups are O(1) but every write still rewrites the complete file.
+    # Files changed by another backend are read again before the next read
+    # or write.
+
+    def __init__(self, item_entry_file: str, profit_strat_file: str) -> None:
+        self.item_entry_file = item_entry_file
+        self.profit_strat_file = profit_strat_file
+        self._lock = threading.RLock()
+        self._writes = 0
+        item_data, strat_data = self._load()
+        # files of older versions are converted right away
+        if _is_legacy(item_data, strat_data):
+            self._flush_items()
+            self._flush_strats()
+
+    def _load(self) -> tuple[Any, Any]:
+        self._items: dict[tuple[str, str], dict[str, Any]] = {}
+        self._ids: dict[tuple[str, str], int] = {}
+        self._keys: dict[int, tuple[str, str]] = {}
+        # one dict per distinct modifier set, shared by all entries using it
+        self._modifier_sets: dict[str, dict[str, Any]] = {}
+        self._strats: dict[tuple[int, int], None] = {}
+        self._next_id = 1
+        # stat first, a write during the load is seen on the next check
+        self._file_state = self._stat_files()
+
+        item_data = _load_json(self.item_entry_file)
+        strat_data = _load_json(self.profit_strat_file)
+        item_entries = _load_item_entries(item_data)
+        for entry_id, item_entry in item_entries.items():
+            self._put_item(item_entry, entry_id)
+        for profit_strat in _load_profit_strats(strat_data, item_entries):
+            self._put_strat(profit_strat)
+        return item_data, strat_data
+
+    def _stat_files(self) -> tuple[tuple[int, int], ...]:
+        states = []
+        for file_path in (self.item_entry_file, self.profit_strat_file):
+            try:
+                stat = os.stat(file_path)
+                states.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                states.append((0, 0))
+        return tuple(states)
+
+    def _reload_if_changed(self) -> None:
+        # the files only change behind our back if another backend wrote them
+        if self._stat_files() != self._file_state:
+            self._load()
+            self._writes += 1
+
+    def _put_item(self, item_entry: dict[str, Any], entry_id: int | None = None) -> int:
+        key = item_entry_key(item_entry)
+        if key in self._ids:
+            entry_id = self._ids[key]
+        elif entry_id is None or entry_id in self._keys:
+            entry_id = self._next_id
+        self._next_id = max(self._next_id, entry_id + 1)
+        modifiers = self._modifier_sets.setdefault(key[1], item_entry["modifiers"])
+        self._items[key] = {**item_entry, "modifiers": modifiers}
+        self._ids[key] = entry_id
+        self._keys[entry_id] = key
+        return entry_id
+
+    def _put_strat(self, profit_strat: dict[str, Any]) -> bool:
+        # True when an entry had to be added from the strat
+        item_name, buy_key, sell_key = profit_strat_key(profit_strat)
+        added = False
+        ids = []
+        for key, item_entry in (
+            ((item_name, buy_key), profit_strat["buy_item"]),
+            ((item_name, sell_key), profit_strat["sell_item"]),
+        ):
+            if key not in self._ids:
+                self._put_item(item_entry)
+                added = True
+            ids.append(self._ids[key])
+        self._strats[(ids[0], ids[1])] = None
+        return added
+
+    def _flush_items(self) -> None:
+        self._writes += 1
+        _dump_item_entries(
+            self.item_entry_file,
+            {self._ids[key]: item_entry for key, item_entry in self._items.items()},
+        )
+        self._file_state = self._stat_files()
+
+    def _flush_strats(self) -> None:
+        self._writes += 1
+        _dump_profit_strats(self.profit_strat_file, self._strats)
+        self._file_state = self._stat_files()
+
+    def version(self) -> Any:
+        with self._lock:
+            self._reload_if_changed()
+            return self._writes
+
+    def upsert_item_entries(self, item_entries: Iterable[dict[str, Any]]) -> None:
+        with self._lock:
+            self._reload_if_changed()
+            for item_entry in item_entries:
+                self._put_item(item_entry)
+            self._flush_items()
+
+    def read_item_entries_by_id(
+        self, item_name: str | None = None
+    ) -> dict[int, dict[str, Any]]:
+        with self._lock:
+            self._reload_if_changed()
+            return {
+                self._ids[key]: dict(item_entry)
+                for key, item_entry in self._items.items()
+                if item_name is None or key[0] == item_name
+            }
+
+    def delete_item_entries(self, keys: Iterable[tuple[str, str]]) -> None:
+        with self._lock:
+            self._reload_if_changed()
+            strats_deleted = self._remove_items(keys)
+            self._flush_items()
+            if strats_deleted:
+                self._flush_strats()
+
+    def _remove_items(self, keys: Iterable[tuple[str, str]]) -> bool:
+        # True when strats were deleted with the entries
+        deleted = set()
+        for key in keys:
+            if self._items.pop(key, None) is not None:
+                entry_id = self._ids.pop(key)
+                del self._keys[entry_id]
+                deleted.add(entry_id)
+        pairs = [pair for pair in self._strats if deleted.intersection(pair)]
+        for pair in pairs:
+            del self._strats[pair]
+        return bool(pairs)
+
+    def upsert_profit_strats(self, profit_strats: Iterable[dict[str, Any]]) -> None:
+        with self._lock:
+            self._reload_if_changed()
+            added = False
+            for profit_strat in profit_strats:
+                added = self._put_strat(profit_strat) or added
+            if added:
+                self._flush_items()
+            self._flush_strats()
+
+    def read_profit_strat_ids(
+        self, item_name: str | None = None
+    ) -> list[tuple[int, int]]:
+        with self._lock:
+            self._reload_if_changed()
+            return [
+                pair
+                for pair in self._strats
+                if item_name is None or self._keys[pair[0]][0] == item_name
+            ]
+
+    def delete_profit_strats(self, keys: Iterable[tuple[str, str, str]]) -> None:
+        with self._lock:
+            self._reload_if_changed()
+            self._remove_strats(keys)
+            self._flush_strats()
+
+    def _remove_strats(self, keys: Iterable[tuple[str, str, str]]) -> None:
+        for item_name, buy_key, sell_key in keys:
+            buy_id = self._ids.get((item_name, buy_key))
+            sell_id = self._ids.get((item_name, sell_key))
+            self._strats.pop((buy_id, sell_id), None)
+
+    def apply_batch(
+        self,
+        item_entries: Iterable[dict[str, Any]],
+        profit_strats: Iterable[dict[str, Any]],
+        deleted_strats: Iterable[tuple[str, str, str]],
+        deleted_items: Iterable[tuple[str, str]],
+    ) -> None:
+        # applied in memory first, then each file is written once
+        with self._lock:
+            self._reload_if_changed()
+            for item_entry in item_entries:
+                self._put_item(item_entry)
+            for profit_strat in profit_strats:
+                self._put_strat(profit_strat)
+            self._remove_strats(deleted_strats)
+            self._remove_items(deleted_items)
+            self._flush_items()
+            self._flush_strats()
+
+
+class SqliteStorage(StorageBackend):
+    _schema = """
+        CREATE TABLE IF NOT EXISTS modifier_sets (
+            id INTEGER PRIMARY KEY,
+            modifiers TEXT NOT NULL UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS entries (
+            id INTEGER PRIMARY KEY,
+            item_name TEXT NOT NULL,
+            modifiers_id INTEGER NOT NULL REFERENCES modifier_sets (id),
+            url TEXT NOT NULL DEFAULT '',
+            value REAL NOT NULL DEFAULT 0,
+            number_listed INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT NOT NULL,
+            UNIQUE (item_name, modifiers_id)
+        );
+        CREATE TABLE IF NOT EXISTS strats (
+            buy_id INTEGER NOT NULL REFERENCES entries (id) ON DELETE CASCADE,
+            sell_id INTEGER NOT NULL REFERENCES entries (id) ON DELETE CASCADE,
+            PRIMARY KEY (buy_id, sell_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS strats_sell_id ON strats (sell_id);
+    """
+
+    _entry_id = """
+        SELECT entries.id FROM entries
+        JOIN modifier_sets ON modifier_sets.id = entries.modifiers_id
+        WHERE entries.item_name = ? AND modifier_sets.modifiers = ?
+    """
+
+    _upsert_entry = """
+        INSERT INTO entries
+            (item_name, modifiers_id, url, value, number_listed, updated_at)
+        VALUES (?, (SELECT id FROM modifier_sets WHERE modifiers = ?), ?, ?, ?, ?)
+    """
+
+    def __init__(self, db_file: str) -> None:
+        self.db_file = db_file
+        # The connection is shared between the UI and the background thread,
+        # all access goes through the lock.
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(self._schema)
+        self._migrate()
+
+    def _migrate(self) -> None:
+        # Databases of older versions kept a full copy of both entries in
+        # every strat, their rows are moved over to the normalized tables
+        with self._lock:
+            tables = {
+                row[0]
+                for row in self._conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table'"
+                )
+            }
+            if "profit_strats" not in tables:
+                return
+            item_entries = [
+                {
+                    "item_name": row["item_name"],
+                    "modifiers": json.loads(row["modifiers"]),
+                    "url": row["url"],
+                    "value": row["value"],
+                    "number_listed": row["number_listed"],
+                    "updated_at": row["updated_at"],
+                }
+                for row in self._conn.execute("SELECT * FROM item_entries")
+            ]
+            profit_strats = [
+                {
+                    "item_name": row["item_name"],
+                    "buy_item": json.loads(row["buy_item"]),
+                    "sell_item": json.loads(row["sell_item"]),
+                }
+                for row in self._conn.execute("SELECT * FROM profit_strats")
+            ]
+            self.upsert_item_entries(item_entries)
+            self.upsert_profit_strats(profit_strats)
+            with self._conn:
+                self._conn.execute("DROP TABLE profit_strats")
+                self._conn.execute("DROP TABLE item_entries")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def upsert_item_entries(self, item_entries: Iterable[dict[str, Any]]) -> None:
+        with self._lock, self._conn:
+            self._upsert_item_entries(item_entries)
+
+    def _upsert_item_entries(self, item_entries: Iterable[dict[str, Any]]) -> None:
+        rows = [self._item_entry_row(item_entry) for item_entry in item_entries]
+        self._insert_modifier_sets(rows)
+        self._conn.executemany(
+            self._upsert_entry + """
+            ON CONFLICT (item_name, modifiers_id) DO UPDATE SET
+                url = excluded.url,
+                value = excluded.value,
+                number_listed = excluded.number_listed,
+                updated_at = excluded.updated_at
+            """,
+            rows,
+        )
+
+    def _insert_modifier_sets(self, rows: list[tuple[Any, ...]]) -> None:
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO modifier_sets (modifiers) VALUES (?)",
+            [(modifiers,) for modifiers in {row[1] for row in rows}],
+        )
+
+    def read_item_entries_by_id(
+        self, item_name: str | None = None
+    ) -> dict[int, dict[str, Any]]:
+        query = """
+            SELECT entries.*, modifier_sets.modifiers FROM entries
+            JOIN modifier_sets ON modifier_sets.id = entries.modifiers_id
+        """
+        params: tuple[str, ...] = ()
+        if item_name is not None:
+            query += " WHERE entries.item_name = ?"
+            params = (item_name,)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY entries.id", params).fetchall()
+        # one dict per distinct modifier set, shared by all entries using it
+        modifier_sets: dict[str, dict[str, Any]] = {}
+        item_entries = {}
+        for row in rows:
+            if row["modifiers"] not in modifier_sets:
+                modifier_sets[row["modifiers"]] = json.loads(row["modifiers"])
+            item_entries[row["id"]] = {
+                "item_name": row["item_name"],
+                "modifiers": modifier_sets[row["modifiers"]],
+                "url": row["url"],
+                "value": row["value"],
+                "number_listed": row["number_listed"],
+                "updated_at": row["updated_at"],
+            }
+        return item_entries
+
+    def delete_item_entries(self, keys: Iterable[tuple[str, str]]) -> None:
+        with self._lock, self._conn:
+            self._delete_item_entries(keys)
+
+    def _delete_item_entries(self, keys: Iterable[tuple[str, str]]) -> None:
+        self._conn.executemany(
+            """
+            DELETE FROM entries WHERE item_name = ?
+            AND modifiers_id = (SELECT id FROM modifier_sets WHERE modifiers = ?)
+            """,
+            list(keys),
+        )
+
+    def upsert_profit_strats(self, profit_strats: Iterable[dict[str, Any]]) -> None:
+        with self._lock, self._conn:
+            self._upsert_profit_strats(profit_strats)
+
+    def _upsert_profit_strats(self, profit_strats: Iterable[dict[str, Any]]) -> None:
+        profit_strats = list(profit_strats)
+        entry_rows = {
+            row[:2]: row
+            for profit_strat in profit_strats
+            for row in (
+                self._item_entry_row(profit_strat["buy_item"]),
+                self._item_entry_row(profit_strat["sell_item"]),
+            )
+        }
+        rows = [
+            (item_name, buy_key, item_name, sell_key)
+            for item_name, buy_key, sell_key in map(profit_strat_key, profit_strats)
+        ]
+        self._insert_modifier_sets(list(entry_rows.values()))
+        self._conn.executemany(
+            self._upsert_entry + " ON CONFLICT DO NOTHING",
+            list(entry_rows.values()),
+        )
+        self._conn.executemany(
+            f"""
+            INSERT OR IGNORE INTO strats (buy_id, sell_id)
+            VALUES (({self._entry_id}), ({self._entry_id}))
+            """,
+            rows,
+        )
+
+    def read_profit_strat_ids(
+        self, item_name: str | None = None
+    ) -> list[tuple[int, int]]:
+        query = "SELECT strats.buy_id, strats.sell_id FROM strats"
+        params: tuple[str, ...] = ()
+        if item_name is not None:
+            query += """
+                JOIN entries ON entries.id = strats.buy_id
+                WHERE entries.item_name = ?
+            """
+            params = (item_name,)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [(row[0], row[1]) for row in rows]
+
+    def delete_profit_strats(self, keys: Iterable[tuple[str, str, str]]) -> None:
+        with self._lock, self._conn:
+            self._delete_profit_strats(keys)
+
+    def _delete_profit_strats(self, keys: Iterable[tuple[str, str, str]]) -> None:
+        self._conn.executemany(
+            f"""
+            DELETE FROM strats
+            WHERE buy_id = ({self._entry_id}) AND sell_id = ({self._entry_id})
+            """,
+            [
+                (item_name, buy_key, item_name, sell_key)
+                for item_name, buy_key, sell_key in keys
+            ],
+        )
+
+    def apply_batch(
+        self,
+        item_entries: Iterable[dict[str, Any]],
+        profit_strats: Iterable[dict[str, Any]],
+        deleted_strats: Iterable[tuple[str, str, str]],
+        deleted_items: Iterable[tuple[str, str]],
+    ) -> None:
+        # one transaction, other connections see all of the batch or nothing
+        with self._lock, self._conn:
+            self._upsert_item_entries(item_entries)
+            self._upsert_profit_strats(profit_strats)
+            self._delete_profit_strats(deleted_strats)
+            self._delete_item_entries(deleted_items)
+
+    def version(self) -> Any:
+        # data_version moves with commits of other connections, total_changes
+        # with the writes of this one
+        with self._lock:
+            row = self._conn.execute("PRAGMA data_version").fetchone()
+            return row[0], self._conn.total_changes
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT EXISTS (SELECT 1 FROM entries)"
+                " OR EXISTS (SELECT 1 FROM strats)"
+            ).fetchone()
+        return not row[0]
+
+    @staticmethod
+    def _item_entry_row(item_entry: dict[str, Any]) -> tuple[Any, ...]:
+        return (
+            item_entry["item_name"],
+            modifiers_key(item_entry["modifiers"]),
+            item_entry.get("url", ""),
+            item_entry.get("value", 0),
+            item_entry.get("number_listed", 0),
+            str(item_entry.get("updated_at", "")),
+        )
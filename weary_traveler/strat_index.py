@@ -0,0 +1,174 @@
+import bisect
+import heapq
+from datetime import datetime, timedelta
+from typing import Any, Callable, Iterable, Iterator
+
+# (item_name, buy modifiers key, sell modifiers key), see ProfitStrat.key
+StratKey = tuple[str, str, str]
+
+# without a limit, a narrower index drives the query when it holds less than
+# this share of all strats
+_selective = 0.25
+
+
+class StratIndex:
+    # Secondary indexes over the profit strats: the keys per item name, the
+    # keys ordered by descending profit and the keys ordered by the sell
+    # side's updated_at. The indexed values are copied on insert, strats
+    # share live ItemEntry objects that change before they are re-indexed.
+
+    def __init__(self) -> None:
+        self._strats: dict[StratKey, Any] = {}
+        # profit, sell updated_at and number listed as indexed
+        self._values: dict[StratKey, tuple[float, datetime, int]] = {}
+        self._by_name: dict[str, set[StratKey]] = {}
+        self._by_profit: list[tuple[float, StratKey]] = []
+        self._by_updated: list[tuple[datetime, StratKey]] = []
+
+    def __len__(self) -> int:
+        return len(self._strats)
+
+    def __contains__(self, key: StratKey) -> bool:
+        return key in self._strats
+
+    def load(self, profit_strats: Iterable[Any]) -> None:
+        # new strats are appended and the sorted indexes sorted once, strats
+        # that are already indexed are upserted afterwards
+        indexed = []
+        for profit_strat in profit_strats:
+            key = profit_strat.key
+            if key in self._strats:
+                indexed.append(profit_strat)
+                continue
+            values = _indexed_values(profit_strat)
+            self._strats[key] = profit_strat
+            self._values[key] = values
+            self._by_name.setdefault(key[0], set()).add(key)
+            self._by_profit.append((-values[0], key))
+            self._by_updated.append((values[1], key))
+        self._by_profit.sort()
+        self._by_updated.sort()
+        for profit_strat in indexed:
+            self.upsert(profit_strat)
+
+    def upsert(self, profit_strat: Any) -> None:
+        key = profit_strat.key
+        values = _indexed_values(profit_strat)
+        if self._values.get(key) == values:
+            self._strats[key] = profit_strat
+            return
+        self.remove(key)
+        self._strats[key] = profit_strat
+        self._values[key] = values
+        self._by_name.setdefault(key[0], set()).add(key)
+        bisect.insort(self._by_profit, (-values[0], key))
+        bisect.insort(self._by_updated, (values[1], key))
+
+    def remove(self, key: StratKey) -> Any | None:
+        profit_strat = self._strats.pop(key, None)
+        if profit_strat is None:
+            return None
+        profit, updated_at, _ = self._values.pop(key)
+        names = self._by_name[key[0]]
+        names.discard(key)
+        if not names:
+            del self._by_name[key[0]]
+        _remove_sorted(self._by_profit, (-profit, key))
+        _remove_sorted(self._by_updated, (updated_at, key))
+        return profit_strat
+
+    def get_profit_strats(self, item_name: str) -> list[Any]:
+        return [self._strats[key] for key in self._by_name.get(item_name, ())]
+
+    def top(
+        self,
+        limit: int | None = None,
+        item_name: str | None = None,
+        min_profit: float | None = None,
+        min_listed: int = 0,
+        max_age: float | None = None,
+        now: datetime | None = None,
+    ) -> list[Any]:
+        strats = self.iter_top(item_name, min_profit, min_listed, max_age, now, limit)
+        if limit is None:
+            return list(strats)
+        return [strat for _, strat in zip(range(limit), strats)]
+
+    def iter_top(
+        self,
+        item_name: str | None = None,
+        min_profit: float | None = None,
+        min_listed: int = 0,
+        max_age: float | None = None,
+        now: datetime | None = None,
+        expected: int | None = None,
+    ) -> Iterator[Any]:
+        # Yields the matching strats by descending profit, lazily, so taking
+        # the first k costs about k matches when the profit order drives the
+        # query. `max_age` is in seconds, `expected` is how many strats the
+        # caller will likely take and only helps to pick the index. Don't
+        # change the index while consuming the iterator.
+        oldest = None
+        if max_age is not None:
+            oldest = (now or datetime.now()) - timedelta(seconds=max_age)
+        for key in self._plan(item_name, oldest, expected):
+            profit, updated_at, listed = self._values[key]
+            if min_profit is not None and profit < min_profit:
+                # the keys come by descending profit, nothing better follows
+                return
+            if item_name is not None and key[0] != item_name:
+                continue
+            if listed < min_listed:
+                continue
+            if oldest is not None and updated_at < oldest:
+                continue
+            yield self._strats[key]
+
+    def _plan(
+        self, item_name: str | None, oldest: datetime | None, expected: int | None
+    ) -> Iterator[StratKey]:
+        # keys by descending profit, drawn from the cheapest index
+        if item_name is not None:
+            return _by_descending_profit(
+                self._by_name.get(item_name, ()), lambda key: self._values[key][0]
+            )
+        if oldest is not None:
+            total = len(self._by_updated)
+            start = bisect.bisect_left(self._by_updated, (oldest,))
+            recent = total - start
+            # walking the profit order passes about total / recent strats per
+            # match, the updated_at range costs every recent strat up front
+            if expected is None:
+                walk = _selective * total
+            else:
+                walk = expected * total / max(recent, 1)
+            if recent < walk:
+                return _by_descending_profit(
+                    (key for _, key in self._by_updated[start:]),
+                    lambda key: self._values[key][0],
+                )
+        return (key for _, key in self._by_profit)
+
+
+def _indexed_values(profit_strat: Any) -> tuple[float, datetime, int]:
+    listed = min(
+        profit_strat.buy_item.number_listed, profit_strat.sell_item.number_listed
+    )
+    return profit_strat.profit, profit_strat.sell_item.updated_at, listed
+
+
+def _by_descending_profit(
+    keys: Iterable[StratKey], profit: Callable[[StratKey], float]
+) -> Iterator[StratKey]:
+    # heapify is linear, every key taken from the heap costs log n, so only
+    # the part that's consumed is ever sorted
+    heap = [(-profit(key), key) for key in keys]
+    heapq.heapify(heap)
+    while heap:
+        yield heapq.heappop(heap)[1]
+
+
+def _remove_sorted(entries: list, entry: tuple) -> None:
+    index = bisect.bisect_left(entries, entry)
+    if index < len(entries) and entries[index] == entry:
+        del entries[index]
@@ -0,0 +1,130 @@
+from datetime import datetime
+from typing import Any, Sequence
+
+import numpy as np
+
+SORT_KEYS = ("profit", "item_name", "staleness")
+
+# never valued entries are dated year 1, out of range for timestamp()
+_epoch = datetime(1970, 1, 1)
+
+
+class StratTableModel:
+    # Column arrays over all strats with one pre-built order per sort key.
+    # Every filter keeps its own mask so changing one filter only recomputes
+    # that mask. The visible rows are the current sort order restricted to
+    # the combined mask, and only the window on screen is turned into rows.
+
+    def __init__(self, profit_strats: Sequence[Any]) -> None:
+        self.strats = list(profit_strats)
+        count = len(self.strats)
+        self.profit = np.fromiter((s.profit for s in self.strats), float, count)
+        self.listed = np.fromiter(
+            (
+                min(s.buy_item.number_listed, s.sell_item.number_listed)
+                for s in self.strats
+            ),
+            np.int64,
+            count,
+        )
+        self.updated_at = np.fromiter(
+            (_seconds(s.sell_item.updated_at) for s in self.strats), float, count
+        )
+
+        # item names are matched once per distinct name, not once per strat
+        codes: dict[str, int] = {}
+        self.name_codes = np.fromiter(
+            (codes.setdefault(s.item_name, len(codes)) for s in self.strats),
+            np.int64,
+            count,
+        )
+        self.names = list(codes)
+        self._lower_names = [name.lower() for name in self.names]
+        name_rank = np.empty(len(self.names), np.int64)
+        name_rank[np.argsort(np.array(self.names, dtype=object))] = np.arange(
+            len(self.names)
+        )
+        rank = name_rank[self.name_codes]
+
+        # ties are broken by profit, then by name
+        self._orders = {
+            "profit": np.lexsort((rank, -self.profit)),
+            "item_name": np.lexsort((-self.profit, rank)),
+            "staleness": np.lexsort((-self.profit, self.updated_at)),
+        }
+        self.sort_key = "profit"
+        self._masks: dict[str, np.ndarray] = {}
+        self._name_filter = ""
+        self._name_matches = np.ones(len(self.names), bool)
+        self._visible: np.ndarray | None = None
+
+    def __len__(self) -> int:
+        return len(self.visible)
+
+    @property
+    def visible(self) -> np.ndarray:
+        # strat indices in display order
+        if self._visible is None:
+            order = self._orders[self.sort_key]
+            if self._masks:
+                mask = np.logical_and.reduce(list(self._masks.values()))
+                order = order[mask[order]]
+            self._visible = order
+        return self._visible
+
+    def window(self, start: int, count: int) -> list[Any]:
+        return [self.strats[i] for i in self.visible[start : start + count]]
+
+    def sort_by(self, sort_key: str) -> None:
+        if sort_key not in self._orders:
+            raise ValueError(f"Unknown sort key: '{sort_key}'")
+        self.sort_key = sort_key
+        self._visible = None
+
+    def filter_item_name(self, text: str) -> None:
+        text = text.lower()
+        if text == "":
+            self._name_matches = np.ones(len(self.names), bool)
+            self._set_mask("item_name", None)
+        else:
+            # a longer version of the last filter can only narrow it down
+            if self._name_filter != "" and self._name_filter in text:
+                candidates = np.flatnonzero(self._name_matches)
+            else:
+                candidates = range(len(self.names))
+            matches = np.zeros(len(self.names), bool)
+            for code in candidates:
+                matches[code] = text in self._lower_names[code]
+            self._name_matches = matches
+            self._set_mask("item_name", matches[self.name_codes])
+        self._name_filter = text
+
+    def filter_min_profit(self, min_profit: float | None) -> None:
+        self._set_mask(
+            "profit", None if min_profit is None else self.profit >= min_profit
+        )
+
+    def filter_min_listed(self, min_listed: int | None) -> None:
+        self._set_mask(
+            "listed", None if min_listed is None else self.listed >= min_listed
+        )
+
+    def filter_max_age(
+        self, seconds: float | None, now: datetime | None = None
+    ) -> None:
+        if seconds is None:
+            self._set_mask("age", None)
+            return
+        oldest = _seconds(now or datetime.now()) - seconds
+        self._set_mask("age", self.updated_at >= oldest)
+
+    def _set_mask(self, name: str, mask: np.ndarray | None) -> None:
+        if mask is None:
+            self._masks.pop(name, None)
+        else:
+            self._masks[name] = mask
+        self._visible = None
+
+
+def _seconds(updated_at: datetime) -> float:
+    return (updated_at - _epoch).total_seconds()
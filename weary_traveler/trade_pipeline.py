@@ -0,0 +1,94 @@
+import asyncio
+import threading
+from typing import Any, Callable, Iterable
+
+import metrics
+import requests
+
+# Marks the end of a stage's input queue
+_done = object()
+
+# the same counter as Fetcher.fetch's
+_fetch_errors = metrics.registry.counter(
+    "fetch_errors_total", "Valuations that failed with a request error"
+)
+
+
+class TradePipeline:
+    # Values many item entries at once: search workers feed a queue of
+    # fetchers that fetch workers drain, so the search and fetch budgets are
+    # used at the same time. The blocking calls run in the default executor
+    # and share the thread-safe session and rate limiter with Fetcher.fetch.
+    #
+    # Work is handed in as groups of entries, the fetcher_factory builds one
+    # fetcher per group which values every entry in it (see VariantFetcher).
+
+    def __init__(
+        self,
+        fetcher_factory: Callable[[list[Any]], Any],
+        search_workers: int = 2,
+        fetch_workers: int = 2,
+        stop_event: threading.Event | None = None,
+    ) -> None:
+        self.fetcher_factory = fetcher_factory
+        self.search_workers = search_workers
+        self.fetch_workers = fetch_workers
+        self.stop_event = stop_event or threading.Event()
+
+    def run_sync(
+        self, groups: Iterable[list[Any]], on_result: Callable[[Any], None]
+    ) -> list[Any]:
+        return asyncio.run(self.run(groups, on_result))
+
+    async def run(
+        self, groups: Iterable[list[Any]], on_result: Callable[[Any], None]
+    ) -> list[Any]:
+        # on_result is called with every entry as soon as its valuation is
+        # done. Entries of failed or stopped valuations are left out, they
+        # have nothing new to store.
+        search_queue: asyncio.Queue = asyncio.Queue()
+        fetch_queue: asyncio.Queue = asyncio.Queue(maxsize=self.fetch_workers * 2)
+        finished: list[Any] = []
+
+        for group in groups:
+            search_queue.put_nowait(group)
+        for _ in range(self.search_workers):
+            search_queue.put_nowait(_done)
+
+        async def search_worker() -> None:
+            while (group := await search_queue.get()) is not _done:
+                if self.stop_event.is_set():
+                    continue
+                fetcher = self.fetcher_factory(group)
+                try:
+                    await asyncio.to_thread(fetcher.search)
+                except requests.RequestException:
+                    _fetch_errors.inc()
+                    continue
+                await fetch_queue.put((group, fetcher))
+
+        async def fetch_worker() -> None:
+            while (job := await fetch_queue.get()) is not _done:
+                group, fetcher = job
+                if self.stop_event.is_set():
+                    continue
+                try:
+                    await asyncio.to_thread(fetcher.fetch_listings)
+                    for item_entry in group:
+                        await asyncio.to_thread(fetcher.apply_to, item_entry)
+                except requests.RequestException:
+                    _fetch_errors.inc()
+                    continue
+                for item_entry in group:
+                    on_result(item_entry)
+                    finished.append(item_entry)
+
+        async def search_stage() -> None:
+            await asyncio.gather(*(search_worker() for _ in range(self.search_workers)))
+            for _ in range(self.fetch_workers):
+                await fetch_queue.put(_done)
+
+        await asyncio.gather(
+            search_stage(), *(fetch_worker() for _ in range(self.fetch_workers))
+        )
+        return finished
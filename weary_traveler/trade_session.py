@@ -0,0 +1,143 @@
+import random
+import threading
+import time
+from typing import Any
+
+import metrics
+import requests
+from rate_limiter import RateLimiter
+from requests.adapters import HTTPAdapter
+
+_retry_statuses = {500, 502, 503, 504}
+
+
+class LatencyStats:
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.first: float | None = None
+        self.last = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        if self.first is None:
+            self.first = seconds
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class TradeSession:
+    # One long-lived, pooled session for all trade api calls. Every attempt,
+    # retries included, goes through the shared rate limiter.
+
+    def __init__(
+        self,
+        headers: dict[str, str],
+        rate_limiter: RateLimiter,
+        timeout: tuple[float, float] = (5.0, 20.0),
+        max_retries: int = 3,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+        pool_maxsize: int = 10,
+    ) -> None:
+        self.rate_limiter = rate_limiter
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.latency: dict[str, LatencyStats] = {}
+        self._latency_lock = threading.Lock()
+
+        self._session = requests.Session()
+        self._session.headers.update(headers)
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_maxsize)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+    def close(self) -> None:
+        self._session.close()
+
+    def post(self, endpoint: str, url: str, **kwargs: Any) -> requests.Response:
+        return self.request(endpoint, "POST", url, **kwargs)
+
+    def get(self, endpoint: str, url: str, **kwargs: Any) -> requests.Response:
+        return self.request(endpoint, "GET", url, **kwargs)
+
+    def request(
+        self,
+        endpoint: str,
+        method: str,
+        url: str,
+        stop_event: threading.Event | None = None,
+        **kwargs: Any,
+    ) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        attempt = 0
+        while True:
+            with metrics.registry.histogram(
+                "trade_rate_limit_wait_seconds",
+                "Time spent waiting for the rate limiter",
+                endpoint=endpoint,
+            ).time():
+                acquired = self.rate_limiter.acquire(endpoint, stop_event)
+            if not acquired:
+                raise requests.ConnectionError("Request cancelled")
+            try:
+                start = time.perf_counter()
+                response = self._session.request(method, url, **kwargs)
+                self._record_latency(endpoint, time.perf_counter() - start)
+            except (requests.ConnectionError, requests.Timeout):
+                self._count_error(endpoint)
+                if attempt >= self.max_retries:
+                    raise
+            else:
+                self.rate_limiter.update_from_headers(
+                    endpoint, response.headers, response.status_code
+                )
+                if response.status_code == 429:
+                    metrics.registry.counter(
+                        "trade_rate_limited_total",
+                        "Responses with status 429",
+                        endpoint=endpoint,
+                    ).inc()
+                elif response.status_code >= 400:
+                    self._count_error(endpoint)
+                if (
+                    response.status_code not in _retry_statuses
+                    or attempt >= self.max_retries
+                ):
+                    return response
+
+            delay = self.backoff_delay(attempt)
+            if stop_event is None:
+                time.sleep(delay)
+            elif stop_event.wait(delay):
+                raise requests.ConnectionError("Request cancelled")
+            attempt += 1
+
+    def backoff_delay(self, attempt: int) -> float:
+        # exponential backoff with full jitter
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    def _record_latency(self, endpoint: str, seconds: float) -> None:
+        with self._latency_lock:
+            self.latency.setdefault(endpoint, LatencyStats()).record(seconds)
+        metrics.registry.histogram(
+            "trade_request_seconds", "Trade api response time", endpoint=endpoint
+        ).observe(seconds)
+
+    def _count_error(self, endpoint: str) -> None:
+        # connection errors, timeouts and error statuses other than 429
+        metrics.registry.counter(
+            "trade_request_errors_total",
+            "Failed trade api requests",
+            endpoint=endpoint,
+        ).inc()
@@ -0,0 +1,191 @@
+import bisect
+import hashlib
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Iterable
+
+# (iid, text, values) of one Treeview row
+Row = tuple[str, str, tuple[Any, ...]]
+
+
+def row_iid(key: tuple[str, ...]) -> str:
+    # stable across reloads, so a row keeps its selection while it exists
+    return hashlib.sha1("\x1f".join(key).encode()).hexdigest()[:16]
+
+
+def relative_time(updated_at: datetime, now: datetime | None = None) -> str:
+    delta = (now or datetime.now()) - updated_at
+    if delta.seconds <= 120 and delta.days == 0:
+        updated = str(delta.seconds) + "s ago"
+    elif delta.seconds <= 3600 and delta.days == 0:
+        updated = str(round(delta.seconds / 60)) + " min ago"
+    elif delta.seconds <= 86400 and delta.days == 0:
+        updated = str(round(delta.seconds / 3600)) + " h ago"
+    elif delta.days <= 5:
+        updated = str(delta.days) + " days ago"
+    else:
+        updated = "5+ days ago"
+
+    return updated
+
+
+def _longest_increasing(positions: list[int]) -> set[int]:
+    # indices of one longest strictly increasing subsequence, O(n log n)
+    tails: list[int] = []
+    tail_indices: list[int] = []
+    previous = [-1] * len(positions)
+    for index, position in enumerate(positions):
+        length = bisect.bisect_left(tails, position)
+        if length == len(tails):
+            tails.append(position)
+            tail_indices.append(index)
+        else:
+            tails[length] = position
+            tail_indices[length] = index
+        previous[index] = tail_indices[length - 1] if length else -1
+    indices = set()
+    index = tail_indices[-1] if tail_indices else -1
+    while index != -1:
+        indices.add(index)
+        index = previous[index]
+    return indices
+
+
+class _Counts:
+    # Fenwick tree, how many marked positions lie before a position
+    def __init__(self, size: int) -> None:
+        self.tree = [0] * (size + 1)
+        self.total = 0
+
+    def add(self, position: int, amount: int) -> None:
+        self.total += amount
+        position += 1
+        while position < len(self.tree):
+            self.tree[position] += amount
+            position += position & -position
+
+    def before(self, position: int) -> int:
+        count = 0
+        while position > 0:
+            count += self.tree[position]
+            position -= position & -position
+        return count
+
+
+class TreeviewRenderer:
+    # Brings a Treeview in line with a list of rows by only deleting,
+    # inserting, moving and updating the rows that differ. The operations are
+    # applied at most ops_per_frame at a time, the rest is scheduled through
+    # `schedule` (root.after) so the event loop keeps running in between.
+    # A new render() replaces the operations still pending from the last one.
+    #
+    # The last `volatile` values of a row change on their own, like relative
+    # times. They are written when a row is inserted or updated but never make
+    # it differ, refresh_column() rewrites them in place.
+
+    def __init__(
+        self,
+        tree_view: Any,
+        schedule: Callable[[int, Callable[[], None]], Any],
+        ops_per_frame: int = 200,
+        volatile: int = 0,
+    ) -> None:
+        self.tree_view = tree_view
+        self.schedule = schedule
+        self.ops_per_frame = ops_per_frame
+        self.volatile = volatile
+        # text and values of the rows in the tree
+        self._rows: dict[str, tuple[str, tuple[Any, ...]]] = {}
+        self._ops: deque = deque()
+        self._scheduled = False
+
+    @property
+    def pending(self) -> int:
+        return len(self._ops)
+
+    def render(self, rows: Iterable[Row]) -> None:
+        self._ops = deque(self._diff(list(rows)))
+        if not self._scheduled:
+            self._apply()
+
+    def refresh_column(self, column: str, values: dict[str, Any]) -> None:
+        # rewrites a volatile column of the rows in the tree, nothing else
+        for iid, value in values.items():
+            if iid in self._rows:
+                self.tree_view.set(iid, column, value)
+
+    def _key(self, text: str, values: tuple[Any, ...]) -> tuple[Any, ...]:
+        return text, values[: len(values) - self.volatile]
+
+    def _diff(self, rows: list[Row]) -> list[tuple[Any, ...]]:
+        wanted = {iid for iid, _, _ in rows}
+        order = [iid for iid in self.tree_view.get_children("") if iid in wanted]
+        position = {iid: index for index, iid in enumerate(order)}
+        ops: list[tuple[Any, ...]] = [
+            ("delete", iid) for iid in self._rows if iid not in wanted
+        ]
+
+        # the longest run of kept rows that is already in the target order
+        # stays where it is, every other row is moved or inserted in front of
+        # the next row of that run
+        kept = [iid for iid, _, _ in rows if iid in position]
+        stable = {kept[i] for i in _longest_increasing([position[iid] for iid in kept])}
+        next_stable: list[str | None] = [None] * len(rows)
+        anchor = None
+        for index in range(len(rows) - 1, -1, -1):
+            next_stable[index] = anchor
+            if rows[index][0] in stable:
+                anchor = rows[index][0]
+        # the rows still to be moved, by their position in the tree. In front
+        # of a stable row are the rows placed so far and these.
+        unplaced = _Counts(len(order))
+        for iid in kept:
+            if iid not in stable:
+                unplaced.add(position[iid], 1)
+
+        for index, (iid, text, values) in enumerate(rows):
+            if iid not in stable:
+                if iid in position:
+                    unplaced.add(position[iid], -1)
+                anchor = next_stable[index]
+                if anchor is None:
+                    target = index + unplaced.total
+                else:
+                    target = index + unplaced.before(position[anchor])
+                if iid not in position:
+                    ops.append(("insert", iid, target, text, values))
+                    continue
+                ops.append(("move", iid, target))
+            old = self._rows.get(iid)
+            if old is None or self._key(*old) != self._key(text, values):
+                ops.append(("update", iid, text, values))
+        return ops
+
+    def _apply(self) -> None:
+        self._scheduled = False
+        deleted = []
+        for _ in range(min(self.ops_per_frame, len(self._ops))):
+            op = self._ops.popleft()
+            if op[0] == "delete":
+                deleted.append(op[1])
+                del self._rows[op[1]]
+                continue
+            if deleted:
+                self.tree_view.delete(*deleted)
+                deleted = []
+            if op[0] == "insert":
+                _, iid, index, text, values = op
+                self.tree_view.insert("", index, iid=iid, text=text, values=values)
+                self._rows[iid] = (text, values)
+            elif op[0] == "move":
+                self.tree_view.move(op[1], "", op[2])
+            else:
+                _, iid, text, values = op
+                self.tree_view.item(iid, text=text, values=values)
+                self._rows[iid] = (text, values)
+        if deleted:
+            self.tree_view.delete(*deleted)
+
+        if self._ops:
+            self._scheduled = True
+            self.schedule(1, self._apply)